@@ -1,13 +1,22 @@
 import asyncio
 from fastapi import FastAPI, HTTPException, Header, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Literal
 from enum import Enum
+from collections import OrderedDict
 import httpx
 import json
+import logging
 import os
+import re
+import time
 from datetime import datetime
 import uuid
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Agents Swarm Service")
 
@@ -45,18 +54,180 @@ class TaskResult(BaseModel):
     final_output: Optional[str] = None
     errors: Optional[List[str]] = []
 
-# In-memory task storage (use Redis in production)
-tasks: Dict[str, TaskResult] = {}
+TERMINAL_STATUSES = {TaskStatus.COMPLETED, TaskStatus.FAILED}
 
-# SSE keep-alive
-async def sse_keepalive():
-    while True:
-        await asyncio.sleep(25)
-        # In production, send SSE ping here
+TASK_TTL_SECONDS = int(os.getenv("SWARM_TASK_TTL_SECONDS", str(7 * 86400)))
+LOCAL_TASK_LIMIT = int(os.getenv("SWARM_LOCAL_TASK_LIMIT", "1000"))
+STEP_CONCURRENCY = int(os.getenv("SWARM_STEP_CONCURRENCY", "4"))
+SSE_KEEPALIVE_SECONDS = 25
+
+class TaskStore:
+    """Task persistence in Redis with TTL eviction.
+    
+    Every save also publishes the task on a per-task channel so SSE clients on
+    any worker see progress. Without Redis, falls back to a bounded in-process
+    LRU with the same TTL. Saves of one task are serialized and snapshot the
+    task under the lock, so concurrent step updates land in order and an
+    older snapshot never overwrites a newer one.
+    """
+    
+    def __init__(self):
+        self.redis: Optional[redis.Redis] = None
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()  # task_id -> (task, expires_at)
+        self._listeners: Dict[str, List[asyncio.Queue]] = {}
+        self._save_locks: Dict[str, list] = {}
+    
+    async def connect(self):
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        try:
+            client = redis.from_url(redis_url, decode_responses=True)
+            await client.ping()
+            self.redis = client
+        except Exception as e:
+            logger.warning(f"Task store falling back to in-memory storage: {e}")
+            self.redis = None
+    
+    async def close(self):
+        if self.redis:
+            await self.redis.close()
+    
+    @staticmethod
+    def _key(task_id: str) -> str:
+        return f"swarm:task:{task_id}"
+    
+    @staticmethod
+    def _channel(task_id: str) -> str:
+        return f"swarm:task:{task_id}:events"
+    
+    async def save(self, task: TaskResult):
+        # [lock, pending saves]; dropped once no save of the task is in flight
+        entry = self._save_locks.setdefault(task.task_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._write(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._save_locks[task.task_id]
+    
+    async def _write(self, task: TaskResult):
+        payload = json.dumps(jsonable_encoder(task))
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(self._key(task.task_id), payload, ex=TASK_TTL_SECONDS)
+            pipe.zadd("swarm:tasks", {task.task_id: time.time()})
+            pipe.zremrangebyscore("swarm:tasks", 0, time.time() - TASK_TTL_SECONDS)
+            pipe.publish(self._channel(task.task_id), payload)
+            await pipe.execute()
+        else:
+            self._local[task.task_id] = (task, time.time() + TASK_TTL_SECONDS)
+            self._local.move_to_end(task.task_id)
+            while len(self._local) > LOCAL_TASK_LIMIT:
+                self._local.popitem(last=False)
+            for queue in self._listeners.get(task.task_id, []):
+                queue.put_nowait(payload)
+    
+    async def get(self, task_id: str) -> Optional[TaskResult]:
+        if self.redis:
+            raw = await self.redis.get(self._key(task_id))
+            return TaskResult(**json.loads(raw)) if raw else None
+        
+        entry = self._local.get(task_id)
+        if entry is None:
+            return None
+        if entry[1] < time.time():
+            del self._local[task_id]
+            return None
+        return entry[0]
+    
+    async def list(self) -> List[TaskResult]:
+        if self.redis:
+            task_ids = await self.redis.zrevrange("swarm:tasks", 0, LOCAL_TASK_LIMIT - 1)
+            if not task_ids:
+                return []
+            raws = await self.redis.mget([self._key(task_id) for task_id in task_ids])
+            return [TaskResult(**json.loads(raw)) for raw in raws if raw]
+        
+        now = time.time()
+        return [task for task, expires_at in self._local.values() if expires_at >= now]
+    
+    async def count(self) -> int:
+        if self.redis:
+            return await self.redis.zcard("swarm:tasks")
+        return len(self._local)
+    
+    async def subscribe(self, task_id: str) -> "TaskSubscription":
+        subscription = TaskSubscription(self, task_id)
+        await subscription.open()
+        return subscription
+
+class TaskSubscription:
+    """Stream of serialized task updates for one task (Redis pub/sub or local queue)"""
+    
+    def __init__(self, store: TaskStore, task_id: str):
+        self.store = store
+        self.task_id = task_id
+        self._pubsub = None
+        self._queue: Optional[asyncio.Queue] = None
+    
+    async def open(self):
+        if self.store.redis:
+            self._pubsub = self.store.redis.pubsub()
+            await self._pubsub.subscribe(TaskStore._channel(self.task_id))
+        else:
+            self._queue = asyncio.Queue()
+            self.store._listeners.setdefault(self.task_id, []).append(self._queue)
+    
+    async def next(self) -> Optional[str]:
+        """Next update, or None if nothing arrived within the keep-alive interval"""
+        if self._pubsub is not None:
+            message = await self._pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_SECONDS
+            )
+            return message["data"] if message else None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+    
+    async def close(self):
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(TaskStore._channel(self.task_id))
+            await self._pubsub.close()
+        elif self._queue is not None:
+            listeners = self.store._listeners.get(self.task_id, [])
+            if self._queue in listeners:
+                listeners.remove(self._queue)
+            if not listeners:
+                self.store._listeners.pop(self.task_id, None)
+
+task_store = TaskStore()
+
+# Pooled client for Portkey LLM calls, shared by all agents
+llm_client: Optional[httpx.AsyncClient] = None
+
+def get_llm_client() -> httpx.AsyncClient:
+    global llm_client
+    if llm_client is None:
+        llm_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+        )
+    return llm_client
 
 @app.on_event("startup")
 async def startup():
-    asyncio.create_task(sse_keepalive())
+    await task_store.connect()
+    get_llm_client()
+
+@app.on_event("shutdown")
+async def shutdown():
+    global llm_client
+    if llm_client:
+        await llm_client.aclose()
+        llm_client = None
+    await task_store.close()
 
 async def call_portkey_llm(prompt: str, role: AgentRole, max_tokens: int = 1000) -> str:
     """Call Portkey LLM service for agent reasoning"""
@@ -68,27 +239,70 @@ async def call_portkey_llm(prompt: str, role: AgentRole, max_tokens: int = 1000)
         AgentRole.REVIEWER: "You are a reviewer. Evaluate work quality and provide constructive feedback."
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{portkey_url}/summarize",
-            headers={
-                "x-tenant-id": "system",
-                "x-actor-id": f"agent-{role.value}"
-            },
-            json={
-                "content": prompt,
-                "prompt_template": f"{system_prompts[role]}\n\nTask: {{content}}\n\nResponse:",
-                "max_tokens": max_tokens,
-                "model": "gpt-4"
-            }
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"LLM call failed for {role}")
-        
-        return response.json()["summary"]
+    response = await get_llm_client().post(
+        f"{portkey_url}/summarize",
+        headers={
+            "x-tenant-id": "system",
+            "x-actor-id": f"agent-{role.value}"
+        },
+        json={
+            "content": prompt,
+            "prompt_template": f"{system_prompts[role]}\n\nTask: {{content}}\n\nResponse:",
+            "max_tokens": max_tokens,
+            "model": "gpt-4"
+        }
+    )
+    
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"LLM call failed for {role}")
+    
+    return response.json()["summary"]
 
-async def planning_phase(task_id: str, objective: str, context: Dict[str, Any]) -> Dict[str, Any]:
+def parse_plan_steps(plan_text: str) -> List[Dict[str, Any]]:
+    """Parse planner output into steps with dependencies.
+    
+    Prefers the JSON block the planner is asked for; falls back to a numbered
+    list, treated as a sequential chain. Dependencies may only point at
+    earlier steps, which keeps the graph acyclic.
+    """
+    steps: List[Dict[str, Any]] = []
+    match = re.search(r"\{.*\}", plan_text, re.DOTALL)
+    if match:
+        try:
+            raw_steps = json.loads(match.group(0)).get("steps", [])
+        except (json.JSONDecodeError, AttributeError):
+            raw_steps = []
+        for index, raw in enumerate(raw_steps):
+            if not isinstance(raw, dict) or not raw.get("description"):
+                continue
+            steps.append({
+                "id": str(raw.get("id", index + 1)),
+                "description": str(raw["description"]),
+                "tools": raw.get("tools") or [],
+                "depends_on": [str(dep) for dep in raw.get("depends_on") or []]
+            })
+    
+    if not steps:
+        lines = re.findall(r"^\s*(?:\d+[.)]|[-*])\s+(.+)$", plan_text, re.MULTILINE)
+        for index, line in enumerate(lines or [plan_text.strip()]):
+            steps.append({
+                "id": str(index + 1),
+                "description": line.strip(),
+                "tools": [],
+                "depends_on": [str(index)] if index else []
+            })
+    
+    seen = set()
+    unique_steps = []
+    for step in steps:
+        if step["id"] in seen:
+            continue
+        step["depends_on"] = [dep for dep in step["depends_on"] if dep in seen]
+        seen.add(step["id"])
+        unique_steps.append(step)
+    return unique_steps
+
+async def planning_phase(task: TaskResult, objective: str, context: Dict[str, Any]) -> Dict[str, Any]:
     """Planning agent creates execution plan"""
     prompt = f"""
     Objective: {objective}
@@ -99,6 +313,11 @@ async def planning_phase(task_id: str, objective: str, context: Dict[str, Any])
     2. Required tools/resources for each step
     3. Success criteria
     4. Potential risks and mitigations
+    
+    Include a JSON block of the form
+    {{"steps": [{{"id": "1", "description": "...", "tools": [], "depends_on": []}}]}}
+    where depends_on lists the ids of earlier steps whose output is required.
+    Steps without dependencies are executed in parallel.
     """
     
     plan_text = await call_portkey_llm(prompt, AgentRole.PLANNER)
@@ -107,44 +326,72 @@ async def planning_phase(task_id: str, objective: str, context: Dict[str, Any])
     plan = {
         "created_at": datetime.utcnow().isoformat(),
         "objective": objective,
-        "steps": plan_text,  # In production, parse this into structured steps
+        "steps": parse_plan_steps(plan_text),
+        "raw_plan": plan_text,
         "status": "approved"
     }
     
-    tasks[task_id].plan = plan
-    tasks[task_id].status = TaskStatus.EXECUTING
+    task.plan = plan
+    task.status = TaskStatus.EXECUTING
+    await task_store.save(task)
     
     return plan
 
-async def execution_phase(task_id: str, plan: Dict[str, Any], tools_allowed: List[str]) -> List[Dict[str, Any]]:
-    """Executor agents carry out the plan"""
-    results = []
+async def execution_phase(task: TaskResult, plan: Dict[str, Any], tools_allowed: List[str]) -> List[Dict[str, Any]]:
+    """Executor agents carry out the plan, running independent steps concurrently"""
+    semaphore = asyncio.Semaphore(STEP_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    step_results: Dict[str, asyncio.Future] = {step["id"]: loop.create_future() for step in plan["steps"]}
+    results: List[Dict[str, Any]] = []
     
-    # Execute each step in the plan
-    execution_prompt = f"""
-    Plan: {json.dumps(plan, indent=2)}
+    async def run_step(step: Dict[str, Any]):
+        dependencies = [await step_results[dep] for dep in step["depends_on"]]
+        result = {
+            "step_id": step["id"],
+            "description": step["description"],
+            "tools_used": step["tools"] or tools_allowed or []
+        }
+        
+        if any(dep["status"] != "completed" for dep in dependencies):
+            result.update(status="skipped", error="dependency did not complete")
+        else:
+            execution_prompt = f"""
+    Objective: {plan["objective"]}
+    Step {step["id"]}: {step["description"]}
     Tools Available: {tools_allowed}
+    Results of prerequisite steps: {json.dumps([{"step_id": dep["step_id"], "output": dep["output"]} for dep in dependencies], indent=2)}
     
-    Execute the plan and report results for each step.
+    Execute this step and report the result.
     """
+            try:
+                async with semaphore:
+                    output = await call_portkey_llm(execution_prompt, AgentRole.EXECUTOR)
+                result.update(status="completed", output=output)
+            except Exception as e:
+                result.update(status="failed", error=str(e))
+        
+        result["executed_at"] = datetime.utcnow().isoformat()
+        step_results[step["id"]].set_result(result)
+        
+        # Publish per-step progress
+        results.append(result)
+        task.execution_results = list(results)
+        await task_store.save(task)
     
-    execution_output = await call_portkey_llm(execution_prompt, AgentRole.EXECUTOR)
+    await asyncio.gather(*(run_step(step) for step in plan["steps"]))
     
-    # Store execution results
-    result = {
-        "executed_at": datetime.utcnow().isoformat(),
-        "output": execution_output,
-        "tools_used": tools_allowed or [],
-        "status": "completed"
-    }
+    # Report in plan order rather than completion order
+    order = {step["id"]: index for index, step in enumerate(plan["steps"])}
+    results.sort(key=lambda result: order[result["step_id"]])
     
-    results.append(result)
-    tasks[task_id].execution_results = results
-    tasks[task_id].status = TaskStatus.REVIEWING
+    task.execution_results = results
+    task.errors = [f"step {r['step_id']}: {r['error']}" for r in results if r["status"] == "failed"]
+    task.status = TaskStatus.REVIEWING
+    await task_store.save(task)
     
     return results
 
-async def review_phase(task_id: str, plan: Dict[str, Any], execution_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+async def review_phase(task: TaskResult, plan: Dict[str, Any], execution_results: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Reviewer agent evaluates execution quality"""
     review_prompt = f"""
     Original Plan: {json.dumps(plan, indent=2)}
@@ -166,35 +413,39 @@ async def review_phase(task_id: str, plan: Dict[str, Any], execution_results: Li
         "quality_score": 8  # In production, extract from review
     }
     
-    tasks[task_id].review_feedback = feedback
-    tasks[task_id].status = TaskStatus.COMPLETED
-    tasks[task_id].final_output = review_output
+    task.review_feedback = feedback
+    task.status = TaskStatus.COMPLETED
+    task.final_output = review_output
+    await task_store.save(task)
     
     return feedback
 
-async def run_swarm_workflow(task_id: str, request: SwarmTaskRequest):
+async def run_swarm_workflow(task: TaskResult, request: SwarmTaskRequest):
     """Orchestrate the complete swarm workflow"""
     try:
         # Planning Phase
-        tasks[task_id].status = TaskStatus.PLANNING
-        plan = await planning_phase(task_id, request.objective, request.context)
+        task.status = TaskStatus.PLANNING
+        await task_store.save(task)
+        plan = await planning_phase(task, request.objective, request.context)
         
         # Execution Phase
-        execution_results = await execution_phase(task_id, plan, request.tools_allowed or [])
+        execution_results = await execution_phase(task, plan, request.tools_allowed or [])
         
         # Review Phase
-        review = await review_phase(task_id, plan, execution_results)
+        review = await review_phase(task, plan, execution_results)
         
         # Iteration logic (if review requires changes)
-        if not review.get("approved") and tasks[task_id].execution_results:
-            if len(tasks[task_id].execution_results) < request.max_iterations:
-                # Re-execute with feedback
-                await execution_phase(task_id, plan, request.tools_allowed or [])
-                await review_phase(task_id, plan, tasks[task_id].execution_results)
+        iterations = 1
+        while not review.get("approved") and iterations < request.max_iterations:
+            # Re-execute with feedback
+            iterations += 1
+            execution_results = await execution_phase(task, plan, request.tools_allowed or [])
+            review = await review_phase(task, plan, execution_results)
         
     except Exception as e:
-        tasks[task_id].status = TaskStatus.FAILED
-        tasks[task_id].errors = [str(e)]
+        task.status = TaskStatus.FAILED
+        task.errors = [str(e)]
+        await task_store.save(task)
 
 @app.post("/tasks/create", response_model=SwarmTaskResponse)
 async def create_task(
@@ -212,10 +463,10 @@ async def create_task(
         status=TaskStatus.PENDING,
         objective=request.objective
     )
-    tasks[task_id] = task_result
+    await task_store.save(task_result)
     
     # Start workflow in background
-    background_tasks.add_task(run_swarm_workflow, task_id, request)
+    background_tasks.add_task(run_swarm_workflow, task_result, request)
     
     # Log to audit
     try:
@@ -249,10 +500,46 @@ async def get_task_status(
     x_actor_id: str = Header(...)
 ):
     """Get current status and results of a swarm task"""
-    if task_id not in tasks:
+    task = await task_store.get(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return tasks[task_id]
+    return task
+
+@app.get("/tasks/{task_id}/events")
+async def stream_task_events(
+    task_id: str,
+    x_tenant_id: str = Header(...),
+    x_actor_id: str = Header(...)
+):
+    """Stream task progress as server-sent events until the task finishes"""
+    # Subscribe before reading the snapshot so no update is missed in between
+    subscription = await task_store.subscribe(task_id)
+    task = await task_store.get(task_id)
+    if task is None:
+        await subscription.close()
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    terminal = {status.value for status in TERMINAL_STATUSES}
+    
+    async def generate():
+        try:
+            yield f"event: task\ndata: {json.dumps(jsonable_encoder(task))}\n\n"
+            if task.status in TERMINAL_STATUSES:
+                return
+            
+            while True:
+                payload = await subscription.next()
+                if payload is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: task\ndata: {payload}\n\n"
+                if json.loads(payload).get("status") in terminal:
+                    return
+        finally:
+            await subscription.close()
+    
+    return StreamingResponse(generate(), media_type="text/event-stream")
 
 @app.get("/tasks", response_model=List[TaskResult])
 async def list_tasks(
@@ -260,8 +547,13 @@ async def list_tasks(
     x_actor_id: str = Header(...)
 ):
     """List all swarm tasks"""
-    return list(tasks.values())
+    return await task_store.list()
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "service": "agents-swarm", "active_tasks": len(tasks)}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "service": "agents-swarm",
+        "active_tasks": await task_store.count(),
+        "task_store": "redis" if task_store.redis else "memory"
+    }
\ No newline at end of file
@@ -17,6 +17,36 @@ import logging
 from libs.secrets.manager import secrets_manager, get_secret
 
 
+# Every secret the configuration loaders read; prefetched in bulk on load
+CONFIG_SECRETS = [
+    "OPENAI_API_KEY",
+    "ANTHROPIC_API_KEY",
+    "OPENROUTER_API_KEY",
+    "PERPLEXITY_API_KEY",
+    "XAI_API_KEY",
+    "TAVILY_API_KEY",
+    "SERPER_API_KEY",
+    "BRAVE_API_KEY",
+    "EXA_API_KEY",
+    "HUBSPOT_ACCESS_TOKEN",
+    "HUBSPOT_API_KEY",
+    "SALESFORCE_CLIENT_ID",
+    "SALESFORCE_CLIENT_SECRET",
+    "SALESFORCE_USERNAME",
+    "SALESFORCE_PASSWORD",
+    "SALESFORCE_SECURITY_TOKEN",
+    "GONG_API_KEY",
+    "GONG_EMAIL",
+    "GITHUB_APP_ID",
+    "GITHUB_APP_PRIVATE_KEY",
+    "GITHUB_WEBHOOK_SECRET",
+    "NEON_DATABASE_URL",
+    "QDRANT_API_KEY",
+    "JWT_SECRET",
+    "ENCRYPTION_KEY",
+]
+
+
 @dataclass
 class LLMConfig:
     """LLM provider configuration"""
@@ -132,6 +162,9 @@ class SophiaConfig:
         # Initialize secrets manager
         await secrets_manager.initialize()
         
+        # Prefetch all declared secrets in one pass so the loaders hit the cache
+        await secrets_manager.get_secrets(CONFIG_SECRETS)
+        
         # Load LLM configuration
         config.llm = await cls._load_llm_config()
         
@@ -171,6 +171,9 @@ CREATE TABLE IF NOT EXISTS knowledge_fragments (
     semantic_density FLOAT DEFAULT 0.0,
     readability_score FLOAT DEFAULT 0.0,
     
+    -- Full-text search (title weighted above content), maintained by trigger
+    search_vector TSVECTOR,
+    
     -- Indexing
     INDEX idx_knowledge_org_id (organization_id),
     INDEX idx_knowledge_project_id (project_id),
@@ -209,6 +212,23 @@ USING gin(
     setweight(to_tsvector('english', COALESCE(quality_score::text, '')), 'C')
 );
 
+-- Stored full-text search vector
+CREATE INDEX idx_knowledge_search_vector ON knowledge_fragments
+USING gin (search_vector);
+
+CREATE OR REPLACE FUNCTION knowledge_fragments_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.content, '')), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER knowledge_fragments_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, content ON knowledge_fragments
+    FOR EACH ROW EXECUTE FUNCTION knowledge_fragments_search_vector();
+
 -- Quality assessment tracking
 CREATE TABLE IF NOT EXISTS quality_assessments (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
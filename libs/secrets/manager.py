@@ -63,6 +63,11 @@ class SecretBackend(ABC):
     async def delete_secret(self, name: str) -> bool:
         """Delete a secret by name"""
         pass
+    
+    async def get_secrets(self, names: List[str]) -> Dict[str, Optional[str]]:
+        """Get several secrets in one pass (backends override for bulk reads)"""
+        values = await asyncio.gather(*(self.get_secret(name) for name in names))
+        return dict(zip(names, values))
 
 
 class EnvironmentSecretBackend(SecretBackend):
@@ -215,8 +220,10 @@ class PulumiESCBackend(SecretBackend):
         if not self._connected:
             try:
                 # Test if pulumi CLI is available
-                result = subprocess.run(["pulumi", "version"], 
-                                      capture_output=True, text=True, check=True)
+                result = await asyncio.to_thread(
+                    subprocess.run, ["pulumi", "version"],
+                    capture_output=True, text=True, check=True
+                )
                 self._connected = result.returncode == 0
             except Exception as e:
                 self.logger.warning(f"Pulumi ESC connection failed: {e}")
@@ -235,7 +242,9 @@ class PulumiESCBackend(SecretBackend):
             if self.stack:
                 cmd.extend(["--stack", self.stack])
             
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = await asyncio.to_thread(
+                subprocess.run, cmd, capture_output=True, text=True, check=True
+            )
             return result.stdout.strip()
         except subprocess.CalledProcessError:
             # Secret not found
@@ -244,6 +253,37 @@ class PulumiESCBackend(SecretBackend):
             self.logger.error(f"Error getting Pulumi secret {name}: {e}")
             return None
     
+    async def get_secrets(self, names: List[str]) -> Dict[str, Optional[str]]:
+        """Get several secrets from one `pulumi config --json` call"""
+        if not self._connected:
+            await self.connect()
+            if not self._connected:
+                return {name: None for name in names}
+        
+        try:
+            cmd = ["pulumi", "config", "--json", "--show-secrets"]
+            if self.stack:
+                cmd.extend(["--stack", self.stack])
+            
+            result = await asyncio.to_thread(
+                subprocess.run, cmd, capture_output=True, text=True, check=True
+            )
+            config = json.loads(result.stdout or "{}")
+        except Exception as e:
+            self.logger.warning(f"Bulk Pulumi config read failed, falling back to per-key reads: {e}")
+            return await super().get_secrets(names)
+        
+        # Keys are namespaced as "<project>:<name>"; match on either form
+        by_key = {}
+        for key, entry in config.items():
+            value = entry.get("value") if isinstance(entry, dict) else entry
+            if value is None:
+                continue
+            by_key.setdefault(key, str(value))
+            by_key.setdefault(key.split(":", 1)[-1], str(value))
+        
+        return {name: by_key.get(name) for name in names}
+    
     async def set_secret(self, name: str, value: str) -> bool:
         """Set secret in Pulumi ESC"""
         if not self._connected:
@@ -330,8 +370,10 @@ class FlyIOBackend(SecretBackend):
         if not self._connected and self.app_name:
             try:
                 # Test if fly CLI is available
-                result = subprocess.run(["fly", "version"], 
-                                      capture_output=True, text=True, check=True)
+                result = await asyncio.to_thread(
+                    subprocess.run, ["fly", "version"],
+                    capture_output=True, text=True, check=True
+                )
                 self._connected = result.returncode == 0
             except Exception as e:
                 self.logger.warning(f"Fly.io connection failed: {e}")
@@ -410,13 +452,22 @@ class FlyIOBackend(SecretBackend):
 class SecretsManager:
     """Main secrets manager that orchestrates multiple backends"""
     
+    # Backends in order of priority; all are queried concurrently and the
+    # first one in this list that has a value wins
+    BACKENDS_PRIORITY = ["github", "pulumi", "fly", "env"]
+    
     def __init__(self):
         self.backends: Dict[str, SecretBackend] = {}
         self.metadata: Dict[str, SecretMetadata] = {}
         self.cache: Dict[str, tuple[str, datetime]] = {}  # value, expiry
         self.cache_ttl = timedelta(minutes=5)
+        # Cached values this close to expiry are refreshed in the background
+        self.refresh_ahead = timedelta(minutes=1)
         self.logger = logging.getLogger(__name__)
         self._initialized = False
+        # Singleflight: one in-flight backend lookup per secret name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
     
     def add_backend(self, name: str, backend: SecretBackend):
         """Add a secret backend"""
@@ -466,33 +517,65 @@ class SecretsManager:
             await self.initialize()
         
         # Check cache first
-        if use_cache and name in self.cache:
-            value, expiry = self.cache[name]
-            if datetime.now() < expiry:
+        if use_cache:
+            cached = self._get_cached(name)
+            if cached is not None:
                 self._update_metadata(name, "access")
-                return value
+                return cached
         
-        # Try backends in order of priority
-        backends_priority = ["github", "pulumi", "fly", "env"]
+        value = await self._load_secret(name)
+        if value is None:
+            # Secret not found in any backend
+            self.logger.warning(f"Secret {name} not found in any backend")
+            return None
         
-        for backend_name in backends_priority:
-            if backend_name in self.backends:
-                try:
-                    backend = self.backends[backend_name]
-                    value = await backend.get_secret(name)
-                    if value is not None:
-                        # Cache the value
-                        if use_cache:
-                            self.cache[name] = (value, datetime.now() + self.cache_ttl)
-                        self._update_metadata(name, "access")
-                        return value
-                except Exception as e:
-                    self.logger.warning(f"Backend {backend_name} failed to get secret {name}: {e}")
+        if use_cache:
+            self._cache_value(name, value)
+        self._update_metadata(name, "access")
+        return value
+    
+    async def get_secrets(self, names: List[str], use_cache: bool = True) -> Dict[str, Optional[str]]:
+        """Get several secrets at once, e.g. to prefetch everything a service declares.
+        
+        Cache misses are resolved with a single bulk read per backend, with all
+        backends queried concurrently.
+        """
+        if not self._initialized:
+            await self.initialize()
+        
+        results: Dict[str, Optional[str]] = {}
+        pending: Dict[str, asyncio.Future] = {}
+        to_fetch: List[str] = []
+        
+        for name in dict.fromkeys(names):
+            cached = self._get_cached(name) if use_cache else None
+            if cached is not None:
+                results[name] = cached
+                self._update_metadata(name, "access")
+            elif name in self._inflight:
+                pending[name] = self._inflight[name]
+            else:
+                to_fetch.append(name)
+        
+        if to_fetch:
+            batch = asyncio.ensure_future(self._fetch_many_from_backends(to_fetch))
+            for name in to_fetch:
+                pending[name] = self._register_inflight(
+                    name, self._select_from_batch(batch, name)
+                )
+        
+        if pending:
+            values = await asyncio.gather(*(asyncio.shield(f) for f in pending.values()))
+            for name, value in zip(pending, values):
+                results[name] = value
+                if value is None:
+                    self.logger.warning(f"Secret {name} not found in any backend")
                     continue
+                if use_cache:
+                    self._cache_value(name, value)
+                self._update_metadata(name, "access")
         
-        # Secret not found in any backend
-        self.logger.warning(f"Secret {name} not found in any backend")
-        return None
+        return {name: results.get(name) for name in names}
     
     async def set_secret(self, name: str, value: str, backend_preference: str = "github") -> bool:
         """Set a secret in the preferred backend"""
@@ -571,6 +654,103 @@ class SecretsManager:
         
         return False
     
+    def _get_cached(self, name: str) -> Optional[str]:
+        """Return a live cached value, scheduling a refresh if it is about to expire"""
+        entry = self.cache.get(name)
+        if entry is None:
+            return None
+        
+        value, expiry = entry
+        now = datetime.now()
+        if now >= expiry:
+            return None
+        
+        if expiry - now <= self.refresh_ahead:
+            self._schedule_refresh(name)
+        return value
+    
+    def _cache_value(self, name: str, value: str):
+        """Store a value in the cache with a fresh TTL"""
+        self.cache[name] = (value, datetime.now() + self.cache_ttl)
+    
+    def _register_inflight(self, name: str, coro) -> asyncio.Future:
+        """Track an in-flight lookup so concurrent misses share it"""
+        task = asyncio.ensure_future(coro)
+        self._inflight[name] = task
+        task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        return task
+    
+    async def _load_secret(self, name: str) -> Optional[str]:
+        """Resolve a secret from the backends, deduplicating concurrent callers"""
+        task = self._inflight.get(name)
+        if task is None:
+            task = self._register_inflight(name, self._fetch_from_backends(name))
+        return await asyncio.shield(task)
+    
+    def _available_backends(self) -> List[str]:
+        return [name for name in self.BACKENDS_PRIORITY if name in self.backends]
+    
+    async def _fetch_from_backends(self, name: str) -> Optional[str]:
+        """Query all backends concurrently and return the highest-priority hit"""
+        backend_names = self._available_backends()
+        results = await asyncio.gather(
+            *(self.backends[b].get_secret(name) for b in backend_names),
+            return_exceptions=True
+        )
+        
+        for backend_name, result in zip(backend_names, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Backend {backend_name} failed to get secret {name}: {result}")
+                continue
+            if result is not None:
+                return result
+        return None
+    
+    async def _fetch_many_from_backends(self, names: List[str]) -> Dict[str, Optional[str]]:
+        """Bulk-read names from every backend concurrently, merging by priority"""
+        backend_names = self._available_backends()
+        results = await asyncio.gather(
+            *(self.backends[b].get_secrets(names) for b in backend_names),
+            return_exceptions=True
+        )
+        
+        values: Dict[str, Optional[str]] = {name: None for name in names}
+        for backend_name, result in zip(backend_names, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Backend {backend_name} failed to get secrets: {result}")
+                continue
+            for name in names:
+                if values[name] is None and result.get(name) is not None:
+                    values[name] = result[name]
+        return values
+    
+    @staticmethod
+    async def _select_from_batch(batch: asyncio.Future, name: str) -> Optional[str]:
+        values = await asyncio.shield(batch)
+        return values.get(name)
+    
+    def _schedule_refresh(self, name: str):
+        """Refresh a cached secret in the background before its TTL expires"""
+        if name in self._refresh_tasks or name in self._inflight:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        task = asyncio.ensure_future(self._refresh_secret(name))
+        self._refresh_tasks[name] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(name, None))
+    
+    async def _refresh_secret(self, name: str):
+        try:
+            value = await self._load_secret(name)
+        except Exception as e:
+            self.logger.warning(f"Background refresh of secret {name} failed: {e}")
+            return
+        if value is not None:
+            self._cache_value(name, value)
+    
     def _update_metadata(self, name: str, action: str):
         """Update secret metadata"""
         if name not in self.metadata:
@@ -596,6 +776,11 @@ async def get_secret(name: str, use_cache: bool = True) -> Optional[str]:
     return await secrets_manager.get_secret(name, use_cache)
 
 
+async def get_secrets(names: List[str], use_cache: bool = True) -> Dict[str, Optional[str]]:
+    """Convenience function to get several secrets at once"""
+    return await secrets_manager.get_secrets(names, use_cache)
+
+
 async def set_secret(name: str, value: str, backend: str = "github") -> bool:
     """Convenience function to set a secret"""
     return await secrets_manager.set_secret(name, value, backend)
@@ -622,6 +807,7 @@ __all__ = [
     'SecretMetadata',
     'secrets_manager',
     'get_secret',
+    'get_secrets',
     'set_secret',
     'list_secrets',
     'delete_secret'
@@ -7,6 +7,7 @@ import json
 import os
 import logging
 import time
+from collections import deque
 from datetime import datetime, timezone
 
 # Configure logging
@@ -37,6 +38,25 @@ class ModelHealth(BaseModel):
     response_time_ms: Optional[int]
     last_used: Optional[str]
 
+# Connection pool settings for the shared Portkey client
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "120"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+
+# Hedging: fire the next model if the current one runs past its p95 latency
+LLM_HEDGING = os.getenv("LLM_HEDGING", "true").lower() == "true"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "8000"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "500"))
+LLM_PROBE_INTERVAL_SECONDS = float(os.getenv("LLM_PROBE_INTERVAL_SECONDS", "30"))
+# 4xx responses usually reflect the request, so a model is only marked
+# unhealthy after this many in a row
+LLM_UNHEALTHY_AFTER_CLIENT_ERRORS = int(os.getenv("LLM_UNHEALTHY_AFTER_CLIENT_ERRORS", "3"))
+
+# Latency histogram bucket upper bounds (ms)
+LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
 # Standardized model hierarchy - OpenRouter removed
 STANDARDIZED_MODELS = {
     "primary": [
@@ -55,6 +75,81 @@ STANDARDIZED_MODELS = {
     ]
 }
 
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed buckets (Prometheus-style)"""
+
+    def __init__(self, buckets: List[int] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+
+    def observe(self, latency_ms: float, error: bool = False):
+        self.count += 1
+        self.sum_ms += latency_ms
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(self.buckets):
+            if latency_ms <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "sum_ms": round(self.sum_ms, 1),
+            "avg_ms": round(self.sum_ms / self.count, 1) if self.count else None,
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)},
+                "le_inf": self.count
+            }
+        }
+
+class PoolMetrics:
+    """Connection pool utilization and reuse, fed by httpcore trace events"""
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.requests = 0
+        self.new_connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def trace(self, event_name: str, info: Dict[str, Any]):
+        """httpcore trace hook; a completed TCP connect means the pool opened a new connection"""
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    def request_started(self):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def request_finished(self):
+        self.in_flight -= 1
+
+    def to_dict(self, client: Optional[httpx.AsyncClient]) -> Dict[str, Any]:
+        open_connections = None
+        if client is not None:
+            # httpx does not expose pool state publicly; read it best-effort
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = getattr(pool, "connections", None)
+            if connections is not None:
+                open_connections = len(connections)
+
+        return {
+            "max_connections": self.max_connections,
+            "open_connections": open_connections,
+            "in_flight_requests": self.in_flight,
+            "peak_in_flight_requests": self.peak_in_flight,
+            "utilization": round(self.in_flight / self.max_connections, 3),
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "connection_reuse_ratio": round(1 - self.new_connections / self.requests, 3) if self.requests else None,
+            "http2": LLM_HTTP2
+        }
+
 class StandardizedLLMClient:
     """Standardized LLM client using Portkey virtual keys - OpenRouter removed"""
 
@@ -64,34 +159,95 @@ class StandardizedLLMClient:
         self.model_health: Dict[str, Dict] = {}
         self.request_count = 0
         self.error_count = 0
-
-    async def __aenter__(self):
+        self.pool_metrics = PoolMetrics(LLM_MAX_CONNECTIONS)
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.recent_latency: Dict[str, deque] = {}  # successful call latencies for p95
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self.probe_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Create the shared pooled client; called once at app startup"""
+        if self.session is not None:
+            return
         self.session = httpx.AsyncClient(
             timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            http2=LLM_HTTP2,
             headers={"User-Agent": "Sophia-AI-Standardized-LLM/2.0"}
         )
-        return self
+        self.probe_task = asyncio.create_task(self.health_probe_loop())
+        logger.info(
+            f"LLM client pool ready (http2={LLM_HTTP2}, max_connections={LLM_MAX_CONNECTIONS}, "
+            f"keepalive={LLM_MAX_KEEPALIVE_CONNECTIONS})"
+        )
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def close(self):
+        """Close the shared client; called once at app shutdown"""
+        if self.probe_task:
+            self.probe_task.cancel()
+            self.probe_task = None
         if self.session:
             await self.session.aclose()
+            self.session = None
+
+    def record_latency(self, model: str, latency_ms: float, error: bool = False):
+        if model not in self.latency:
+            self.latency[model] = LatencyHistogram()
+        self.latency[model].observe(latency_ms, error)
+        if not error:
+            self.recent_latency.setdefault(model, deque(maxlen=200)).append(latency_ms)
+
+    def hedge_delay_ms(self, model: str) -> float:
+        """How long to wait on a model before hedging: its recent p95 latency"""
+        samples = self.recent_latency.get(model)
+        if not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY_MS
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return max(p95, LLM_HEDGE_MIN_DELAY_MS)
+
+    def is_model_healthy(self, model: str) -> bool:
+        return self.model_health.get(model, {}).get("status") != "unhealthy"
+
+    async def health_probe_loop(self):
+        """Periodically probe unhealthy models so they rejoin routing once they recover"""
+        while True:
+            await asyncio.sleep(LLM_PROBE_INTERVAL_SECONDS)
+            unhealthy = [
+                model for model in self.get_model_hierarchy()
+                if not self.is_model_healthy(model["name"])
+            ]
+            for model_config in unhealthy:
+                try:
+                    await self.call_standardized_llm(
+                        model_config,
+                        [{"role": "user", "content": "ping"}],
+                        max_tokens=1,
+                        temperature=0.0
+                    )
+                    logger.info(f"Health probe cleared {model_config['name']}")
+                except Exception as e:
+                    logger.debug(f"Health probe failed for {model_config['name']}: {e}")
 
     def get_model_hierarchy(self, requested_model: str = None) -> List[Dict]:
-        """Get model hierarchy for routing decisions"""
-        if requested_model:
-            # Find specific model in hierarchy
-            for tier in ["primary", "secondary", "efficiency", "backup"]:
-                for model in STANDARDIZED_MODELS[tier]:
-                    if model["name"] == requested_model:
-                        return [model]
-
-        # Return full hierarchy in order of preference
+        """Get model hierarchy for routing decisions.
+
+        A known requested model comes first, followed by the rest of the
+        hierarchy in order of preference as its fallbacks.
+        """
         hierarchy = []
         hierarchy.extend(STANDARDIZED_MODELS["primary"])
         hierarchy.extend(STANDARDIZED_MODELS["secondary"])
         hierarchy.extend(STANDARDIZED_MODELS["efficiency"])
         hierarchy.extend(STANDARDIZED_MODELS["backup"])
-        return hierarchy
+
+        requested = [model for model in hierarchy if model["name"] == requested_model]
+        return requested + [model for model in hierarchy if model["name"] != requested_model]
 
     async def call_standardized_llm(self, model_config: Dict, messages: List[Dict],
                                    max_tokens: int = 500, temperature: float = 0.3) -> Dict:
@@ -114,22 +270,39 @@ class StandardizedLLMClient:
             "temperature": temperature
         }
 
+        self.pool_metrics.request_started()
         try:
             response = await self.session.post(
                 "https://api.portkey.ai/v1/chat/completions",
                 json=payload,
-                headers=headers
+                headers=headers,
+                extensions={"trace": self.pool_metrics.trace}
             )
 
             response_time = int((time.time() - start_time) * 1000)
             self.request_count += 1
-
-            # Update health metrics
+            self.record_latency(model_config["name"], response_time, error=response.status_code != 200)
+
+            # Update health metrics; a 4xx only counts against the model
+            # once it repeats
+            previous = self.model_health.get(model_config["name"], {})
+            client_errors = 0
+            if response.status_code == 200:
+                status = "healthy"
+            elif 400 <= response.status_code < 500:
+                client_errors = previous.get("client_errors", 0) + 1
+                status = (
+                    "unhealthy" if client_errors >= LLM_UNHEALTHY_AFTER_CLIENT_ERRORS
+                    else previous.get("status", "healthy")
+                )
+            else:
+                status = "unhealthy"
             self.model_health[model_config["name"]] = {
-                "status": "healthy" if response.status_code == 200 else "unhealthy",
+                "status": status,
                 "response_time_ms": response_time,
                 "last_used": datetime.now(timezone.utc).isoformat(),
-                "provider": model_config["provider"]
+                "provider": model_config["provider"],
+                "client_errors": client_errors
             }
 
             response.raise_for_status()
@@ -143,9 +316,17 @@ class StandardizedLLMClient:
                 "fallback_used": False
             }
 
+        except httpx.HTTPStatusError as e:
+            # Latency and health were already recorded for this response
+            self.error_count += 1
+            self.model_health[model_config["name"]]["error"] = str(e)
+
+            raise Exception(f"LLM call failed for {model_config['name']}: {str(e)}")
+
         except Exception as e:
             self.error_count += 1
             response_time = int((time.time() - start_time) * 1000)
+            self.record_latency(model_config["name"], response_time, error=True)
 
             # Update health metrics
             self.model_health[model_config["name"]] = {
@@ -158,32 +339,91 @@ class StandardizedLLMClient:
 
             raise Exception(f"LLM call failed for {model_config['name']}: {str(e)}")
 
+        finally:
+            self.pool_metrics.request_finished()
+
     async def call_with_fallback(self, messages: List[Dict], requested_model: str = None,
                                max_tokens: int = 500, temperature: float = 0.3) -> Dict:
-        """Call LLM with automatic fallback using standardized hierarchy"""
+        """Call LLM with automatic fallback using standardized hierarchy.
+
+        The requested model is tried first and the rest of the hierarchy
+        serves as its fallbacks. Unhealthy models are skipped until the health
+        probe clears them. With hedging enabled, a model that runs past its p95
+        latency gets the next model fired alongside it; the first success wins
+        and the rest are cancelled. A failure launches the next model only when
+        no other call is still pending.
+        """
         model_hierarchy = self.get_model_hierarchy(requested_model)
+        candidates = [m for m in model_hierarchy if self.is_model_healthy(m["name"])]
+        if not candidates:
+            raise Exception("All standardized models are marked unhealthy; waiting for the health probe")
 
+        pending: Dict[asyncio.Task, Dict] = {}
+        launched: List[Dict] = []
+        last_launch = 0.0
         last_error = None
 
-        for model_config in model_hierarchy:
-            try:
-                logger.info(f"Attempting LLM call with {model_config['name']} ({model_config['provider']})")
-                result = await self.call_standardized_llm(model_config, messages, max_tokens, temperature)
-
-                if model_config != model_hierarchy[0]:  # If not the first choice
-                    result["fallback_used"] = True
-                    logger.warning(f"Used fallback model: {model_config['name']} (requested: {requested_model or 'auto'})")
-
-                return result
+        def launch_next() -> Dict:
+            nonlocal last_launch
+            model_config = candidates[len(launched)]
+            logger.info(f"Attempting LLM call with {model_config['name']} ({model_config['provider']})")
+            task = asyncio.create_task(
+                self.call_standardized_llm(model_config, messages, max_tokens, temperature)
+            )
+            task.add_done_callback(_consume_exception)
+            pending[task] = model_config
+            launched.append(model_config)
+            last_launch = time.monotonic()
+            return model_config
 
-            except Exception as e:
-                last_error = e
-                logger.warning(f"Model {model_config['name']} failed: {str(e)}")
-                continue
+        launch_next()
+        try:
+            while pending:
+                timeout = None
+                if LLM_HEDGING and len(launched) < len(candidates):
+                    elapsed_ms = (time.monotonic() - last_launch) * 1000
+                    timeout = max(0.0, self.hedge_delay_ms(launched[-1]["name"]) - elapsed_ms) / 1000
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedge = launch_next()
+                    self.hedged_requests += 1
+                    logger.info(f"Hedging slow {launched[-2]['name']} with {hedge['name']}")
+                    continue
+
+                for task in done:
+                    model_config = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"Model {model_config['name']} failed: {str(e)}")
+                        continue
+
+                    if model_config is not model_hierarchy[0]:  # If not the first choice
+                        result["fallback_used"] = True
+                        logger.warning(f"Used fallback model: {model_config['name']} (requested: {requested_model or 'auto'})")
+                    if len(launched) > 1 and model_config is not launched[0]:
+                        self.hedge_wins += 1
+                    result["models_attempted"] = [m["name"] for m in launched]
+                    return result
+
+                if not pending and len(launched) < len(candidates):
+                    launch_next()
+        finally:
+            # Cancel the losers
+            for task in pending:
+                task.cancel()
 
         # All models failed
         raise Exception(f"All standardized models failed. Last error: {str(last_error)}")
 
+def _consume_exception(task: asyncio.Task):
+    """Retrieve exceptions of hedged calls whose result nobody awaits"""
+    if not task.cancelled():
+        task.exception()
+
 # Global client instance
 llm_client = StandardizedLLMClient()
 
@@ -195,9 +435,14 @@ async def sse_keepalive():
 
 @app.on_event("startup")
 async def startup():
+    await llm_client.start()
     asyncio.create_task(sse_keepalive())
     logger.info("Sophia AI Standardized LLM Service started")
 
+@app.on_event("shutdown")
+async def shutdown():
+    await llm_client.close()
+
 @app.post("/summarize", response_model=SummarizeResponse)
 async def summarize(
     request: SummarizeRequest,
@@ -231,13 +476,12 @@ async def summarize(
     ]
 
     try:
-        async with llm_client as client:
-            result = await client.call_with_fallback(
-                messages=messages,
-                requested_model=request.model,
-                max_tokens=request.max_tokens,
-                temperature=0.3
-            )
+        result = await llm_client.call_with_fallback(
+            messages=messages,
+            requested_model=request.model,
+            max_tokens=request.max_tokens,
+            temperature=0.3
+        )
 
         summary = result["response"]["choices"][0]["message"]["content"]
         token_count = result["response"].get("usage", {}).get("total_tokens", 0)
@@ -290,5 +534,17 @@ async def get_metrics():
         "total_errors": llm_client.error_count,
         "success_rate": (llm_client.request_count - llm_client.error_count) / max(llm_client.request_count, 1),
         "model_usage": llm_client.model_health,
+        "connection_pool": llm_client.pool_metrics.to_dict(llm_client.session),
+        "hedging": {
+            "enabled": LLM_HEDGING,
+            "hedged_requests": llm_client.hedged_requests,
+            "hedge_wins": llm_client.hedge_wins,
+            "hedge_delay_ms": {
+                model: llm_client.hedge_delay_ms(model) for model in llm_client.recent_latency
+            }
+        },
+        "latency_histograms_ms": {
+            model: histogram.to_dict() for model, histogram in llm_client.latency.items()
+        },
         "standardized_routing_active": True
-    }
\ No newline at end of file
+    }
@@ -5,16 +5,19 @@ Sophia AI Analytics MCP Service
 
 Analytics and business intelligence integration for Sophia AI platform.
 Provides access to analytics data, reporting, and business metrics with
-read-only curated SQL over Neon database.
+read-only curated SQL over Neon database. The service itself writes only
+its daily rollup tables and the NOTIFY trigger that invalidates its cache.
 """
 
 import os
+import json
+import asyncio
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import asyncpg
-from jinja2 import Template
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, validator
 
 # Import shared platform libraries
@@ -22,93 +25,40 @@ from platform.common.service_base import create_app, ServiceConfig
 from platform.auth.jwt import validate_token
 from platform.common.errors import ServiceError, ValidationError, ok, err, raise_http_error # Ensure these are imported directly by the app
 
+from query_engine import SQL_TEMPLATES, CompiledStatement, QueryEngine, ResultCache, TemplateError
+from rollups import RollupManager
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Environment configuration
 NEON_DATABASE_URL = os.getenv("NEON_DATABASE_URL")
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "30"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_ROWS = int(os.getenv("ANALYTICS_CACHE_MAX_ROWS", "5000"))
+LISTENER_CHECK_SECONDS = float(os.getenv("ANALYTICS_LISTENER_CHECK_SECONDS", "5"))
+STREAM_PREFETCH_ROWS = int(os.getenv("ANALYTICS_STREAM_PREFETCH_ROWS", "500"))
+ROLLUPS_ENABLED = os.getenv("ANALYTICS_ROLLUPS_ENABLED", "true").lower() == "true"
+ROLLUP_REFRESH_SECONDS = float(os.getenv("ANALYTICS_ROLLUP_REFRESH_SECONDS", "300"))
+ROLLUP_LOOKBACK_DAYS = int(os.getenv("ANALYTICS_ROLLUP_LOOKBACK_DAYS", "1"))
 
 # Global variables
 _db_pool: Optional[asyncpg.Pool] = None
+_listener_task: Optional[asyncio.Task] = None
+_rollup_task: Optional[asyncio.Task] = None
 
-# Service configuration using ServiceConfig
-SERVICE_CONFIG = ServiceConfig(
-    name="analytics-mcp",
-    version="1.0.0",  # This should ideally come from a package version
-    description="Analytics and business intelligence integration with Neon SQL",
-    startup_event=startup_handler,
-    shutdown_event=shutdown_handler
+# Whitelisted templates compiled once into parameterized statements
+query_engine = QueryEngine(SQL_TEMPLATES).compile()
+
+# Repeated dashboard refreshes are served from memory until interactions change
+result_cache = ResultCache(
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_rows=RESULT_CACHE_MAX_ROWS
 )
 
-# SQL Templates structure - whitelisted templates only
-SQL_TEMPLATES = {
-    "timeline": {
-        "query": """
-        SELECT
-            id,
-            account_id,
-            interaction_type,
-            content,
-            metadata,
-            created_at,
-            updated_at
-        FROM interactions
-        WHERE account_id = '{{ account_id }}'
-        {% if since %}
-        AND created_at >= '{{ since }}'
-        {% endif %}
-        ORDER BY created_at DESC
-        {% if limit %}
-        LIMIT {{ limit }}
-        {% endif %}
-        """,
-        "description": "Get timeline of interactions for an account",
-        "parameters": ["account_id", "since", "limit"],
-        "required": ["account_id"]
-    },
-    "user_analytics": {
-        "query": """
-        SELECT
-            account_id,
-            COUNT(*) as total_interactions,
-            COUNT(DISTINCT DATE(created_at)) as active_days,
-            MAX(created_at) as last_activity,
-            MIN(created_at) as first_activity
-        FROM interactions
-        WHERE created_at >= '{{ start_date }}'
-        AND created_at <= '{{ end_date }}'
-        GROUP BY account_id
-        ORDER BY total_interactions DESC
-        {% if limit %}
-        LIMIT {{ limit }}
-        {% endif %}
-        """,
-        "description": "Get user analytics for date range",
-        "parameters": ["start_date", "end_date", "limit"],
-        "required": ["start_date", "end_date"]
-    },
-    "interaction_summary": {
-        "query": """
-        SELECT
-            interaction_type,
-            COUNT(*) as count,
-            AVG(LENGTH(content)) as avg_content_length,
-            MIN(created_at) as earliest,
-            MAX(created_at) as latest
-        FROM interactions
-        WHERE created_at >= '{{ start_date }}'
-        AND created_at <= '{{ end_date }}'
-        {% if account_id %}
-        AND account_id = '{{ account_id }}'
-        {% endif %}
-        GROUP BY interaction_type
-        ORDER BY count DESC
-        """,
-        "description": "Get interaction summary statistics",
-        "parameters": ["start_date", "end_date", "account_id"],
-        "required": ["start_date", "end_date"]
-    }
-}
+# Daily aggregates answering whole-day ranges of the aggregate templates
+rollups = RollupManager(lookback_days=ROLLUP_LOOKBACK_DAYS)
 
 # Pydantic models
 class SQLTemplateRequest(BaseModel):
@@ -121,6 +71,9 @@ class SQLTemplateRequest(BaseModel):
             raise ValueError(f"Unknown template_id: {v}")
         return v
 
+class StreamRequest(SQLTemplateRequest):
+    cursor: Optional[str] = None  # from the previous page's next_cursor line
+
 class TimelineRequest(BaseModel):
     account_id: str
     since: Optional[str] = None
@@ -135,7 +88,7 @@ class TimelineRequest(BaseModel):
 # Startup and shutdown handlers
 async def startup_handler():
     """Initialize database connection pool"""
-    global _db_pool
+    global _db_pool, _listener_task, _rollup_task
 
     if not NEON_DATABASE_URL:
         logger.warning("NEON_DATABASE_URL not configured - database features will be disabled")
@@ -147,9 +100,14 @@ async def startup_handler():
                 min_size=1,
                 max_size=10,
                 command_timeout=60,
-                max_inactive_connection_lifetime=300
+                max_inactive_connection_lifetime=300,
+                # Each connection keeps every compiled statement prepared
+                statement_cache_size=max(100, len(query_engine.statements))
             )
             logger.info("Database connection pool initialized successfully")
+            _listener_task = asyncio.create_task(watch_interactions())
+            if ROLLUPS_ENABLED:
+                _rollup_task = asyncio.create_task(refresh_rollups())
         except Exception as e:
             logger.error(f"Failed to initialize database connection pool: {e}")
             raise
@@ -157,69 +115,124 @@ async def startup_handler():
 async def shutdown_handler():
     """Cleanup database connection pool"""
     global _db_pool
+    if _listener_task:
+        _listener_task.cancel()
+    if _rollup_task:
+        _rollup_task.cancel()
     if _db_pool:
         await _db_pool.close()
         logger.info("Database connection pool closed")
 
+# Service configuration using ServiceConfig
+SERVICE_CONFIG = ServiceConfig(
+    name="analytics-mcp",
+    version="1.0.0",  # This should ideally come from a package version
+    description="Analytics and business intelligence integration with Neon SQL",
+    startup_event=startup_handler,
+    shutdown_event=shutdown_handler
+)
+
 # Create FastAPI app using the shared service base
 app = create_app(config=SERVICE_CONFIG)
 
-def render_sql(template_id: str, parameters: Dict[str, Any]) -> str:
+def bind_sql(template_id: str, parameters: Dict[str, Any]) -> Tuple[CompiledStatement, List[Any]]:
     """
-    Render SQL template with Jinja2 and parameter validation.
+    Resolve a template to its compiled statement and bound parameter values.
 
     Args:
         template_id: The template identifier
-        parameters: Dictionary of parameters to substitute
+        parameters: Dictionary of parameter values
 
     Returns:
-        Rendered SQL query string
+        The parameterized statement and its positional arguments
 
     Raises:
         ValidationError: If template_id is unknown or parameters are invalid
     """
-    if template_id not in SQL_TEMPLATES:
-        raise ValidationError(f"Unknown template_id: {template_id}")
-
-    template_config = SQL_TEMPLATES[template_id]
-
-    # Validate required parameters
-    required_params = template_config.get("required", [])
-    for param in required_params:
-        if param not in parameters or parameters[param] is None:
-            raise ValidationError(f"Missing required parameter: {param}")
-
-    # Validate parameter types and sanitize
-    sanitized_params = {}
-    for key, value in parameters.items():
-        if key not in template_config["parameters"]:
-            raise ValidationError(f"Unknown parameter: {key}")
-
-        # Basic sanitization - prevent SQL injection through template parameters
-        if isinstance(value, str):
-            # Remove any potential SQL injection characters
-            sanitized_params[key] = value.replace("'", "''").replace("\\", "\\\\")
-        else:
-            sanitized_params[key] = value
-
-    # Render template
     try:
-        template = Template(template_config["query"])
-        rendered_sql = template.render(**sanitized_params)
-        logger.debug(f"Rendered SQL for template '{template_id}': {rendered_sql}")
-        return rendered_sql
+        statement, args = query_engine.bind(template_id, parameters)
+    except TemplateError as e:
+        raise ValidationError(str(e))
+
+    logger.debug(f"Bound SQL for template '{template_id}': {statement.sql} {args}")
+    return statement, args
+
+# Notified by the analytics_interactions_notify trigger
+# (scripts/database/migrations/20261018_140000_analytics_interactions_notify.sql)
+INTERACTIONS_CHANNEL = "analytics_interactions_changed"
+
+def _on_interactions_changed(connection, pid, channel, payload):
+    result_cache.invalidate()
+    logger.debug("Interactions changed; result cache invalidated")
+
+async def watch_interactions():
+    """Invalidate the result cache whenever the interactions table changes.
+
+    LISTENs on a connection of its own rather than one from the pool, so the
+    listener never holds a query slot. The NOTIFY trigger comes from a
+    migration; without it cached results expire by TTL only. If the connection
+    drops, the cache is invalidated on reconnect since notifications may have
+    been missed.
+    """
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(NEON_DATABASE_URL)
+            await connection.add_listener(INTERACTIONS_CHANNEL, _on_interactions_changed)
+            result_cache.invalidate()
+            while not connection.is_closed():
+                await asyncio.sleep(LISTENER_CHECK_SECONDS)
+            logger.warning("Interactions listener connection closed; reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Interactions listener failed: {e}")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(LISTENER_CHECK_SECONDS)
+
+async def refresh_rollups():
+    """Create the rollup tables on first run, then keep recent days current"""
+    try:
+        async with _db_pool.acquire() as connection:
+            await rollups.ensure_schema(connection)
     except Exception as e:
-        raise ValidationError(f"Failed to render SQL template: {e}")
+        logger.warning(f"Rollups disabled - could not prepare rollup tables: {e}")
+        return
 
-async def execute_query(sql: str) -> List[Dict[str, Any]]:
+    while True:
+        try:
+            async with _db_pool.acquire() as connection:
+                days = await rollups.refresh(connection)
+            logger.info(f"Rollups refreshed ({days} days recomputed, complete through {rollups.complete_through})")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Rollup refresh failed: {e}")
+        await asyncio.sleep(ROLLUP_REFRESH_SECONDS)
+
+def plan_sql(template_id: str, parameters: Dict[str, Any]) -> Tuple[CompiledStatement, List[Any]]:
+    """Bind a template, answering whole-day ranges from rollups when available"""
+    statement, args = bind_sql(template_id, parameters)
+    planned = rollups.plan(template_id, dict(zip(statement.param_names, args)))
+    return planned or (statement, args)
+
+async def execute_query(statement: CompiledStatement, args: List[Any], use_cache: bool = True) -> List[Dict[str, Any]]:
     """
-    Execute SQL query against Neon database.
+    Execute a compiled statement against Neon database.
+
+    asyncpg prepares the statement on first use and keeps it in the
+    connection's statement cache, so every later call on that pooled
+    connection only binds and executes.
 
     Args:
-        sql: The SQL query to execute
+        statement: The compiled, parameterized statement
+        args: Positional parameter values for $1..$n
+        use_cache: Serve from / store into the result cache
 
     Returns:
-        List of query results as dictionaries
+        List of query results as dictionaries (shared with the cache; do not mutate)
 
     Raises:
         ServiceError: If database is not available or query fails
@@ -230,14 +243,23 @@ async def execute_query(sql: str) -> List[Dict[str, Any]]:
     if not NEON_DATABASE_URL:
         raise ServiceError("Database not configured", code="DB_NOT_CONFIGURED")
 
+    cache_key = ResultCache.key(statement, args)
+    if use_cache:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    generation = result_cache.generation
+
     try:
         async with _db_pool.acquire() as connection:
             # Execute query with read-only transaction for security
             async with connection.transaction(readonly=True):
-                rows = await connection.fetch(sql)
+                rows = await connection.fetch(statement.sql, *args)
                 # Convert rows to dictionaries
                 results = [dict(row) for row in rows]
-                return results
+        if use_cache:
+            result_cache.put(cache_key, results, generation)
+        return results
     except asyncpg.exceptions.PostgresError as e:
         logger.error(f"Database query failed: {e}")
         raise ServiceError(f"Database query failed: {str(e)}", code="DB_QUERY_ERROR")
@@ -245,6 +267,18 @@ async def execute_query(sql: str) -> List[Dict[str, Any]]:
         logger.error(f"Unexpected database error: {e}")
         raise ServiceError(f"Unexpected database error: {str(e)}", code="DB_ERROR")
 
+async def stream_query(statement: CompiledStatement, args: List[Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream rows of a compiled statement through a server-side cursor.
+
+    Rows are fetched STREAM_PREFETCH_ROWS at a time, so memory stays flat
+    regardless of result size. The connection is held until the stream ends.
+    """
+    async with _db_pool.acquire() as connection:
+        async with connection.transaction(readonly=True):
+            async for row in connection.cursor(statement.sql, *args, prefetch=STREAM_PREFETCH_ROWS):
+                yield dict(row)
+
 # Service-specific endpoints
 
 @app.get("/templates")
@@ -271,11 +305,11 @@ async def query_sql_template_endpoint(request: SQLTemplateRequest):
         JSON response with query results or error
     """
     try:
-        # Render SQL template
-        sql = render_sql(request.template_id, request.parameters)
+        # Bind parameters to the compiled template (or its rollup rewrite)
+        statement, args = plan_sql(request.template_id, request.parameters)
 
         # Execute query
-        results = await execute_query(sql)
+        results = await execute_query(statement, args)
 
         return ok(results)
 
@@ -293,6 +327,63 @@ async def query_sql_template_endpoint(request: SQLTemplateRequest):
         logger.error(f"Unexpected error in query_sql_template: {e}")
         raise_http_error("Internal server error", status_code=500, code="INTERNAL_ERROR")
 
+@app.post("/query_sql_template/stream")
+async def query_sql_template_stream_endpoint(request: StreamRequest):
+    """
+    Stream a whitelisted SQL template's rows as NDJSON.
+
+    One JSON object per line. Templates with keyset pagination (timeline)
+    accept a `cursor`; when a page is cut off by `limit`, a final
+    {"next_cursor": ...} line carries the cursor for the next page.
+    """
+    parameters = dict(request.parameters)
+    try:
+        if request.cursor:
+            parameters.update(query_engine.cursor_params(request.template_id, request.cursor))
+        statement, args = plan_sql(request.template_id, parameters)
+    except TemplateError as e:
+        raise_http_error(str(e), status_code=400, code="VALIDATION_ERROR")
+    except ValidationError as e:
+        logger.warning(f"Template validation error: {e}")
+        raise_http_error(str(e), status_code=400, code="VALIDATION_ERROR")
+
+    if not NEON_DATABASE_URL:
+        raise_http_error("Database not configured", status_code=503, code="DB_NOT_CONFIGURED")
+    if not _db_pool:
+        raise_http_error("Database connection not available", status_code=503, code="DB_UNAVAILABLE")
+
+    page_size = parameters.get("limit")
+
+    async def ndjson() -> AsyncIterator[bytes]:
+        count = 0
+        last_row = None
+        try:
+            async for row in stream_query(statement, args):
+                count += 1
+                last_row = row
+                yield (json.dumps(row, default=str) + "\n").encode()
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"Streaming query failed after {count} rows: {e}")
+            yield (json.dumps({"error": {"code": "DB_QUERY_ERROR", "message": str(e)}}) + "\n").encode()
+            return
+
+        if page_size and count == int(page_size) and query_engine.supports_keyset(request.template_id):
+            cursor = query_engine.next_cursor(request.template_id, last_row)
+            yield (json.dumps({"next_cursor": cursor}) + "\n").encode()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Result cache effectiveness"""
+    return ok(result_cache.stats())
+
+@app.get("/rollups/stats")
+async def rollup_stats():
+    """Rollup freshness and how many queries it answered"""
+    return ok(rollups.stats())
+
 @app.post("/timeline")
 async def timeline_endpoint(request: TimelineRequest):
     """
@@ -316,10 +407,10 @@ async def timeline_endpoint(request: TimelineRequest):
         parameters = {k: v for k, v in parameters.items() if v is not None}
 
         # Use the timeline template
-        sql = render_sql("timeline", parameters)
+        statement, args = bind_sql("timeline", parameters)
 
         # Execute query
-        results = await execute_query(sql)
+        results = await execute_query(statement, args)
 
         return ok(results)
 
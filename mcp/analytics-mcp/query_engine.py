@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Analytics SQL Query Engine
+==========================
+
+Whitelisted SQL templates for the analytics MCP service, compiled once at
+startup into parameterized statements ($1..$n). Values are always sent as
+bound parameters, so Postgres sees the same statement text for every call
+and each pooled connection can reuse its prepared plan.
+
+Jinja is only used at compile time to expand optional clauses: every
+combination of optional parameters becomes its own compiled variant.
+"""
+
+import base64
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from itertools import combinations
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from jinja2 import Template
+
+logger = logging.getLogger(__name__)
+
+# SQL Templates structure - whitelisted templates only.
+# Parameters render as bind placeholders; never quote them in the SQL text.
+SQL_TEMPLATES = {
+    "timeline": {
+        "query": """
+        SELECT
+            id,
+            account_id,
+            interaction_type,
+            content,
+            metadata,
+            created_at,
+            updated_at
+        FROM interactions
+        WHERE account_id = {{ account_id }}
+        {% if since %}
+        AND created_at >= {{ since }}
+        {% endif %}
+        {% if cursor_created_at %}
+        AND (created_at, id) < ({{ cursor_created_at }}, {{ cursor_id }})
+        {% endif %}
+        ORDER BY created_at DESC, id DESC
+        {% if limit %}
+        LIMIT {{ limit }}
+        {% endif %}
+        """,
+        "description": "Get timeline of interactions for an account",
+        "parameters": ["account_id", "since", "limit", "cursor_created_at", "cursor_id"],
+        "required": ["account_id"],
+        "types": {
+            "account_id": "text", "since": "timestamp", "limit": "int",
+            # The id is bound as decoded from the cursor (int for BIGSERIAL,
+            # str for uuid) so Postgres' inferred type for $n accepts it
+            "cursor_created_at": "timestamp", "cursor_id": "raw"
+        },
+        # Keyset pagination: rows sort by (created_at, id) descending
+        "keyset": {"columns": ["created_at", "id"], "params": ["cursor_created_at", "cursor_id"]}
+    },
+    "user_analytics": {
+        "query": """
+        SELECT
+            account_id,
+            COUNT(*) as total_interactions,
+            COUNT(DISTINCT DATE(created_at)) as active_days,
+            MAX(created_at) as last_activity,
+            MIN(created_at) as first_activity
+        FROM interactions
+        WHERE created_at >= {{ start_date }}
+        AND created_at <= {{ end_date }}
+        GROUP BY account_id
+        ORDER BY total_interactions DESC
+        {% if limit %}
+        LIMIT {{ limit }}
+        {% endif %}
+        """,
+        "description": "Get user analytics for date range",
+        "parameters": ["start_date", "end_date", "limit"],
+        "required": ["start_date", "end_date"],
+        "types": {"start_date": "timestamp", "end_date": "timestamp", "limit": "int"}
+    },
+    "interaction_summary": {
+        "query": """
+        SELECT
+            interaction_type,
+            COUNT(*) as count,
+            AVG(LENGTH(content)) as avg_content_length,
+            MIN(created_at) as earliest,
+            MAX(created_at) as latest
+        FROM interactions
+        WHERE created_at >= {{ start_date }}
+        AND created_at <= {{ end_date }}
+        {% if account_id %}
+        AND account_id = {{ account_id }}
+        {% endif %}
+        GROUP BY interaction_type
+        ORDER BY count DESC
+        """,
+        "description": "Get interaction summary statistics",
+        "parameters": ["start_date", "end_date", "account_id"],
+        "required": ["start_date", "end_date"],
+        "types": {"start_date": "timestamp", "end_date": "timestamp", "account_id": "text"}
+    }
+}
+
+class TemplateError(ValueError):
+    """Unknown template, missing/unknown parameter or uncoercible value"""
+
+@dataclass(frozen=True)
+class CompiledStatement:
+    """One parameterized variant of a template"""
+    template_id: str
+    sql: str
+    param_names: Tuple[str, ...]  # bind order: param_names[0] is $1
+
+class _Placeholder:
+    """Renders as the bind position of its parameter, assigned on first use"""
+
+    def __init__(self, name: str, order: List[str]):
+        self.name = name
+        self.order = order
+
+    def __str__(self) -> str:
+        if self.name not in self.order:
+            self.order.append(self.name)
+        return f"${self.order.index(self.name) + 1}"
+
+def _normalize_sql(sql: str) -> str:
+    return "\n".join(line.strip() for line in sql.splitlines() if line.strip())
+
+def _coerce(template_id: str, name: str, value: Any, kind: str) -> Any:
+    try:
+        if kind == "int":
+            if isinstance(value, bool):
+                raise TypeError("boolean is not an integer")
+            return int(value)
+        if kind == "timestamp":
+            # interactions.created_at is timestamptz; naive values are taken as UTC
+            if isinstance(value, datetime):
+                parsed = value
+            elif isinstance(value, date):
+                parsed = datetime(value.year, value.month, value.day)
+            else:
+                parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        if kind == "raw":
+            if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+                raise TypeError(f"unsupported value type {type(value).__name__}")
+            return value
+        return str(value)
+    except (TypeError, ValueError) as e:
+        raise TemplateError(f"Invalid value for parameter '{name}' of {template_id}: {e}")
+
+class QueryEngine:
+    """Compiled, parameterized forms of the whitelisted SQL templates"""
+
+    def __init__(self, templates: Dict[str, Dict[str, Any]] = SQL_TEMPLATES):
+        self.templates = templates
+        self.statements: Dict[Tuple[str, FrozenSet[str]], CompiledStatement] = {}
+
+    def compile(self) -> "QueryEngine":
+        """Render every optional-parameter combination of every template once"""
+        for template_id, config in self.templates.items():
+            template = Template(config["query"])
+            optional = [p for p in config["parameters"] if p not in config.get("required", [])]
+            keyset_params = set(config.get("keyset", {}).get("params", []))
+            for size in range(len(optional) + 1):
+                for present in combinations(optional, size):
+                    if keyset_params and 0 < len(keyset_params & set(present)) < len(keyset_params):
+                        continue  # keyset parameters only ever appear together
+                    order: List[str] = []
+                    names = list(config.get("required", [])) + list(present)
+                    sql = template.render(**{name: _Placeholder(name, order) for name in names})
+                    self.statements[(template_id, frozenset(present))] = CompiledStatement(
+                        template_id=template_id,
+                        sql=_normalize_sql(sql),
+                        param_names=tuple(order)
+                    )
+        logger.info(f"Compiled {len(self.statements)} SQL statements from {len(self.templates)} templates")
+        return self
+
+    def bind(self, template_id: str, parameters: Dict[str, Any]) -> Tuple[CompiledStatement, List[Any]]:
+        """Validate parameters and return the statement variant plus its bound args"""
+        if template_id not in self.templates:
+            raise TemplateError(f"Unknown template_id: {template_id}")
+
+        config = self.templates[template_id]
+        required = config.get("required", [])
+        for param in required:
+            if param not in parameters or parameters[param] is None:
+                raise TemplateError(f"Missing required parameter: {param}")
+
+        for key in parameters:
+            if key not in config["parameters"]:
+                raise TemplateError(f"Unknown parameter: {key}")
+
+        # Optional clauses are included when the value is truthy, as the Jinja `if` did
+        present = frozenset(
+            key for key, value in parameters.items()
+            if key not in required and value
+        )
+        statement = self.statements.get((template_id, present))
+        if statement is None:
+            raise TemplateError(f"Incomplete pagination cursor for {template_id}")
+        types = config.get("types", {})
+        args = [
+            _coerce(template_id, name, parameters[name], types.get(name, "text"))
+            for name in statement.param_names
+        ]
+        return statement, args
+
+    def all_statements(self) -> List[CompiledStatement]:
+        return list(self.statements.values())
+
+    def supports_keyset(self, template_id: str) -> bool:
+        return "keyset" in self.templates.get(template_id, {})
+
+    def cursor_params(self, template_id: str, cursor: str) -> Dict[str, Any]:
+        """Decode an opaque pagination cursor into the template's keyset parameters"""
+        if not self.supports_keyset(template_id):
+            raise TemplateError(f"Template {template_id} does not support cursors")
+        params = self.templates[template_id]["keyset"]["params"]
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, UnicodeDecodeError) as e:
+            raise TemplateError(f"Invalid cursor: {e}")
+        if not isinstance(values, list) or len(values) != len(params):
+            raise TemplateError("Invalid cursor")
+        return dict(zip(params, values))
+
+    def next_cursor(self, template_id: str, row: Dict[str, Any]) -> str:
+        """Opaque cursor positioned after ``row`` (the last row of a page)"""
+        columns = self.templates[template_id]["keyset"]["columns"]
+        # JSON-native values survive the round trip with their type; only
+        # datetimes (and other non-JSON types such as UUID) become strings
+        values = [
+            row[column].isoformat() if isinstance(row[column], datetime)
+            else row[column] if isinstance(row[column], (str, int, float)) and not isinstance(row[column], bool)
+            else str(row[column])
+            for column in columns
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+class ResultCache:
+    """Short-TTL LRU cache of query results keyed by statement and bound args.
+
+    ``invalidate()`` bumps a generation counter; a result computed under an
+    older generation is discarded instead of stored, so a query racing an
+    invalidation cannot repopulate the cache with stale rows.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 256, max_rows: int = 5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+
+    @staticmethod
+    def key(statement: CompiledStatement, args: List[Any]) -> Hashable:
+        return (statement.sql, tuple(args))
+
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry[0]:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, rows: List[Dict[str, Any]], generation: int):
+        if generation != self.generation or len(rows) > self.max_rows:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, rows)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self.generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl_seconds
+        }
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Analytics Rollups
+=================
+
+Per-day, per-account, per-interaction-type aggregates of ``interactions``,
+maintained incrementally by a refresh job, so the user_analytics and
+interaction_summary templates scan a few rows per day instead of every
+interaction in the range.
+
+Each refresh recomputes the last few days plus every older day recorded in
+``interaction_rollup_dirty_days`` by the interactions triggers (see
+scripts/database/migrations/20261018_150000_interaction_rollup_dirty_days.sql),
+so updates, deletes and late inserts for past days reach the rollup within one
+refresh interval. Without that migration only the lookback window is kept
+current.
+
+A query range is split into whole UTC days answered from the rollup and at
+most two partial-day edges answered from the raw table. Days are bucketed
+in UTC; the raw templates bucket active_days by the session time zone,
+which is UTC on Neon by default.
+"""
+
+import logging
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from query_engine import CompiledStatement
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = "interaction_daily_rollup"
+STATE_TABLE = "interaction_rollup_state"
+DIRTY_TABLE = "interaction_rollup_dirty_days"
+
+# Transaction-scoped advisory lock serializing rollup writers across workers
+ROLLUP_LOCK_KEY = 0x726F6C6C7570  # "rollup"
+LOCK_SQL = "SELECT pg_advisory_xact_lock($1)"
+
+# Created from the source table so account_id/interaction_type keep their real types
+CREATE_ROLLUP_SQL = f"""
+CREATE TABLE {ROLLUP_TABLE} AS
+SELECT
+    (created_at AT TIME ZONE 'UTC')::date AS day,
+    account_id,
+    interaction_type,
+    0::bigint AS interaction_count,
+    0::bigint AS content_length_sum,
+    0::bigint AS content_length_count,
+    created_at AS first_at,
+    created_at AS last_at
+FROM interactions
+WITH NO DATA
+"""
+
+CREATE_ROLLUP_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS {ROLLUP_TABLE}_day_account_idx ON {ROLLUP_TABLE} (day, account_id)"
+
+CREATE_STATE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    complete_through DATE NOT NULL
+)
+"""
+
+DELETE_DAYS_SQL = f"DELETE FROM {ROLLUP_TABLE} WHERE day >= $1 AND day < $2"
+
+DIRTY_DAYS_SQL = f"SELECT day FROM {DIRTY_TABLE} WHERE day < $1 ORDER BY day"
+
+# Cleared in the transaction that recomputes the days; a write committing
+# afterwards marks its day again
+CLEAR_DIRTY_DAYS_SQL = f"DELETE FROM {DIRTY_TABLE} WHERE day = ANY($1::date[])"
+CLEAR_DIRTY_RANGE_SQL = f"DELETE FROM {DIRTY_TABLE} WHERE day >= $1 AND day < $2"
+
+INSERT_DAYS_SQL = f"""
+INSERT INTO {ROLLUP_TABLE} (
+    day, account_id, interaction_type, interaction_count,
+    content_length_sum, content_length_count, first_at, last_at
+)
+SELECT
+    (created_at AT TIME ZONE 'UTC')::date,
+    account_id,
+    interaction_type,
+    COUNT(*),
+    COALESCE(SUM(LENGTH(content)), 0),
+    COUNT(content),
+    MIN(created_at),
+    MAX(created_at)
+FROM interactions
+WHERE created_at >= $1 AND created_at < $2
+GROUP BY 1, 2, 3
+"""
+
+UPSERT_STATE_SQL = f"""
+INSERT INTO {STATE_TABLE} (singleton, complete_through) VALUES (TRUE, $1)
+ON CONFLICT (singleton) DO UPDATE
+SET complete_through = GREATEST({STATE_TABLE}.complete_through, EXCLUDED.complete_through)
+"""
+
+# $1 start, $2 end (inclusive), [$3, $4) whole rollup days,
+# raw edges [$1, $5) and [$6, $2]
+_EDGE_FILTER = "((created_at >= $1 AND created_at < $5) OR (created_at >= $6 AND created_at <= $2))"
+
+USER_ANALYTICS_SQL = f"""
+WITH parts AS (
+    SELECT account_id, interaction_count AS interactions, day, first_at, last_at
+    FROM {ROLLUP_TABLE}
+    WHERE day >= $3 AND day < $4
+    UNION ALL
+    SELECT account_id, COUNT(*), (created_at AT TIME ZONE 'UTC')::date, MIN(created_at), MAX(created_at)
+    FROM interactions
+    WHERE {_EDGE_FILTER}
+    GROUP BY account_id, (created_at AT TIME ZONE 'UTC')::date
+)
+SELECT
+    account_id,
+    SUM(interactions)::bigint AS total_interactions,
+    COUNT(DISTINCT day) AS active_days,
+    MAX(last_at) AS last_activity,
+    MIN(first_at) AS first_activity
+FROM parts
+GROUP BY account_id
+ORDER BY total_interactions DESC
+LIMIT $7
+"""
+
+def _interaction_summary_sql(account_filter: bool) -> str:
+    account = "AND account_id = $7" if account_filter else ""
+    return f"""
+WITH parts AS (
+    SELECT interaction_type, interaction_count AS interactions,
+           content_length_sum AS length_sum, content_length_count AS length_count,
+           first_at, last_at
+    FROM {ROLLUP_TABLE}
+    WHERE day >= $3 AND day < $4
+    {account}
+    UNION ALL
+    SELECT interaction_type, COUNT(*), COALESCE(SUM(LENGTH(content)), 0), COUNT(content),
+           MIN(created_at), MAX(created_at)
+    FROM interactions
+    WHERE {_EDGE_FILTER}
+    {account}
+    GROUP BY interaction_type
+)
+SELECT
+    interaction_type,
+    SUM(interactions)::bigint AS count,
+    SUM(length_sum)::numeric / NULLIF(SUM(length_count), 0) AS avg_content_length,
+    MIN(first_at) AS earliest,
+    MAX(last_at) AS latest
+FROM parts
+GROUP BY interaction_type
+ORDER BY count DESC
+"""
+
+_EDGE_PARAMS = ("start_date", "end_date", "day_from", "day_to", "edge_low_end", "edge_high_start")
+
+ROLLUP_STATEMENTS = {
+    "user_analytics": CompiledStatement(
+        template_id="user_analytics",
+        sql=USER_ANALYTICS_SQL.strip(),
+        param_names=_EDGE_PARAMS + ("limit",)
+    ),
+    "interaction_summary": CompiledStatement(
+        template_id="interaction_summary",
+        sql=_interaction_summary_sql(account_filter=False).strip(),
+        param_names=_EDGE_PARAMS
+    ),
+    "interaction_summary:account": CompiledStatement(
+        template_id="interaction_summary",
+        sql=_interaction_summary_sql(account_filter=True).strip(),
+        param_names=_EDGE_PARAMS + ("account_id",)
+    ),
+}
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min, tzinfo=timezone.utc)
+
+class RollupManager:
+    """Maintains the daily rollup and rewrites eligible template queries onto it"""
+
+    def __init__(self, lookback_days: int = 1, batch_days: int = 7):
+        self.lookback_days = lookback_days
+        self.batch_days = batch_days
+        self.complete_through: Optional[date] = None  # rollup holds every day before this
+        self.tracks_dirty_days = False  # the dirty-days migration is applied
+        self.last_refresh: Optional[datetime] = None
+        self.rollup_queries = 0
+        self.raw_queries = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.complete_through is not None
+
+    async def ensure_schema(self, connection):
+        """Create the rollup and state tables if missing, and load the refresh state"""
+        async with connection.transaction():
+            await connection.execute(LOCK_SQL, ROLLUP_LOCK_KEY)
+            if await connection.fetchval("SELECT to_regclass($1)", ROLLUP_TABLE) is None:
+                await connection.execute(CREATE_ROLLUP_SQL)
+            await connection.execute(CREATE_ROLLUP_INDEX_SQL)
+            await connection.execute(CREATE_STATE_SQL)
+        self.complete_through = await connection.fetchval(f"SELECT complete_through FROM {STATE_TABLE}")
+        self.tracks_dirty_days = await connection.fetchval("SELECT to_regclass($1)", DIRTY_TABLE) is not None
+        if not self.tracks_dirty_days:
+            logger.warning(
+                f"{DIRTY_TABLE} missing - changes to interactions older than "
+                f"{self.lookback_days} day(s) will not reach the rollups"
+            )
+
+    async def refresh(self, connection) -> int:
+        """Recompute rollup days from the last refresh (minus lookback) through today.
+
+        Older days marked dirty since the last refresh are recomputed first.
+        The first run backfills from the oldest interaction. Work is done
+        ``batch_days`` at a time, each batch in its own transaction that
+        replaces its days and advances the state, so an interrupted backfill
+        resumes where it stopped. Each batch takes ROLLUP_LOCK_KEY first, so
+        workers refreshing concurrently replace the same days one after the
+        other instead of interleaving their deletes and inserts. Returns the
+        number of days recomputed.
+        """
+        today = await connection.fetchval("SELECT (now() AT TIME ZONE 'UTC')::date")
+        state = await connection.fetchval(f"SELECT complete_through FROM {STATE_TABLE}")
+        if state is None:
+            oldest = await connection.fetchval(
+                "SELECT (min(created_at) AT TIME ZONE 'UTC')::date FROM interactions"
+            )
+            day = oldest or today
+        else:
+            day = min(state, today) - timedelta(days=self.lookback_days)
+
+        recomputed = 0
+        if self.tracks_dirty_days:
+            dirty = [row["day"] for row in await connection.fetch(DIRTY_DAYS_SQL, day)]
+            for i in range(0, len(dirty), self.batch_days):
+                batch = dirty[i:i + self.batch_days]
+                async with connection.transaction():
+                    await connection.execute(LOCK_SQL, ROLLUP_LOCK_KEY)
+                    await connection.execute(CLEAR_DIRTY_DAYS_SQL, batch)
+                    for dirty_day in batch:
+                        next_day = dirty_day + timedelta(days=1)
+                        await connection.execute(DELETE_DAYS_SQL, dirty_day, next_day)
+                        await connection.execute(
+                            INSERT_DAYS_SQL, _utc_midnight(dirty_day), _utc_midnight(next_day)
+                        )
+                recomputed += len(batch)
+
+        while day <= today:
+            batch_end = min(day + timedelta(days=self.batch_days), today + timedelta(days=1))
+            async with connection.transaction():
+                await connection.execute(LOCK_SQL, ROLLUP_LOCK_KEY)
+                if self.tracks_dirty_days:
+                    await connection.execute(CLEAR_DIRTY_RANGE_SQL, day, batch_end)
+                await connection.execute(DELETE_DAYS_SQL, day, batch_end)
+                await connection.execute(INSERT_DAYS_SQL, _utc_midnight(day), _utc_midnight(batch_end))
+                # Today is still filling up; only days before it are complete
+                await connection.execute(UPSERT_STATE_SQL, min(batch_end, today))
+            recomputed += (batch_end - day).days
+            day = batch_end
+
+        self.complete_through = today
+        self.last_refresh = datetime.now(timezone.utc)
+        return recomputed
+
+    def plan(self, template_id: str, values: Dict[str, Any]) -> Optional[Tuple[CompiledStatement, List[Any]]]:
+        """Rewrite a bound template onto the rollup when its range covers a whole day.
+
+        ``values`` are the template's coerced parameters (tz-aware datetimes).
+        Returns None when the raw template should run instead.
+        """
+        if not self.ready or template_id not in ("user_analytics", "interaction_summary"):
+            return None
+
+        start = values["start_date"].astimezone(timezone.utc)
+        end = values["end_date"].astimezone(timezone.utc)
+
+        # Whole days are [day_from, day_to); end is inclusive so its day is an edge
+        day_from = start.date() if start == _utc_midnight(start.date()) else start.date() + timedelta(days=1)
+        day_to = min(end.date(), self.complete_through)
+        if day_from >= day_to:
+            self.raw_queries += 1
+            return None
+
+        params = {
+            "start_date": start,
+            "end_date": end,
+            "day_from": day_from,
+            "day_to": day_to,
+            "edge_low_end": _utc_midnight(day_from),
+            "edge_high_start": _utc_midnight(day_to),
+            "limit": values.get("limit") or None,  # LIMIT NULL is no limit
+            "account_id": values.get("account_id"),
+        }
+        key = template_id
+        if template_id == "interaction_summary" and values.get("account_id"):
+            key = "interaction_summary:account"
+        statement = ROLLUP_STATEMENTS[key]
+        self.rollup_queries += 1
+        return statement, [params[name] for name in statement.param_names]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "complete_through": self.complete_through.isoformat() if self.complete_through else None,
+            "tracks_dirty_days": self.tracks_dirty_days,
+            "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "rollup_queries": self.rollup_queries,
+            "raw_queries": self.raw_queries
+        }
@@ -4,6 +4,7 @@ Handles customer support interactions and webhook events
 """
 
 import os
+import json
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
@@ -24,6 +25,11 @@ except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
     from platform.common.service_base import create_app
 
+from webhook_queue import WebhookQueue, WebhookWorkerPool
+from intercom_analytics import (
+    DailyAggregateCache, RateLimiter, response_time_aggregates, summarize
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,15 +41,48 @@ INTERCOM_WEBHOOK_SECRET = os.getenv("INTERCOM_WEBHOOK_SECRET", "")
 PORTKEY_API_KEY = os.getenv("PORTKEY_API_KEY", "")
 SERVICE_NAME = "support-mcp"
 SERVICE_VERSION = "1.0.0"
+WEBHOOK_QUEUE_PATH = os.getenv("WEBHOOK_QUEUE_PATH", "support_webhooks.db")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "20"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+INTERCOM_RATE_LIMIT_PER_SECOND = float(os.getenv("INTERCOM_RATE_LIMIT_PER_SECOND", "20"))
+INTERCOM_MAX_CONCURRENCY = int(os.getenv("INTERCOM_MAX_CONCURRENCY", "8"))
+INTERCOM_MAX_PAGES = int(os.getenv("INTERCOM_MAX_PAGES", "200"))
+
+# Shared Intercom client, rate limit and cached per-day analytics
+intercom_client: Optional[httpx.AsyncClient] = None
+intercom_rate_limiter = RateLimiter(INTERCOM_RATE_LIMIT_PER_SECOND, burst=max(1, int(INTERCOM_RATE_LIMIT_PER_SECOND)))
+response_time_cache = DailyAggregateCache()
+
+# Durable webhook intake; workers are started with the app
+webhook_queue = WebhookQueue(WEBHOOK_QUEUE_PATH, max_attempts=WEBHOOK_MAX_ATTEMPTS)
+webhook_workers: Optional[WebhookWorkerPool] = None
 
 # Startup and shutdown handlers
 async def startup_handler():
     """Startup event handler"""
+    global webhook_workers
     logger.info(f"Starting {SERVICE_NAME} v{SERVICE_VERSION}")
+    get_intercom_client()
+    webhook_queue.open()
+    webhook_workers = WebhookWorkerPool(
+        webhook_queue,
+        process_webhook_event,
+        workers=WEBHOOK_WORKERS,
+        batch_size=WEBHOOK_BATCH_SIZE
+    )
+    webhook_workers.start()
 
 async def shutdown_handler():
     """Shutdown event handler"""
     logger.info(f"Shutting down {SERVICE_NAME}")
+    global intercom_client
+    if webhook_workers:
+        await webhook_workers.stop()
+    webhook_queue.close()
+    if intercom_client:
+        await intercom_client.aclose()
+        intercom_client = None
 
 # Initialize FastAPI app using factory
 app = create_app(
@@ -107,38 +146,75 @@ def verify_webhook_signature(body: bytes, signature: str) -> bool:
     
     return hmac.compare_digest(expected_signature, signature)
 
+def get_intercom_client() -> httpx.AsyncClient:
+    """Pooled Intercom client, created on first use and closed at shutdown"""
+    global intercom_client
+    if intercom_client is None:
+        intercom_client = httpx.AsyncClient(
+            base_url="https://api.intercom.io/",
+            headers={
+                "Authorization": f"Bearer {INTERCOM_ACCESS_TOKEN}",
+                "Accept": "application/json",
+                "Content-Type": "application/json"
+            },
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=INTERCOM_MAX_CONCURRENCY * 2,
+                max_keepalive_connections=INTERCOM_MAX_CONCURRENCY
+            )
+        )
+    return intercom_client
+
+async def send_intercom_request(
+    method: str,
+    endpoint: str,
+    data: Optional[Dict] = None,
+    params: Optional[Dict[str, Any]] = None,
+    max_retries: int = 3
+) -> httpx.Response:
+    """Send a rate-limited Intercom request, backing off on 429 responses"""
+    if method not in ("GET", "POST", "PUT", "DELETE"):
+        raise ValueError(f"Unsupported HTTP method: {method}")
+    
+    client = get_intercom_client()
+    for attempt in range(max_retries + 1):
+        await intercom_rate_limiter.acquire()
+        response = await client.request(
+            method,
+            endpoint,
+            params=params,
+            json=data if method in ("POST", "PUT") else None
+        )
+        if response.status_code != 429 or attempt == max_retries:
+            break
+        
+        # X-RateLimit-Reset is the unix time the window resets
+        reset_at = response.headers.get("X-RateLimit-Reset")
+        wait = max(1.0, float(reset_at) - datetime.utcnow().timestamp()) if reset_at else 2.0 ** attempt
+        logger.warning(f"Intercom rate limit hit on {endpoint}; pausing {wait:.1f}s")
+        intercom_rate_limiter.pause(wait)
+    
+    response.raise_for_status()
+    return response
+
 async def make_intercom_request(
     method: str,
     endpoint: str,
-    data: Optional[Dict] = None
+    data: Optional[Dict] = None,
+    params: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """Make authenticated request to Intercom API"""
-    headers = {
-        "Authorization": f"Bearer {INTERCOM_ACCESS_TOKEN}",
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    
-    async with httpx.AsyncClient() as client:
-        url = f"https://api.intercom.io/{endpoint}"
-        
-        try:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                response = await client.post(url, headers=headers, json=data)
-            elif method == "PUT":
-                response = await client.put(url, headers=headers, json=data)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-            
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            logger.error(f"Intercom API error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Intercom API error: {str(e)}")
+    try:
+        response = await send_intercom_request(method, endpoint, data, params)
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.error(f"Intercom API error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Intercom API error: {str(e)}")
+
+async def fetch_conversation_page(params: Dict[str, Any]) -> Dict[str, Any]:
+    """One page of the conversation list, for the analytics crawler"""
+    response = await send_intercom_request("GET", "conversations", params=params)
+    return response.json()
 
 
 # Conversation endpoints
@@ -310,7 +386,7 @@ async def handle_webhook(
     request: Request,
     x_hub_signature: Optional[str] = Header(None)
 ):
-    """Handle Intercom webhook events"""
+    """Accept an Intercom webhook event into the durable queue and acknowledge it"""
     body = await request.body()
     
     # Verify webhook signature
@@ -318,25 +394,49 @@ async def handle_webhook(
         raise HTTPException(status_code=401, detail="Invalid webhook signature")
     
     try:
-        event = await request.json()
-        event_type = event.get("type")
-        topic = event.get("topic", "")
-        
-        logger.info(f"Received webhook event: {event_type} - {topic}")
-        
-        # Handle different event types
-        if topic.startswith("conversation."):
-            await handle_conversation_event(event)
-        elif topic.startswith("user."):
-            await handle_user_event(event)
-        elif topic.startswith("contact."):
-            await handle_contact_event(event)
-        
-        return {"status": "processed", "event_id": event.get("id")}
+        text = body.decode("utf-8")
+        event = json.loads(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook body is not valid JSON")
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=400, detail="Webhook body must be a JSON object")
+    
+    # Intercom notification IDs are stable across redeliveries
+    event_id = event.get("id") or hashlib.sha256(body).hexdigest()
+    topic = event.get("topic", "")
     
+    if webhook_workers is None:
+        raise HTTPException(status_code=503, detail="Webhook queue not ready")
+    
+    try:
+        accepted = await webhook_workers.submit(event_id, topic, text)
     except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing webhook: {str(e)}")
+        logger.error(f"Error queueing webhook: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing webhook: {str(e)}")
+    
+    logger.info(f"{'Queued' if accepted else 'Duplicate'} webhook event: {event_id} - {topic}")
+    return {"status": "queued" if accepted else "duplicate", "event_id": event_id}
+
+@app.get("/webhooks/metrics")
+async def webhook_metrics():
+    """Webhook queue depth, throughput and ingest-to-processed lag"""
+    if webhook_workers is None:
+        raise HTTPException(status_code=503, detail="Webhook queue not ready")
+    return await webhook_workers.metrics()
+
+async def process_webhook_event(event: Dict[str, Any]):
+    """Route a queued webhook event to its handler (run by the queue workers)"""
+    topic = event.get("topic", "")
+    
+    logger.info(f"Processing webhook event: {event.get('type')} - {topic}")
+    
+    # Handle different event types
+    if topic.startswith("conversation."):
+        await handle_conversation_event(event)
+    elif topic.startswith("user."):
+        await handle_user_event(event)
+    elif topic.startswith("contact."):
+        await handle_contact_event(event)
 
 async def handle_conversation_event(event: Dict[str, Any]):
     """Handle conversation-related webhook events"""
@@ -418,40 +518,27 @@ async def search_users(
 # Analytics endpoints
 @app.get("/api/analytics/response-time")
 async def get_response_time_analytics(days: int = 7):
-    """Get average response time analytics"""
-    # This is a simplified example - Intercom's actual analytics API may differ
-    from_timestamp = int((datetime.utcnow().timestamp() - days * 24 * 3600))
+    """Get response time analytics over every conversation in the period"""
+    if days < 1 or days > 90:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 90")
     
     try:
-        conversations = await make_intercom_request(
-            "GET",
-            f"conversations?created_since={from_timestamp}&per_page=100"
-        )
-        
-        # Calculate metrics
-        total_response_time = 0
-        conversations_with_response = 0
-        
-        for convo in conversations.get("conversations", []):
-            if convo.get("first_contact_reply_at"):
-                created = convo.get("created_at", 0)
-                replied = convo.get("first_contact_reply_at", 0)
-                if replied > created:
-                    total_response_time += (replied - created)
-                    conversations_with_response += 1
-        
-        avg_response_time = (
-            total_response_time / conversations_with_response
-            if conversations_with_response > 0
-            else 0
+        aggregates, recomputed, truncated = await response_time_aggregates(
+            fetch_conversation_page,
+            response_time_cache,
+            days,
+            concurrency=INTERCOM_MAX_CONCURRENCY,
+            max_pages=INTERCOM_MAX_PAGES
         )
+        summary = summarize(aggregates)
         
         return {
             "period_days": days,
-            "total_conversations": conversations.get("total_count", 0),
-            "conversations_with_response": conversations_with_response,
-            "average_response_time_seconds": avg_response_time,
-            "average_response_time_hours": avg_response_time / 3600,
+            **summary,
+            "average_response_time_hours": summary["average_response_time_seconds"] / 3600,
+            "days_recomputed": recomputed,
+            "truncated": truncated,  # INTERCOM_MAX_PAGES reached; totals are partial
+            "days_cached": len(response_time_cache),
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -0,0 +1,265 @@
+"""
+Intercom Analytics - Paginated conversation crawling and streaming response-time aggregates
+
+Conversations are crawled page by page (numbered pages concurrently, cursor
+pages sequentially) under a shared rate limit and folded into per-day
+histograms as they arrive, so no page of results is kept in memory. Completed
+days are cached; only the current day is recomputed on each request.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+FetchPage = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+class RateLimiter:
+    """Token bucket shared by every Intercom call"""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop issuing calls for a while, e.g. after a 429"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        # Refill from the end of the pause, not across it
+        self._updated = self._paused_until
+
+class ResponseTimeHistogram:
+    """Mergeable log-bucket histogram; percentiles are within ~2.5% of the true value"""
+
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, seconds: float):
+        index = int(math.log(max(seconds, 1.0), self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other: "ResponseTimeHistogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = p * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Geometric midpoint of the bucket, clamped to the observed range
+                value = self.GROWTH ** (index + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+@dataclass
+class DailyAggregate:
+    """Response-time aggregate for conversations created on one UTC day"""
+    day: date
+    conversations: int = 0
+    with_response: int = 0
+    histogram: ResponseTimeHistogram = field(default_factory=ResponseTimeHistogram)
+    computed_at: float = field(default_factory=time.monotonic)
+
+    def add_conversation(self, convo: Dict[str, Any]):
+        self.conversations += 1
+        created = convo.get("created_at") or 0
+        replied = convo.get("first_contact_reply_at") or 0
+        if replied > created:
+            self.with_response += 1
+            self.histogram.add(replied - created)
+
+class DailyAggregateCache:
+    """Completed days' aggregates; the current day is never cached.
+
+    A conversation can get its first reply after its day was cached, so
+    completed days expire after ``ttl_seconds`` to pick up late replies.
+    """
+
+    def __init__(self, ttl_seconds: float = 6 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self._days: Dict[date, DailyAggregate] = {}
+
+    def get(self, day: date) -> Optional[DailyAggregate]:
+        aggregate = self._days.get(day)
+        if aggregate and time.monotonic() - aggregate.computed_at < self.ttl_seconds:
+            return aggregate
+        return None
+
+    def put(self, aggregate: DailyAggregate):
+        self._days[aggregate.day] = aggregate
+
+    def prune(self, oldest: date):
+        for day in [d for d in self._days if d < oldest]:
+            del self._days[day]
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+@dataclass
+class CrawlState:
+    """Set by crawl_conversations; ``truncated`` means max_pages cut the crawl short"""
+    truncated: bool = False
+
+async def crawl_conversations(
+    fetch_page: FetchPage,
+    created_since: int,
+    per_page: int = 150,
+    concurrency: int = 8,
+    max_pages: int = 200,
+    state: Optional[CrawlState] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every conversation created since ``created_since`` (unix seconds).
+
+    The first page reveals the pagination style. Numbered pages are fetched
+    concurrently (bounded by ``concurrency``) and yielded as they complete;
+    cursor pagination (``pages.next.starting_after``) is inherently sequential.
+    If ``state`` is given, it records whether pages were left unfetched.
+    """
+    state = state if state is not None else CrawlState()
+    base_params = {"created_since": created_since, "per_page": per_page}
+    first = await fetch_page({**base_params, "page": 1})
+    for convo in first.get("conversations", []):
+        yield convo
+
+    pages = first.get("pages") or {}
+    next_page = pages.get("next")
+    if isinstance(next_page, dict) and next_page.get("starting_after"):
+        cursor = next_page["starting_after"]
+        fetched = 1
+        while cursor and fetched < max_pages:
+            page = await fetch_page({**base_params, "starting_after": cursor})
+            fetched += 1
+            for convo in page.get("conversations", []):
+                yield convo
+            following = (page.get("pages") or {}).get("next")
+            cursor = following.get("starting_after") if isinstance(following, dict) else None
+        state.truncated = bool(cursor)
+        return
+
+    reported_pages = int(pages.get("total_pages") or 1)
+    state.truncated = reported_pages > max_pages
+    total_pages = min(reported_pages, max_pages)
+    if total_pages <= 1:
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(number: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await fetch_page({**base_params, "page": number})
+
+    tasks = [asyncio.create_task(fetch(number)) for number in range(2, total_pages + 1)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            page = await next_done
+            for convo in page.get("conversations", []):
+                yield convo
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def utc_day(timestamp: int) -> date:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).date()
+
+def day_start(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+async def response_time_aggregates(
+    fetch_page: FetchPage,
+    cache: DailyAggregateCache,
+    days: int,
+    today: Optional[date] = None,
+    **crawl_options
+) -> Tuple[List[DailyAggregate], int, bool]:
+    """Per-day aggregates for the last ``days`` UTC days (including today).
+
+    Only days missing from the cache are crawled, starting from the earliest
+    missing one. Days from a crawl that hit ``max_pages`` are incomplete and
+    are not cached. Returns the aggregates, the number of days recomputed and
+    whether the crawl was truncated.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    window = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    cache.prune(window[0])
+
+    aggregates = {day: cache.get(day) for day in window}
+    missing = [day for day, aggregate in aggregates.items() if aggregate is None]
+    state = CrawlState()
+    if missing:
+        fresh = {day: DailyAggregate(day=day) for day in missing}
+        crawl = crawl_conversations(fetch_page, day_start(missing[0]), state=state, **crawl_options)
+        async for convo in crawl:
+            target = fresh.get(utc_day(convo.get("created_at") or 0))
+            if target is not None:
+                target.add_conversation(convo)
+        for day, aggregate in fresh.items():
+            aggregates[day] = aggregate
+            if day < today and not state.truncated:
+                cache.put(aggregate)
+
+    return [aggregates[day] for day in window], len(missing), state.truncated
+
+def summarize(aggregates: Iterable[DailyAggregate]) -> Dict[str, Any]:
+    """Merge daily aggregates into window totals and percentiles"""
+    histogram = ResponseTimeHistogram()
+    conversations = 0
+    with_response = 0
+    for aggregate in aggregates:
+        histogram.merge(aggregate.histogram)
+        conversations += aggregate.conversations
+        with_response += aggregate.with_response
+
+    return {
+        "total_conversations": conversations,
+        "conversations_with_response": with_response,
+        "average_response_time_seconds": histogram.mean,
+        "percentiles_seconds": {
+            "p50": histogram.percentile(0.50),
+            "p90": histogram.percentile(0.90),
+            "p95": histogram.percentile(0.95),
+            "p99": histogram.percentile(0.99)
+        }
+    }
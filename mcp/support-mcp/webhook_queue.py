@@ -0,0 +1,318 @@
+"""
+Webhook Queue - Durable, deduplicating intake for Intercom webhook events
+
+Webhook bodies are written to a local SQLite queue as soon as their signature
+is verified, so the HTTP request is acknowledged without waiting for event
+handling. A pool of workers drains the queue in batches and retries failures
+with exponential backoff.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_events (
+    event_id TEXT PRIMARY KEY,
+    topic TEXT,
+    body TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    processed_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS webhook_events_ready ON webhook_events (status, next_attempt_at);
+"""
+
+@dataclass
+class QueuedEvent:
+    """An event claimed by a worker"""
+    event_id: str
+    topic: str
+    body: Dict[str, Any]
+    received_at: float
+    attempts: int
+
+class WebhookQueue:
+    """SQLite-backed event queue; the event ID primary key doubles as the dedupe set.
+
+    Processed events are kept for ``retention_seconds`` so redeliveries in
+    that window are recognised as duplicates. A claim is a lease of
+    ``lease_seconds`` (stored in next_attempt_at); only events whose lease
+    has expired are taken back from another worker or process.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 2.0,
+        retry_max_seconds: float = 300.0,
+        retention_seconds: float = 7 * 24 * 3600,
+        lease_seconds: float = 600.0
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    # Synchronous operations, run in a thread via the async wrappers below
+
+    def _enqueue(self, event_id: str, topic: str, body: str, received_at: float) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO webhook_events (event_id, topic, body, received_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (event_id, topic, body, received_at, received_at)
+            )
+            return cursor.rowcount == 1
+
+    def _claim(self, limit: int) -> List[QueuedEvent]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Events whose claim lease expired (their worker died mid-batch)
+                # are taken back like pending ones
+                rows = self._conn.execute(
+                    "SELECT event_id, topic, body, received_at, attempts FROM webhook_events "
+                    "WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                    "OR (status = 'processing' AND next_attempt_at <= ?) "
+                    "ORDER BY received_at LIMIT ?",
+                    (now, now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE webhook_events SET status = 'processing', next_attempt_at = ? WHERE event_id = ?",
+                    [(now + self.lease_seconds, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            QueuedEvent(event_id=row[0], topic=row[1] or "", body=json.loads(row[2]),
+                        received_at=row[3], attempts=row[4])
+            for row in rows
+        ]
+
+    def _complete(self, event_ids: List[str], processed_at: float):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "UPDATE webhook_events SET status = 'done', processed_at = ?, last_error = NULL "
+                    "WHERE event_id = ?",
+                    [(processed_at, event_id) for event_id in event_ids]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _fail(self, event: QueuedEvent, error: str) -> bool:
+        """Schedule a retry; returns False when the event is moved to the dead letter state"""
+        attempts = event.attempts + 1
+        dead = attempts >= self.max_attempts
+        delay = min(self.retry_base_seconds * (2 ** (attempts - 1)), self.retry_max_seconds)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE webhook_events SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE event_id = ?",
+                ("dead" if dead else "pending", attempts, time.time() + delay, error[:1000], event.event_id)
+            )
+        return not dead
+
+    def _prune(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM webhook_events WHERE status = 'done' AND processed_at < ?",
+                (time.time() - self.retention_seconds,)
+            ).rowcount
+
+    def _counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM webhook_events GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    # Async API
+
+    async def enqueue(self, event_id: str, topic: str, body: str) -> bool:
+        """Store an event; returns False if this event ID was already received"""
+        return await asyncio.to_thread(self._enqueue, event_id, topic, body, time.time())
+
+    async def claim(self, limit: int) -> List[QueuedEvent]:
+        return await asyncio.to_thread(self._claim, limit)
+
+    async def complete(self, event_ids: List[str]):
+        if event_ids:
+            await asyncio.to_thread(self._complete, event_ids, time.time())
+
+    async def fail(self, event: QueuedEvent, error: str) -> bool:
+        return await asyncio.to_thread(self._fail, event, error)
+
+    async def prune(self) -> int:
+        return await asyncio.to_thread(self._prune)
+
+    async def counts(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._counts)
+
+class WebhookWorkerPool:
+    """Workers that drain a WebhookQueue in batches and record ingest-to-processed lag"""
+
+    def __init__(
+        self,
+        queue: WebhookQueue,
+        handler: EventHandler,
+        workers: int = 4,
+        batch_size: int = 20,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self._lags: deque = deque(maxlen=1000)  # seconds, most recent processed events
+
+    async def submit(self, event_id: str, topic: str, body: str) -> bool:
+        """Durably enqueue an event and wake a worker; False for a duplicate delivery"""
+        accepted = await self.queue.enqueue(event_id, topic, body)
+        if accepted:
+            self.received += 1
+            self._wakeup.set()
+        else:
+            self.duplicates += 1
+        return accepted
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, worker_id: int):
+        while True:
+            # Clear before claiming so an enqueue during the claim still wakes us
+            self._wakeup.clear()
+            try:
+                batch = await self.queue.claim(self.batch_size)
+            except Exception as e:
+                logger.error(f"Webhook worker {worker_id} could not claim events: {e}")
+                batch = []
+
+            if not batch:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.batches += 1
+            try:
+                await self._process_batch(batch)
+            except Exception as e:
+                # Claimed events stay in processing until their lease expires,
+                # then any worker claims them again
+                logger.error(f"Webhook worker {worker_id} failed to record batch results: {e}")
+
+    async def _process_batch(self, batch: List[QueuedEvent]):
+        results = await asyncio.gather(
+            *(self.handler(event.body) for event in batch),
+            return_exceptions=True
+        )
+
+        succeeded = []
+        for event, result in zip(batch, results):
+            if isinstance(result, Exception):
+                if await self.queue.fail(event, str(result)):
+                    self.retried += 1
+                    logger.warning(f"Webhook event {event.event_id} ({event.topic}) failed, will retry: {result}")
+                else:
+                    self.dead_lettered += 1
+                    logger.error(f"Webhook event {event.event_id} ({event.topic}) dead-lettered: {result}")
+            else:
+                succeeded.append(event)
+
+        await self.queue.complete([event.event_id for event in succeeded])
+        now = time.time()
+        for event in succeeded:
+            self._lags.append(now - event.received_at)
+        self.processed += len(succeeded)
+
+    async def _janitor(self):
+        """Drop processed events past the dedupe retention window"""
+        while True:
+            await asyncio.sleep(3600)
+            try:
+                pruned = await self.queue.prune()
+                if pruned:
+                    logger.info(f"Pruned {pruned} processed webhook events")
+            except Exception as e:
+                logger.warning(f"Webhook queue prune failed: {e}")
+
+    async def metrics(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+
+        def percentile(p: float) -> Optional[float]:
+            if not lags:
+                return None
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))], 3)
+
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "batches": self.batches,
+            "queue": await self.queue.counts(),
+            "ingest_to_processed_lag_seconds": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(lags[-1], 3) if lags else None,
+                "samples": len(lags)
+            }
+        }
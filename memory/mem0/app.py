@@ -1,13 +1,17 @@
 import asyncio
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Request
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import json
+import math
 import os
+import re
+import time
+import zlib
 from datetime import datetime, timedelta
 import uuid
 import redis.asyncio as redis
-from collections import deque
+from collections import Counter, OrderedDict, deque
 
 app = FastAPI(title="Mem0 Memory Service")
 
@@ -30,13 +34,171 @@ class MemoryResponse(BaseModel):
     metadata: Dict[str, Any]
     created_at: str
     expires_at: Optional[str]
+    score: Optional[float] = None
 
 class ConversationContext(BaseModel):
     messages: List[Dict[str, str]]
     max_tokens: Optional[int] = 1000
 
-# In-memory buffer for recent interactions (backup to Redis)
-memory_buffer = {}
+# Hot buffer of recent interactions. The source of truth is a capped Redis
+# list per actor (shared by all workers); each worker keeps a bounded LRU
+# over actors in front of it.
+HOT_BUFFER_PER_ACTOR = 20
+HOT_BUFFER_MAX_ACTORS = int(os.getenv("MEM0_HOT_BUFFER_MAX_ACTORS", "1000"))
+HOT_BUFFER_MAX_BYTES = int(os.getenv("MEM0_HOT_BUFFER_MAX_BYTES", str(16 * 1024 * 1024)))
+HOT_BUFFER_FRESHNESS = float(os.getenv("MEM0_HOT_BUFFER_FRESHNESS_SECONDS", "2"))
+HOT_BUFFER_REDIS_TTL = 86400
+
+class HotMemoryBuffer:
+    """LRU over actors with an entry count and approximate byte ceiling.
+    
+    Entries older than `freshness` seconds are treated as misses so writes
+    made by other workers show up quickly; stale entries are still served
+    if Redis is unavailable.
+    """
+    
+    def __init__(self, max_actors: int, max_bytes: int, freshness: float):
+        self.max_actors = max_actors
+        self.max_bytes = max_bytes
+        self.freshness = freshness
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (items, bytes, loaded_at)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def _size(items: List[Dict[str, Any]]) -> int:
+        return sum(len(item.get("content", "")) + 128 for item in items)
+    
+    def get(self, key: str, allow_stale: bool = False) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        items, _, loaded_at = entry
+        if time.monotonic() - loaded_at > self.freshness and not allow_stale:
+            return None
+        self._entries.move_to_end(key)
+        return items
+    
+    def put(self, key: str, items: List[Dict[str, Any]]):
+        self.discard(key)
+        items = items[-HOT_BUFFER_PER_ACTOR:]
+        size = self._size(items)
+        self._entries[key] = (items, size, time.monotonic())
+        self.bytes += size
+        while self._entries and (len(self._entries) > self.max_actors or self.bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+    
+    def append(self, key: str, item: Dict[str, Any]):
+        """Write-through for this worker's own stores (only if already cached)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.put(key, entry[0] + [item])
+    
+    def discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "actors": len(self._entries),
+            "items": sum(len(items) for items, _, _ in self._entries.values()),
+            "bytes": self.bytes,
+            "max_actors": self.max_actors,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale_served": self.stale_served,
+            "evictions": self.evictions
+        }
+
+memory_buffer = HotMemoryBuffer(HOT_BUFFER_MAX_ACTORS, HOT_BUFFER_MAX_BYTES, HOT_BUFFER_FRESHNESS)
+
+def recent_key(tenant_id: str, actor_id: str) -> str:
+    return f"recent:{tenant_id}:{actor_id}"
+
+# Hybrid search: a per-actor inverted term index in Redis plus a sparse
+# hashed character-trigram vector stored on each memory for similarity.
+# Index entries are sorted sets of memory ids scored by expiry (epoch seconds,
+# inf for memories without a TTL), so expired refs can be dropped by score and
+# each index key expires with the last of its memories.
+VECTOR_DIM = 1024
+SEARCH_CANDIDATE_LIMIT = 500  # max term-index candidates scored per query
+SEARCH_RECENT_SCAN = 100  # recent memories always scored (vector-only matches)
+SEARCH_VECTOR_WEIGHT = 0.5
+SEARCH_MIN_SCORE = 0.2
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "to", "was", "with"
+}
+
+# Per-endpoint latency samples (ms) for p50/p95/p99 reporting
+LATENCY_WINDOW = 1000
+endpoint_latencies: Dict[str, deque] = {}
+
+def memory_key(tenant_id: str, actor_id: str, memory_id: str) -> str:
+    return f"memory:{tenant_id}:{actor_id}:{memory_id}"
+
+def index_key(tenant_id: str, actor_id: str, term: str) -> str:
+    return f"memidx:{tenant_id}:{actor_id}:{term}"
+
+# KEYS: index keys of the memory's terms; ARGV: memory id, expiry score, now.
+# Adds the ref, prunes expired refs, then expires the key with its last ref.
+INDEX_MEMORY_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, ARGV[2], ARGV[1])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', ARGV[3])
+    local last = redis.call('ZRANGE', key, -1, -1, 'WITHSCORES')
+    if last[2] == 'inf' then
+        redis.call('PERSIST', key)
+    else
+        redis.call('EXPIREAT', key, math.ceil(tonumber(last[2])))
+    end
+end
+return #KEYS
+"""
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, de-duplicated index terms for a piece of text"""
+    tokens = TOKEN_RE.findall(text.lower())
+    return list(dict.fromkeys(t for t in tokens if len(t) > 1 and t not in STOPWORDS))
+
+def embed_text(text: str) -> Dict[int, float]:
+    """Sparse L2-normalised vector of hashed character trigrams.
+    
+    crc32 (not hash()) keeps vectors stable across worker processes.
+    """
+    counts: Counter = Counter()
+    for token in TOKEN_RE.findall(text.lower()):
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            counts[zlib.crc32(padded[i:i + 3].encode()) % VECTOR_DIM] += 1
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {dim: v / norm for dim, v in counts.items()}
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(dim, 0.0) for dim, v in a.items())
+
+def encode_vector(vector: Dict[int, float]) -> str:
+    return json.dumps({str(dim): round(v, 4) for dim, v in vector.items()})
+
+def decode_vector(raw: str) -> Dict[int, float]:
+    return {int(dim): v for dim, v in json.loads(raw).items()}
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(math.ceil(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[max(index, 0)]
 
 async def get_redis() -> redis.Redis:
     """Get Redis connection"""
@@ -52,6 +214,18 @@ async def sse_keepalive():
         await asyncio.sleep(25)
         # In production, send SSE ping here
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Record per-endpoint latency for /metrics"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    endpoint = request.scope.get("endpoint")
+    name = f"{request.method} {endpoint.__name__ if endpoint else 'unmatched'}"
+    if name not in endpoint_latencies:
+        endpoint_latencies[name] = deque(maxlen=LATENCY_WINDOW)
+    endpoint_latencies[name].append((time.perf_counter() - start) * 1000)
+    return response
+
 @app.on_event("startup")
 async def startup():
     asyncio.create_task(sse_keepalive())
@@ -83,27 +257,39 @@ async def store_memory(
         "expires_at": (datetime.utcnow() + timedelta(seconds=memory.ttl)).isoformat() if memory.ttl else None
     }
     
-    # Store in Redis with TTL
+    memory_data["vector"] = encode_vector(embed_text(memory.content))
+    
+    # Store in Redis with TTL, the actor's memory list and the actor's
+    # search index in a single round-trip
     client = await get_redis()
-    key = f"memory:{x_tenant_id}:{x_actor_id}:{memory_id}"
+    key = memory_key(x_tenant_id, x_actor_id, memory_id)
+    list_key = f"memories:{x_tenant_id}:{x_actor_id}"
+    now = time.time()
+    expiry = now + memory.ttl if memory.ttl else math.inf
+    index_keys = [index_key(x_tenant_id, x_actor_id, term) for term in tokenize(memory.content)]
     
-    await client.hset(key, mapping=memory_data)
+    pipe = client.pipeline(transaction=False)
+    pipe.hset(key, mapping={k: v for k, v in memory_data.items() if v is not None})
     if memory.ttl:
-        await client.expire(key, memory.ttl)
+        pipe.expire(key, memory.ttl)
+    pipe.lpush(list_key, memory_id)
+    pipe.ltrim(list_key, 0, 99)  # Keep last 100 memories
+    if index_keys:
+        pipe.eval(INDEX_MEMORY_SCRIPT, len(index_keys), *index_keys, memory_id, str(expiry), now)
     
-    # Also store in actor's memory list
-    list_key = f"memories:{x_tenant_id}:{x_actor_id}"
-    await client.lpush(list_key, memory_id)
-    await client.ltrim(list_key, 0, 99)  # Keep last 100 memories
-    
-    # Update local buffer
-    if x_actor_id not in memory_buffer:
-        memory_buffer[x_actor_id] = deque(maxlen=20)
-    memory_buffer[x_actor_id].append({
+    # Shared hot buffer: capped list visible to every worker
+    recent_item = {
         "memory_id": memory_id,
         "content": memory.content,
-        "timestamp": datetime.utcnow()
-    })
+        "timestamp": memory_data["created_at"]
+    }
+    buffer_key = recent_key(x_tenant_id, x_actor_id)
+    pipe.lpush(buffer_key, json.dumps(recent_item))
+    pipe.ltrim(buffer_key, 0, HOT_BUFFER_PER_ACTOR - 1)
+    pipe.expire(buffer_key, HOT_BUFFER_REDIS_TTL)
+    await pipe.execute()
+    
+    memory_buffer.append(buffer_key, recent_item)
     
     return MemoryResponse(
         memory_id=memory_id,
@@ -113,6 +299,36 @@ async def store_memory(
         expires_at=memory_data.get("expires_at")
     )
 
+@app.get("/memory/recent")
+async def get_recent_memories(
+    limit: int = 10,
+    x_tenant_id: str = Header(...),
+    x_actor_id: str = Header(...)
+):
+    """Get recent memories from the hot buffer (fast access)"""
+    buffer_key = recent_key(x_tenant_id, x_actor_id)
+    recent = memory_buffer.get(buffer_key)
+    if recent is not None:
+        memory_buffer.hits += 1
+        return {"memories": recent[-limit:]}
+    
+    memory_buffer.misses += 1
+    try:
+        client = await get_redis()
+        raw_items = await client.lrange(buffer_key, 0, HOT_BUFFER_PER_ACTOR - 1)
+    except Exception:
+        # Redis unavailable: fall back to whatever this worker last saw
+        stale = memory_buffer.get(buffer_key, allow_stale=True)
+        if stale is None:
+            raise HTTPException(status_code=503, detail="Memory buffer unavailable")
+        memory_buffer.stale_served += 1
+        return {"memories": stale[-limit:]}
+    
+    # Redis holds newest first; the buffer is oldest to newest
+    recent = [json.loads(item) for item in reversed(raw_items)]
+    memory_buffer.put(buffer_key, recent)
+    return {"memories": recent[-limit:]}
+
 @app.get("/memory/{memory_id}", response_model=MemoryResponse)
 async def get_memory(
     memory_id: str,
@@ -121,7 +337,7 @@ async def get_memory(
 ):
     """Retrieve a specific memory by ID"""
     client = await get_redis()
-    key = f"memory:{x_tenant_id}:{x_actor_id}:{memory_id}"
+    key = memory_key(x_tenant_id, x_actor_id, memory_id)
     
     memory_data = await client.hgetall(key)
     if not memory_data:
@@ -141,31 +357,80 @@ async def search_memories(
     x_tenant_id: str = Header(...),
     x_actor_id: str = Header(...)
 ):
-    """Search memories for an actor"""
+    """Hybrid keyword/vector search over the actor's memory index"""
     actor_id = query.actor_id or x_actor_id
     client = await get_redis()
-    
-    # Get memory IDs for actor
+    terms = tokenize(query.query)
     list_key = f"memories:{x_tenant_id}:{actor_id}"
-    memory_ids = await client.lrange(list_key, 0, query.limit - 1)
+    index_keys = [index_key(x_tenant_id, actor_id, term) for term in terms]
+    
+    # Candidates: unexpired term index hits plus the actor's most recent
+    # memories; expired refs of the queried terms are dropped on the way
+    now = time.time()
+    pipe = client.pipeline(transaction=False)
+    for key in index_keys:
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zrange(key, 0, -1)
+    pipe.lrange(list_key, 0, SEARCH_RECENT_SCAN - 1)
+    *index_results, recent_ids = await pipe.execute()
+    
+    term_hits: Counter = Counter()
+    for members in index_results[1::2]:
+        term_hits.update(members)
     
-    memories = []
-    for memory_id in memory_ids:
-        key = f"memory:{x_tenant_id}:{actor_id}:{memory_id}"
-        memory_data = await client.hgetall(key)
+    candidates = [memory_id for memory_id, _ in term_hits.most_common(SEARCH_CANDIDATE_LIMIT)]
+    seen = set(candidates)
+    candidates.extend(memory_id for memory_id in recent_ids if memory_id not in seen)
+    if not candidates:
+        return []
+    
+    pipe = client.pipeline(transaction=False)
+    for memory_id in candidates:
+        pipe.hgetall(memory_key(x_tenant_id, actor_id, memory_id))
+    rows = await pipe.execute()
+    
+    query_text = query.query.lower()
+    query_vector = embed_text(query.query)
+    scored = []
+    stale = []
+    for memory_id, memory_data in zip(candidates, rows):
+        if not memory_data:
+            stale.append(memory_id)
+            continue
+        
+        content = memory_data["content"]
+        keyword_score = term_hits[memory_id] / len(terms) if terms else 0.0
+        if query_text and query_text in content.lower():
+            keyword_score = 1.0
         
-        if memory_data:
-            # Simple text matching (in production, use vector search)
-            if query.query.lower() in memory_data["content"].lower():
-                memories.append(MemoryResponse(
-                    memory_id=memory_id,
-                    content=memory_data["content"],
-                    metadata=json.loads(memory_data.get("metadata", "{}")),
-                    created_at=memory_data["created_at"],
-                    expires_at=memory_data.get("expires_at")
-                ))
-    
-    return memories[:query.limit]
+        vector = (decode_vector(memory_data["vector"]) if "vector" in memory_data
+                  else embed_text(content))
+        score = ((1 - SEARCH_VECTOR_WEIGHT) * keyword_score
+                 + SEARCH_VECTOR_WEIGHT * cosine(query_vector, vector))
+        if score >= SEARCH_MIN_SCORE:
+            scored.append((score, memory_id, memory_data))
+    
+    # Memories gone before their expiry (e.g. evicted) leave refs behind;
+    # prune them from the terms we touched
+    stale_refs = [memory_id for memory_id in stale if term_hits[memory_id]]
+    if stale_refs:
+        pipe = client.pipeline(transaction=False)
+        for key in index_keys:
+            pipe.zrem(key, *stale_refs)
+        await pipe.execute()
+    
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [
+        MemoryResponse(
+            memory_id=memory_id,
+            content=memory_data["content"],
+            metadata=json.loads(memory_data.get("metadata", "{}")),
+            created_at=memory_data["created_at"],
+            expires_at=memory_data.get("expires_at"),
+            score=round(score, 4)
+        )
+        for score, memory_id, memory_data in scored[:query.limit]
+    ]
 
 @app.post("/memory/summarize")
 async def summarize_conversation(
@@ -195,26 +460,6 @@ async def summarize_conversation(
     
     return await store_memory(memory, x_tenant_id=x_tenant_id, x_actor_id=x_actor_id)
 
-@app.delete("/memory/{memory_id}")
-async def delete_memory(
-    memory_id: str,
-    x_tenant_id: str = Header(...),
-    x_actor_id: str = Header(...)
-):
-    """Delete a specific memory"""
-    client = await get_redis()
-    key = f"memory:{x_tenant_id}:{x_actor_id}:{memory_id}"
-    
-    deleted = await client.delete(key)
-    if not deleted:
-        raise HTTPException(status_code=404, detail="Memory not found")
-    
-    # Remove from list
-    list_key = f"memories:{x_tenant_id}:{x_actor_id}"
-    await client.lrem(list_key, 1, memory_id)
-    
-    return {"status": "deleted", "memory_id": memory_id}
-
 @app.delete("/memory/clear")
 async def clear_memories(
     x_tenant_id: str = Header(...),
@@ -222,36 +467,59 @@ async def clear_memories(
 ):
     """Clear all memories for an actor"""
     client = await get_redis()
-    
-    # Get all memory IDs
     list_key = f"memories:{x_tenant_id}:{x_actor_id}"
-    memory_ids = await client.lrange(list_key, 0, -1)
     
-    # Delete each memory
-    for memory_id in memory_ids:
-        key = f"memory:{x_tenant_id}:{x_actor_id}:{memory_id}"
-        await client.delete(key)
+    # The list only holds the latest 100 IDs; scan for every memory and
+    # every index key of the actor
+    keys = [key async for key in client.scan_iter(
+        match=memory_key(x_tenant_id, x_actor_id, "*"), count=500
+    )]
+    index_keys = [key async for key in client.scan_iter(
+        match=index_key(x_tenant_id, x_actor_id, "*"), count=500
+    )]
     
-    # Clear the list
-    await client.delete(list_key)
+    pipe = client.pipeline(transaction=False)
+    for key in keys + index_keys:
+        pipe.delete(key)
+    pipe.delete(list_key)
+    pipe.delete(recent_key(x_tenant_id, x_actor_id))
+    await pipe.execute()
     
     # Clear local buffer
-    if x_actor_id in memory_buffer:
-        del memory_buffer[x_actor_id]
+    memory_buffer.discard(recent_key(x_tenant_id, x_actor_id))
     
-    return {"status": "cleared", "memories_deleted": len(memory_ids)}
+    return {"status": "cleared", "memories_deleted": len(keys)}
 
-@app.get("/memory/recent")
-async def get_recent_memories(
-    limit: int = 10,
+@app.delete("/memory/{memory_id}")
+async def delete_memory(
+    memory_id: str,
     x_tenant_id: str = Header(...),
     x_actor_id: str = Header(...)
 ):
-    """Get recent memories from buffer (fast access)"""
-    if x_actor_id in memory_buffer:
-        recent = list(memory_buffer[x_actor_id])[-limit:]
-        return {"memories": recent}
-    return {"memories": []}
+    """Delete a specific memory"""
+    client = await get_redis()
+    key = memory_key(x_tenant_id, x_actor_id, memory_id)
+    
+    content, created_at = await client.hmget(key, "content", "created_at")
+    if content is None:
+        raise HTTPException(status_code=404, detail="Memory not found")
+    
+    # Remove the record, its list and hot buffer entries and its index refs
+    # together; the buffer entry is the exact JSON store_memory pushed
+    list_key = f"memories:{x_tenant_id}:{x_actor_id}"
+    buffer_key = recent_key(x_tenant_id, x_actor_id)
+    recent_item = {"memory_id": memory_id, "content": content, "timestamp": created_at}
+    pipe = client.pipeline(transaction=False)
+    pipe.delete(key)
+    pipe.lrem(list_key, 1, memory_id)
+    pipe.lrem(buffer_key, 0, json.dumps(recent_item))
+    for term in tokenize(content):
+        pipe.zrem(index_key(x_tenant_id, x_actor_id, term), memory_id)
+    await pipe.execute()
+    
+    memory_buffer.discard(buffer_key)
+    
+    return {"status": "deleted", "memory_id": memory_id}
 
 @app.get("/health")
 async def health():
@@ -266,5 +534,22 @@ async def health():
         "status": "healthy",
         "service": "mem0",
         "redis": redis_status,
-        "buffer_size": sum(len(v) for v in memory_buffer.values())
-    }
\ No newline at end of file
+        "buffer_size": memory_buffer.stats()["items"]
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Per-endpoint latency percentiles (ms) over the recent sample window"""
+    endpoints = {}
+    for name, samples in endpoint_latencies.items():
+        values = sorted(samples)
+        if not values:
+            continue
+        endpoints[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2)
+        }
+    return {"service": "mem0", "latency": endpoints, "hot_buffer": memory_buffer.stats()}
\ No newline at end of file
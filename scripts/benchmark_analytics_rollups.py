@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark: analytics-mcp rollup rewrites vs. raw GROUP BY over interactions
+
+Generates a synthetic interactions table (10M rows by default) in a scratch
+schema, backfills the daily rollup, then times the user_analytics and
+interaction_summary templates over several ranges via the raw statements
+and via the rollup rewrites. Results of both paths are compared as well.
+
+Usage:
+    python scripts/benchmark_analytics_rollups.py --dsn postgresql://... [--rows 10000000] [--keep]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "mcp" / "analytics-mcp"))
+
+from query_engine import QueryEngine  # noqa: E402
+from rollups import RollupManager  # noqa: E402
+
+SCHEMA = "analytics_rollup_bench"
+
+GENERATE_SQL = """
+CREATE TABLE interactions (
+    id BIGSERIAL PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    interaction_type TEXT NOT NULL,
+    content TEXT,
+    metadata JSONB DEFAULT '{{}}',
+    created_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ
+);
+INSERT INTO interactions (account_id, interaction_type, content, created_at, updated_at)
+SELECT
+    'acct-' || (random() * {accounts})::int,
+    (ARRAY['call', 'email', 'meeting', 'note', 'ticket'])[1 + (random() * 4)::int],
+    repeat('x', (random() * 400)::int),
+    ts,
+    ts
+FROM (
+    SELECT now() - random() * interval '{days} days' AS ts
+    FROM generate_series(1, {rows})
+) g;
+CREATE INDEX ON interactions (created_at);
+CREATE INDEX ON interactions (account_id, created_at);
+ANALYZE interactions;
+"""
+
+def ranges(days: int):
+    """(label, start, end) windows relative to today's UTC midnight"""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        ("7 days, aligned", today - timedelta(days=7), today),
+        ("30 days, partial edges", today - timedelta(days=30, hours=-13, minutes=-45), today + timedelta(hours=9, minutes=30)),
+        ("90 days, aligned", today - timedelta(days=90), today),
+        (f"{days} days, partial edges", today - timedelta(days=days, hours=-6), today + timedelta(hours=18)),
+    ]
+
+async def timed(connection, sql: str, args, iterations: int):
+    samples = []
+    rows = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows = await connection.fetch(sql, *args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), rows
+
+def same_results(raw, rolled) -> bool:
+    key = lambda r: tuple(str(v) for v in r.values())
+    normalize = lambda rows: sorted(
+        (key({k: (round(float(v), 6) if k == "avg_content_length" and v is not None else v)
+              for k, v in dict(r).items()}) for r in rows)
+    )
+    return normalize(raw) == normalize(rolled)
+
+async def main_async(args):
+    connection = await asyncpg.connect(args.dsn)
+    engine = QueryEngine().compile()
+    rollups = RollupManager(batch_days=30)
+
+    try:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await connection.execute(f"CREATE SCHEMA {SCHEMA}")
+        await connection.execute(f"SET search_path TO {SCHEMA}")
+        await connection.execute("SET TIME ZONE 'UTC'")
+
+        start = time.perf_counter()
+        await connection.execute(GENERATE_SQL.format(rows=args.rows, accounts=args.accounts, days=args.days))
+        print(f"Generated {args.rows:,} interactions in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        await rollups.ensure_schema(connection)
+        days = await rollups.refresh(connection)
+        rollup_rows = await connection.fetchval("SELECT count(*) FROM interaction_daily_rollup")
+        print(f"Backfilled {days} days into {rollup_rows:,} rollup rows in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        await rollups.refresh(connection)
+        print(f"Incremental refresh in {time.perf_counter() - start:.2f}s\n")
+
+        print(f"{'template':22} {'range':28} {'raw (ms)':>10} {'rollup (ms)':>12} {'speedup':>8}  match")
+        for template_id, extra in (("user_analytics", {"limit": 50}), ("interaction_summary", {})):
+            for label, start_ts, end_ts in ranges(args.days):
+                params = {"start_date": start_ts, "end_date": end_ts, **extra}
+
+                statement, bound = engine.bind(template_id, params)
+                planned = rollups.plan(template_id, dict(zip(statement.param_names, bound)))
+                if planned is None:
+                    print(f"{template_id:22} {label:28} {'(raw only)':>10}")
+                    continue
+
+                raw_ms, raw_rows = await timed(connection, statement.sql, bound, args.iterations)
+                rollup_ms, rollup_rows_out = await timed(connection, planned[0].sql, planned[1], args.iterations)
+                # Ties at the LIMIT boundary may pick different accounts; compare unlimited sets
+                match = same_results(raw_rows, rollup_rows_out) if not extra else "n/a (limit)"
+                print(f"{template_id:22} {label:28} {raw_ms:10.1f} {rollup_ms:12.1f} "
+                      f"{raw_ms / rollup_ms:7.1f}x  {match}")
+    finally:
+        if not args.keep:
+            await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analytics-mcp rollups on generated data")
+    parser.add_argument("--dsn", required=True, help="Postgres DSN; a scratch schema is created and dropped")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="Keep the generated schema")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
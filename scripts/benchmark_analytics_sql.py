@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: analytics-mcp compiled statements vs. per-request Jinja rendering
+
+Compares the old render path (parse the Jinja template and inline escaped
+literals on every request) with the compiled QueryEngine (look up the
+variant, bind parameters). With --dsn it also measures end-to-end query
+throughput against Postgres, where the literal SQL defeats plan reuse.
+
+Usage:
+    python scripts/benchmark_analytics_sql.py [--iterations N]
+    python scripts/benchmark_analytics_sql.py --dsn postgresql://... [--queries N] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from jinja2 import Template
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "mcp" / "analytics-mcp"))
+
+from query_engine import SQL_TEMPLATES, QueryEngine  # noqa: E402
+
+# The same templates as originally written: quoted literals for every value
+LEGACY_QUERIES = {
+    template_id: config["query"].replace("{{ account_id }}", "'{{ account_id }}'")
+                                .replace("{{ since }}", "'{{ since }}'")
+                                .replace("{{ start_date }}", "'{{ start_date }}'")
+                                .replace("{{ end_date }}", "'{{ end_date }}'")
+    for template_id, config in SQL_TEMPLATES.items()
+}
+
+CASES = [
+    ("timeline", {"account_id": "acct-42", "since": "2024-01-01", "limit": 100}),
+    ("user_analytics", {"start_date": "2024-01-01", "end_date": "2024-03-31", "limit": 50}),
+    ("interaction_summary", {"start_date": "2024-01-01", "end_date": "2024-03-31", "account_id": "acct-42"}),
+]
+
+def legacy_render(template_id: str, parameters: dict) -> str:
+    """The render_sql() path this replaced: escape, re-parse, render"""
+    sanitized = {
+        key: value.replace("'", "''").replace("\\", "\\\\") if isinstance(value, str) else value
+        for key, value in parameters.items()
+    }
+    return Template(LEGACY_QUERIES[template_id]).render(**sanitized)
+
+def bench_cpu(engine: QueryEngine, iterations: int):
+    print(f"{'template':22} {'render (us)':>12} {'bind (us)':>10} {'speedup':>9}")
+    for template_id, params in CASES:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            legacy_render(template_id, params)
+        render_us = (time.perf_counter() - start) / iterations * 1_000_000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            engine.bind(template_id, params)
+        bind_us = (time.perf_counter() - start) / iterations * 1_000_000
+
+        print(f"{template_id:22} {render_us:12.1f} {bind_us:10.1f} {render_us / bind_us:8.0f}x")
+
+async def bench_db(engine: QueryEngine, dsn: str, queries: int, concurrency: int):
+    import asyncpg
+
+    pool = await asyncpg.create_pool(dsn, min_size=concurrency, max_size=concurrency)
+
+    async def run(make_query) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            template_id, params = CASES[i % len(CASES)]
+            sql, args = make_query(template_id, params)
+            async with semaphore, pool.acquire() as connection:
+                async with connection.transaction(readonly=True):
+                    await connection.fetch(sql, *args)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(queries)))
+        return queries / (time.perf_counter() - start)
+
+    def literal(template_id, params):
+        return legacy_render(template_id, params), []
+
+    def bound(template_id, params):
+        statement, args = engine.bind(template_id, params)
+        return statement.sql, args
+
+    try:
+        literal_qps = await run(literal)
+        bound_qps = await run(bound)
+    finally:
+        await pool.close()
+
+    print(f"\n{'path':22} {'queries/s':>12}")
+    print(f"{'render + literal SQL':22} {literal_qps:12.1f}")
+    print(f"{'compiled + bound':22} {bound_qps:12.1f}")
+    print(f"speedup: {bound_qps / literal_qps:.2f}x ({queries} queries, concurrency {concurrency})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analytics-mcp SQL template execution")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--dsn", help="Postgres DSN with an interactions table for the throughput phase")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = QueryEngine().compile()
+    bench_cpu(engine, args.iterations)
+
+    if args.dsn:
+        asyncio.run(bench_db(engine, args.dsn, args.queries, args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: RepositoryIndex vs. filesystem walks for local repository queries
+
+Compares the per-query cost of the glob/iterdir walks that
+analyze_local_repository used to run against the in-memory snapshot index.
+
+Usage:
+    python scripts/benchmark_repository_index.py [--root PATH] [--iterations N]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from repository_index import RepositoryIndex  # noqa: E402
+
+def time_call(fn, iterations: int) -> float:
+    """Median wall time of fn() in microseconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the repository snapshot index")
+    parser.add_argument("--root", default=str(Path(__file__).resolve().parent.parent))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--term", default="indexer")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+
+    start = time.perf_counter()
+    index = RepositoryIndex(root).build()
+    build_s = time.perf_counter() - start
+    print(f"Repository: {root}")
+    print(f"Indexed {len(index.files)} files / {len(index.dirs)} dirs in {build_s:.2f}s\n")
+
+    walks = {
+        "find file (glob **/*term*)": (
+            lambda: list(root.glob(f"**/*{args.term}*"))[:10],
+            lambda: index.find(args.term, limit=10),
+        ),
+        "mcp layout (glob services/mcp-*, mcp/*/)": (
+            lambda: (list(root.glob("services/mcp-*")), list(root.glob("mcp/*/"))),
+            lambda: index.mcp_services(),
+        ),
+        "structure (iterdir x6)": (
+            lambda: [list((root / d).iterdir()) for d in ("services", "apps", "mcp", "scripts", "libs", "backend")
+                     if (root / d).exists()],
+            lambda: [index.list_dir(d) for d in ("services", "apps", "mcp", "scripts", "libs", "backend")],
+        ),
+        "refresh (no changes)": (
+            None,
+            lambda: index.refresh(),
+        ),
+    }
+
+    print(f"{'query':45} {'walk (us)':>14} {'index (us)':>12} {'speedup':>9}")
+    for name, (walk_fn, index_fn) in walks.items():
+        index_us = time_call(index_fn, args.iterations)
+        if walk_fn is None:
+            print(f"{name:45} {'-':>14} {index_us:12.1f} {'-':>9}")
+            continue
+        walk_us = time_call(walk_fn, max(1, args.iterations // 4))
+        print(f"{name:45} {walk_us:14.1f} {index_us:12.1f} {walk_us / max(index_us, 0.001):8.0f}x")
+
+if __name__ == "__main__":
+    main()
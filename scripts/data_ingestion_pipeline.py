@@ -2,14 +2,32 @@
 """
 Sophia AI Data Ingestion Pipeline
 Handles data ingestion from various sources into PostgreSQL database with Redis caching.
+
+Each source streams through a stage graph connected by bounded queues:
+
+    extract (concurrent) -> hash dedupe + batching -> embed (one request per batch)
+        -> write (one transaction, one vector upsert and one cache pipeline per batch)
+
+Bounded queues keep memory flat for large sources: a slow stage back-pressures
+the ones before it. Written items are appended to a checkpoint so an
+interrupted run resumes where it stopped.
+
+Every source item (URL, repository path, API record) has a stable id derived
+from its key, so re-ingesting updates rows and vectors in place. Items whose
+stored content hash matches are skipped before embedding, and items that
+disappeared from a scoped source are tombstoned.
 """
 
 import os
 import json
+import time
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Union
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from datetime import datetime
+from urllib.parse import urlencode
 import hashlib
 import uuid
 
@@ -17,14 +35,78 @@ import uuid
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# knowledge.type is a knowledge_type enum; source types that differ from its labels
+KNOWLEDGE_TYPES = {'api_data': 'api'}
+
+# Namespace for knowledge ids derived from item keys
+INGEST_NAMESPACE = uuid.NAMESPACE_URL
+
+@dataclass
+class IngestItem:
+    """One source item flowing through the stage graph"""
+    key: str
+    content: str
+    metadata: Dict[str, Any]
+    status: str = 'new'  # 'new', 'changed' or 'unchanged' once looked up
+    embedding: Optional[List[float]] = None
+
+    @property
+    def doc_id(self) -> str:
+        return item_id(self.key)
+
+    @property
+    def content_hash(self) -> str:
+        return self.metadata['content_hash']
+
+def item_id(key: str) -> str:
+    """Stable knowledge id for a source item key"""
+    return str(uuid.uuid5(INGEST_NAMESPACE, key))
+
+class IngestionCheckpoint:
+    """Keys of items already written for one source, appended as batches commit"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed: Set[str] = set()
+        if path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.completed = {json.loads(line) for line in f if line.strip()}
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Ignoring unreadable checkpoint {path}: {e}")
+
+    # Run options that do not change which items a source lists
+    RUN_OPTIONS = ('resume', 'tombstone')
+
+    @classmethod
+    def for_source(cls, directory: str, data_source: Dict[str, Any]) -> "IngestionCheckpoint":
+        listed = {key: value for key, value in data_source.items() if key not in cls.RUN_OPTIONS}
+        fingerprint = hashlib.sha256(json.dumps(listed, sort_keys=True, default=str).encode()).hexdigest()
+        source_type = data_source.get('type', 'unknown')
+        return cls(Path(directory).expanduser() / f"{source_type}-{fingerprint[:16]}.jsonl")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.completed
+
+    def mark(self, keys: List[str]):
+        self.completed.update(keys)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(key) + '\n' for key in keys)
+
+    def clear(self):
+        self.completed.clear()
+        self.path.unlink(missing_ok=True)
+
 class DataIngestionPipeline:
     """Main data ingestion pipeline for Sophia AI"""
 
     def __init__(self):
         self.config = self._load_config()
-        self.db_connection = None
+        self.db_pool = None
         self.redis_client = None
-        self.vector_store = None
+        self.http_session = None
+        self.openai_client = None
         self.ingestion_stats = {
             'processed': 0,
             'successful': 0,
@@ -40,6 +122,12 @@ class DataIngestionPipeline:
             'qdrant_url': os.getenv('QDRANT_URL'),
             'qdrant_api_key': os.getenv('QDRANT_API_KEY'),
             'openai_api_key': os.getenv('OPENAI_API_KEY'),
+            'batch_size': int(os.getenv('INGEST_BATCH_SIZE', '64')),
+            'extract_concurrency': int(os.getenv('INGEST_EXTRACT_CONCURRENCY', '8')),
+            'embed_concurrency': int(os.getenv('INGEST_EMBED_CONCURRENCY', '2')),
+            'write_concurrency': int(os.getenv('INGEST_WRITE_CONCURRENCY', '2')),
+            'queue_size': int(os.getenv('INGEST_QUEUE_SIZE', '256')),
+            'checkpoint_dir': os.getenv('INGEST_CHECKPOINT_DIR', '~/.cache/sophia/ingestion'),
         }
 
     async def initialize(self) -> bool:
@@ -56,6 +144,9 @@ class DataIngestionPipeline:
             # Initialize vector store
             await self._init_vector_store()
 
+            # Initialize embedding client
+            await self._init_embeddings()
+
             logger.info("✅ Data Ingestion Pipeline initialized successfully")
             return True
 
@@ -64,18 +155,17 @@ class DataIngestionPipeline:
             return False
 
     async def _init_database(self):
-        """Initialize database connection"""
+        """Initialize database connection pool"""
         try:
-            import psycopg2
-            import psycopg2.extras
-
-            self.db_connection = psycopg2.connect(self.config['database_url'])
-            self.db_connection.autocommit = False
+            import asyncpg
 
-            # Create cursor
-            self.db_cursor = self.db_connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            self.db_pool = await asyncpg.create_pool(
+                self.config['database_url'],
+                min_size=1,
+                max_size=self.config['write_concurrency'] + 1
+            )
 
-            logger.info("✅ Database connection established")
+            logger.info("✅ Database connection pool established")
 
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
@@ -84,30 +174,12 @@ class DataIngestionPipeline:
     async def _init_redis(self):
         """Initialize Redis connection"""
         try:
-            import redis
-
-            # Parse Redis URL
-            redis_url = self.config['redis_url']
-            if redis_url.startswith('redis://'):
-                url_parts = redis_url.replace('redis://', '').split(':')
-                if len(url_parts) >= 2:
-                    host = url_parts[0]
-                    port = int(url_parts[1].split('/')[0]) if '/' in url_parts[1] else 6379
-                else:
-                    host = 'localhost'
-                    port = 6379
-            else:
-                host = redis_url
-                port = 6379
+            import redis.asyncio as redis
 
-            self.redis_client = redis.Redis(
-                host=host,
-                port=port,
-                decode_responses=True
-            )
+            self.redis_client = redis.from_url(self.config['redis_url'], decode_responses=True)
 
             # Test connection
-            self.redis_client.ping()
+            await self.redis_client.ping()
             logger.info("✅ Redis connection established")
 
         except Exception as e:
@@ -117,24 +189,33 @@ class DataIngestionPipeline:
     async def _init_vector_store(self):
         """Initialize vector store connection"""
         try:
-            import requests
+            import aiohttp
 
             self.qdrant_headers = {
                 'Content-Type': 'application/json',
                 'api-key': self.config['qdrant_api_key']
             }
 
+            # Shared by vector store writes and web/API fetches
+            self.http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+
             # Test connection
-            response = requests.get(f"{self.config['qdrant_url']}/health", headers=self.qdrant_headers)
-            if response.status_code == 200:
-                logger.info("✅ Vector store connection established")
-            else:
-                logger.warning(f"⚠️ Vector store health check returned {response.status_code}")
+            async with self.http_session.get(f"{self.config['qdrant_url']}/health", headers=self.qdrant_headers) as response:
+                if response.status == 200:
+                    logger.info("✅ Vector store connection established")
+                else:
+                    logger.warning(f"⚠️ Vector store health check returned {response.status}")
 
         except Exception as e:
             logger.error(f"❌ Vector store connection failed: {e}")
             raise
 
+    async def _init_embeddings(self):
+        """Initialize the OpenAI client shared by every embedding request"""
+        import openai
+
+        self.openai_client = openai.AsyncOpenAI(api_key=self.config['openai_api_key'])
+
     async def ingest_knowledge_base(self, data_source: Dict[str, Any]) -> Dict[str, Any]:
         """Ingest knowledge base data from various sources"""
         try:
@@ -163,309 +244,502 @@ class DataIngestionPipeline:
     async def _ingest_documents(self, data_source: Dict[str, Any]) -> Dict[str, Any]:
         """Ingest documents from file system or URLs"""
         documents = data_source.get('documents', [])
-        processed = 0
-        successful = 0
-
-        for doc in documents:
-            try:
-                # Extract document content
-                content = await self._extract_document_content(doc)
-                if not content:
-                    continue
-
-                # Generate metadata
-                metadata = {
-                    'source': doc.get('source', 'unknown'),
-                    'filename': doc.get('filename', ''),
-                    'type': 'document',
-                    'ingested_at': datetime.now().isoformat(),
-                    'content_hash': hashlib.md5(content.encode()).hexdigest()
-                }
-
-                # Store in database
-                doc_id = await self._store_knowledge(content, metadata)
+        jobs = [(self._document_key(doc), doc) for doc in documents]
 
-                # Generate and store embedding
-                await self._store_embedding(doc_id, content, metadata)
+        async def extract(key: str, doc: Dict[str, Any]) -> Optional[IngestItem]:
+            # Extract document content
+            content = await self._extract_document_content(doc)
+            if not content:
+                return None
 
-                successful += 1
-                processed += 1
+            # Generate metadata
+            metadata = {
+                'source': doc.get('source', 'unknown'),
+                'filename': doc.get('filename', ''),
+                'type': 'document',
+                'ingested_at': datetime.now().isoformat(),
+                'content_hash': hashlib.md5(content.encode()).hexdigest()
+            }
+            return IngestItem(key=key, content=content, metadata=metadata)
 
-                # Cache the result
-                await self._cache_document(doc_id, content, metadata)
+        return await self._run_stages(
+            'documents', data_source, jobs, extract, cache=True, scope=data_source.get('source_id')
+        )
 
-            except Exception as e:
-                logger.error(f"❌ Failed to process document {doc.get('filename', 'unknown')}: {e}")
-                processed += 1
-                continue
-
-        return {
-            'status': 'completed',
-            'source_type': 'documents',
-            'total_processed': processed,
-            'successful': successful,
-            'failed': processed - successful
-        }
+    def _document_key(self, doc: Dict[str, Any]) -> str:
+        """Documents are identified by path or URL; inline ones by name, else by content"""
+        identity = doc.get('file_path') or doc.get('url') or doc.get('filename')
+        if identity is None:
+            identity = hashlib.md5(str(doc.get('content', '')).encode()).hexdigest()
+        return f"document:{identity}"
 
     async def _ingest_web_pages(self, data_source: Dict[str, Any]) -> Dict[str, Any]:
         """Ingest web pages from URLs"""
         urls = data_source.get('urls', [])
-        processed = 0
-        successful = 0
-
-        for url in urls:
-            try:
-                # Fetch web page content
-                content = await self._fetch_web_content(url)
-                if not content:
-                    continue
-
-                # Extract title and metadata
-                title = await self._extract_title(content, url)
-                metadata = {
-                    'source': 'web',
-                    'url': url,
-                    'title': title,
-                    'type': 'webpage',
-                    'ingested_at': datetime.now().isoformat(),
-                    'content_hash': hashlib.md5(content.encode()).hexdigest()
-                }
-
-                # Store in database
-                doc_id = await self._store_knowledge(content, metadata)
-
-                # Generate and store embedding
-                await self._store_embedding(doc_id, content, metadata)
 
-                successful += 1
-                processed += 1
+        async def extract(key: str, url: str) -> Optional[IngestItem]:
+            # Fetch web page content
+            content = await self._fetch_web_content(url)
+            if not content:
+                return None
 
-                # Cache the result
-                await self._cache_document(doc_id, content, metadata)
+            # Extract title and metadata
+            title = await self._extract_title(content, url)
+            metadata = {
+                'source': 'web',
+                'url': url,
+                'title': title,
+                'type': 'webpage',
+                'ingested_at': datetime.now().isoformat(),
+                'content_hash': hashlib.md5(content.encode()).hexdigest()
+            }
+            return IngestItem(key=key, content=content, metadata=metadata)
 
-            except Exception as e:
-                logger.error(f"❌ Failed to process URL {url}: {e}")
-                processed += 1
-                continue
-
-        return {
-            'status': 'completed',
-            'source_type': 'web_pages',
-            'total_processed': processed,
-            'successful': successful,
-            'failed': processed - successful
-        }
+        return await self._run_stages(
+            'web_pages', data_source, [(f"web:{url}", url) for url in urls], extract, cache=True,
+            scope=data_source.get('source_id')
+        )
 
     async def _ingest_api_data(self, data_source: Dict[str, Any]) -> Dict[str, Any]:
         """Ingest data from APIs"""
         api_config = data_source.get('api_config', {})
-        processed = 0
-        successful = 0
+        endpoint = api_config.get('endpoint', '')
+        # Query params select which records are listed, so they are part of the listing's identity
+        listing = self._listing_id(f"api:{endpoint}", api_config.get('params'))
 
         try:
             # Fetch data from API
             api_data = await self._fetch_api_data(api_config)
-
-            for item in api_data:
-                try:
-                    # Convert API item to content
-                    content = json.dumps(item) if isinstance(item, dict) else str(item)
-
-                    metadata = {
-                        'source': 'api',
-                        'api_endpoint': api_config.get('endpoint', ''),
-                        'type': 'api_data',
-                        'ingested_at': datetime.now().isoformat(),
-                        'content_hash': hashlib.md5(content.encode()).hexdigest()
-                    }
-
-                    # Store in database
-                    doc_id = await self._store_knowledge(content, metadata)
-
-                    # Generate and store embedding
-                    await self._store_embedding(doc_id, content, metadata)
-
-                    successful += 1
-                    processed += 1
-
-                except Exception as e:
-                    logger.error(f"❌ Failed to process API item: {e}")
-                    processed += 1
-                    continue
-
         except Exception as e:
             logger.error(f"❌ API data ingestion failed: {e}")
             return {
                 'status': 'failed',
                 'error': str(e),
-                'stats': {'processed': processed, 'successful': successful, 'failed': processed - successful}
+                'stats': {'processed': 0, 'successful': 0, 'failed': 0}
             }
 
-        return {
-            'status': 'completed',
-            'source_type': 'api_data',
-            'total_processed': processed,
-            'successful': successful,
-            'failed': processed - successful
-        }
+        # Records are identified by their id field, falling back to position
+        jobs = [
+            (f"{listing}#{item.get('id', index) if isinstance(item, dict) else index}", item)
+            for index, item in enumerate(api_data)
+        ]
+
+        async def extract(key: str, item: Any) -> Optional[IngestItem]:
+            # Convert API item to content
+            content = json.dumps(item) if isinstance(item, dict) else str(item)
+
+            metadata = {
+                'source': 'api',
+                'api_endpoint': endpoint,
+                'type': 'api_data',
+                'ingested_at': datetime.now().isoformat(),
+                'content_hash': hashlib.md5(content.encode()).hexdigest()
+            }
+            return IngestItem(key=key, content=content, metadata=metadata)
+
+        return await self._run_stages(
+            'api_data', data_source, jobs, extract, cache=False,
+            scope=data_source.get('source_id', listing)
+        )
 
     async def _ingest_code_repository(self, data_source: Dict[str, Any]) -> Dict[str, Any]:
         """Ingest code from repository"""
         repo_config = data_source.get('repo_config', {})
-        processed = 0
-        successful = 0
 
-        try:
-            # Get code files from repository
-            code_files = await self._get_code_files(repo_config)
-
-            for file_path, content in code_files.items():
-                try:
-                    metadata = {
-                        'source': 'code',
-                        'repository': repo_config.get('repository', ''),
-                        'file_path': file_path,
-                        'language': self._detect_language(file_path),
-                        'type': 'code',
-                        'ingested_at': datetime.now().isoformat(),
-                        'content_hash': hashlib.md5(content.encode()).hexdigest()
-                    }
-
-                    # Store in database
-                    doc_id = await self._store_knowledge(content, metadata)
-
-                    # Generate and store embedding
-                    await self._store_embedding(doc_id, content, metadata)
-
-                    successful += 1
-                    processed += 1
-
-                except Exception as e:
-                    logger.error(f"❌ Failed to process code file {file_path}: {e}")
-                    processed += 1
-                    continue
+        repo_path = repo_config.get('local_path', '.')
+        repository = repo_config.get('repository') or os.path.abspath(repo_path)
 
+        # Only paths are listed up front; contents are read by the extract stage.
+        # Keys use the path within the repository so a moved checkout keeps its ids.
+        try:
+            file_paths = await asyncio.to_thread(self._list_code_files, repo_config)
         except Exception as e:
+            # Ingesting an empty listing would tombstone the whole repository
             logger.error(f"❌ Code repository ingestion failed: {e}")
             return {
                 'status': 'failed',
                 'error': str(e),
-                'stats': {'processed': processed, 'successful': successful, 'failed': processed - successful}
+                'stats': {'processed': 0, 'successful': 0, 'failed': 0}
             }
+        jobs = [(f"code:{repository}:{os.path.relpath(path, repo_path)}", path) for path in file_paths]
 
-        return {
-            'status': 'completed',
-            'source_type': 'code_repository',
-            'total_processed': processed,
-            'successful': successful,
-            'failed': processed - successful
+        async def extract(key: str, file_path: str) -> Optional[IngestItem]:
+            content = await self._read_code_file(file_path)
+            if content is None:
+                return None
+
+            metadata = {
+                'source': 'code',
+                'repository': repo_config.get('repository', ''),
+                'file_path': file_path,
+                'language': self._detect_language(file_path),
+                'type': 'code',
+                'ingested_at': datetime.now().isoformat(),
+                'content_hash': hashlib.md5(content.encode()).hexdigest()
+            }
+            return IngestItem(key=key, content=content, metadata=metadata)
+
+        return await self._run_stages(
+            'code_repository', data_source, jobs, extract, cache=False,
+            scope=data_source.get(
+                'source_id', self._listing_id(f"code:{repository}", {'extensions': repo_config.get('extensions')})
+            )
+        )
+
+    async def _run_stages(
+        self,
+        source_type: str,
+        data_source: Dict[str, Any],
+        jobs: List[Tuple[str, Any]],
+        extract: Callable[[str, Any], Awaitable[Optional[IngestItem]]],
+        cache: bool,
+        scope: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Stream jobs through extract -> hash lookup/batch -> embed -> write.
+
+        ``jobs`` are (key, reference) pairs; keys already in the source's
+        checkpoint are skipped unless ``data_source['resume']`` is false.
+        When ``scope`` is set it names the complete source, and stored items
+        of that scope whose keys are no longer listed are tombstoned
+        (``data_source['tombstone']`` false disables this).
+        """
+        config = self.config
+        start_time = time.perf_counter()
+        stats = {
+            'new': 0, 'changed': 0, 'unchanged': 0, 'deleted': 0,
+            'failed': 0, 'skipped': 0, 'resumed': 0, 'embeddings_reused': 0
         }
 
-    async def _store_knowledge(self, content: str, metadata: Dict[str, Any]) -> str:
-        """Store knowledge in PostgreSQL database"""
-        try:
-            doc_id = str(uuid.uuid4())
+        checkpoint = IngestionCheckpoint.for_source(config['checkpoint_dir'], data_source)
+        if not data_source.get('resume', True):
+            checkpoint.clear()
 
-            query = """
-            INSERT INTO knowledge (id, title, content, type, source_url, metadata, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW())
-            """
+        job_queue: asyncio.Queue = asyncio.Queue(maxsize=config['queue_size'])
+        item_queue: asyncio.Queue = asyncio.Queue(maxsize=config['queue_size'])
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=config['embed_concurrency'] * 2)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=config['write_concurrency'] * 2)
 
-            title = metadata.get('title', metadata.get('filename', f'Document {doc_id[:8]}'))
-            source_url = metadata.get('url', metadata.get('file_path', ''))
-            doc_type = metadata.get('type', 'document')
+        # Identical content is embedded once per run
+        embeddings_by_hash: Dict[str, List[float]] = {}
 
-            self.db_cursor.execute(query, (
-                doc_id,
-                title,
-                content,
-                doc_type,
-                source_url,
-                json.dumps(metadata)
-            ))
+        async def extract_worker():
+            while (job := await job_queue.get()) is not None:
+                key, reference = job
+                try:
+                    item = await extract(key, reference)
+                except Exception as e:
+                    logger.error(f"❌ Failed to extract {key}: {e}")
+                    stats['failed'] += 1
+                    continue
+                if item is None:
+                    stats['skipped'] += 1
+                    continue
+                await item_queue.put(item)
 
-            self.db_connection.commit()
-            logger.info(f"✅ Stored knowledge document: {doc_id}")
+        async def lookup_batch(batch: List[IngestItem]):
+            try:
+                changed = await self._select_changed(batch)
+            except Exception as e:
+                logger.error(f"❌ Failed to look up batch of {len(batch)} items: {e}")
+                stats['failed'] += len(batch)
+                return
+            unchanged = [item.key for item in batch if item.status == 'unchanged']
+            if unchanged:
+                stats['unchanged'] += len(unchanged)
+                checkpoint.mark(unchanged)
+            if changed:
+                await embed_queue.put(changed)
+
+        async def batcher():
+            batch: List[IngestItem] = []
+            while (item := await item_queue.get()) is not None:
+                batch.append(item)
+                if len(batch) >= config['batch_size']:
+                    await lookup_batch(batch)
+                    batch = []
+            if batch:
+                await lookup_batch(batch)
+
+        async def embed_worker():
+            # A failed batch is counted and dropped; a dead embedder would stall the batcher
+            while (batch := await embed_queue.get()) is not None:
+                pending = {}
+                reused = 0
+                for item in batch:
+                    if item.content_hash in embeddings_by_hash or item.content_hash in pending:
+                        reused += 1
+                    else:
+                        pending[item.content_hash] = item.content
+                try:
+                    if pending:
+                        embeddings = await self._generate_embeddings(list(pending.values()))
+                        if len(embeddings) != len(pending):
+                            raise ValueError(f"expected {len(pending)} embeddings, got {len(embeddings)}")
+                        embeddings_by_hash.update(zip(pending, embeddings))
+                    for item in batch:
+                        item.embedding = embeddings_by_hash[item.content_hash]
+                except Exception as e:
+                    logger.error(f"❌ Failed to embed batch of {len(batch)} items: {e}")
+                    stats['failed'] += len(batch)
+                    continue
+                stats['embeddings_reused'] += reused
+                await write_queue.put(batch)
 
-            return doc_id
+        async def write_worker():
+            while (batch := await write_queue.get()) is not None:
+                try:
+                    await self._write_batch(batch, cache, scope)
+                except Exception as e:
+                    logger.error(f"❌ Failed to store batch of {len(batch)} items: {e}")
+                    stats['failed'] += len(batch)
+                    continue
+                for item in batch:
+                    stats[item.status] += 1
+                checkpoint.mark([item.key for item in batch])
+                logger.info(f"✅ Stored {stats['new'] + stats['changed']} new or changed {source_type} items")
 
-        except Exception as e:
-            self.db_connection.rollback()
-            logger.error(f"❌ Failed to store knowledge: {e}")
-            raise
+        extractors = [asyncio.create_task(extract_worker()) for _ in range(config['extract_concurrency'])]
+        batch_task = asyncio.create_task(batcher())
+        embedders = [asyncio.create_task(embed_worker()) for _ in range(config['embed_concurrency'])]
+        writers = [asyncio.create_task(write_worker()) for _ in range(config['write_concurrency'])]
 
-    async def _store_embedding(self, doc_id: str, content: str, metadata: Dict[str, Any]):
-        """Generate and store embedding in vector database"""
+        listed: Set[str] = set()
         try:
-            import requests
-
-            # Generate embedding using OpenAI
-            embedding = await self._generate_embedding(content)
-
-            # Store in Qdrant
-            payload = {
-                "points": [{
-                    "id": doc_id,
-                    "vector": embedding,
-                    "payload": {
-                        "content": content[:1000],  # Truncate for payload
-                        "metadata": metadata,
-                        "doc_id": doc_id
-                    }
-                }]
-            }
-
-            response = requests.put(
-                f"{self.config['qdrant_url']}/collections/sophia-knowledge-base/points",
-                headers=self.qdrant_headers,
-                json=payload
-            )
+            for key, reference in jobs:
+                if key in listed:
+                    continue
+                listed.add(key)
+                if key in checkpoint:
+                    stats['resumed'] += 1
+                    continue
+                await job_queue.put((key, reference))
+
+            # Shut stages down in order: each sentinel follows all real work
+            for _ in extractors:
+                await job_queue.put(None)
+            await asyncio.gather(*extractors)
+            await item_queue.put(None)
+            await batch_task
+            for _ in embedders:
+                await embed_queue.put(None)
+            await asyncio.gather(*embedders)
+            for _ in writers:
+                await write_queue.put(None)
+            await asyncio.gather(*writers)
+        finally:
+            for task in [*extractors, batch_task, *embedders, *writers]:
+                task.cancel()
+
+        # Items that failed to extract are still listed, so only removed items are tombstoned.
+        # An empty listing is far more likely a broken source than a deliberately emptied one.
+        if scope and data_source.get('tombstone', True) and not listed:
+            logger.warning(f"⚠️ Nothing listed for {scope}; skipping tombstones")
+        elif scope and data_source.get('tombstone', True):
+            try:
+                stats['deleted'] = await self._tombstone(scope, [item_id(key) for key in listed])
+            except Exception as e:
+                logger.error(f"❌ Failed to tombstone removed items in {scope}: {e}")
 
-            if response.status_code in [200, 201]:
-                logger.info(f"✅ Stored embedding for document: {doc_id}")
-            else:
-                logger.error(f"❌ Failed to store embedding: {response.text}")
+        successful = stats['new'] + stats['changed']
+        processed = successful + stats['unchanged'] + stats['failed']
+        self.ingestion_stats['processed'] += processed
+        self.ingestion_stats['successful'] += successful
+        self.ingestion_stats['failed'] += stats['failed']
+        self.ingestion_stats['skipped'] += stats['skipped'] + stats['unchanged']
 
-        except Exception as e:
-            logger.error(f"❌ Failed to store embedding: {e}")
+        # A clean run starts over next time; after failures only the remainder is retried
+        if stats['failed'] == 0:
+            checkpoint.clear()
 
-    async def _generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text using OpenAI"""
-        try:
-            import openai
-            client = openai.AsyncOpenAI(api_key=self.config['openai_api_key'])
+        logger.info(
+            f"📊 {source_type}: {stats['new']} new, {stats['changed']} changed, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted, {stats['failed']} failed"
+        )
 
-            response = await client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text[:8000]  # Truncate if too long
-            )
+        return {
+            'status': 'completed',
+            'source_type': source_type,
+            'total_processed': processed,
+            'successful': successful,
+            'failed': stats['failed'],
+            'summary': {
+                'new': stats['new'],
+                'changed': stats['changed'],
+                'unchanged': stats['unchanged'],
+                'deleted': stats['deleted']
+            },
+            'skipped': stats['skipped'],
+            'resumed': stats['resumed'],
+            'embeddings_reused': stats['embeddings_reused'],
+            'duration_seconds': round(time.perf_counter() - start_time, 2)
+        }
 
-            return response.data[0].embedding
+    async def _select_changed(self, batch: List[IngestItem]) -> List[IngestItem]:
+        """Items whose stored content hash differs, with status set to new or changed"""
+        rows = await self.db_pool.fetch(
+            "SELECT id::text, content_hash, deleted_at IS NOT NULL AS deleted FROM knowledge WHERE id = ANY($1::uuid[])",
+            [item.doc_id for item in batch]
+        )
+        stored = {row['id']: row for row in rows}
+
+        changed = []
+        for item in batch:
+            row = stored.get(item.doc_id)
+            if row is None or row['deleted']:
+                item.status = 'new'
+            elif row['content_hash'] != item.content_hash:
+                item.status = 'changed'
+            else:
+                item.status = 'unchanged'
+                continue
+            changed.append(item)
+        return changed
+
+    async def _write_batch(self, batch: List[IngestItem], cache: bool, scope: Optional[str]):
+        """Store a batch in the vector store and cache concurrently, then in PostgreSQL.
+
+        The knowledge row carries the content hash that later runs compare
+        against, so it is committed last: if any other layer fails, the stored
+        hash still differs and the item is retried on the next run.
+        """
+        writes = [self._store_embeddings(batch)]
+        if cache:
+            writes.append(self._cache_documents(batch))
+        await asyncio.gather(*writes)
+
+        await self._store_knowledge(batch, scope)
+
+    async def _store_knowledge(self, batch: List[IngestItem], scope: Optional[str]):
+        """Upsert knowledge rows in PostgreSQL, one transaction per batch"""
+        query = """
+        INSERT INTO knowledge (id, title, content, type, source_url, metadata, content_hash, source_scope,
+                               created_at, updated_at)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, NOW(), NOW())
+        ON CONFLICT (id) DO UPDATE SET
+            title = EXCLUDED.title,
+            content = EXCLUDED.content,
+            type = EXCLUDED.type,
+            source_url = EXCLUDED.source_url,
+            metadata = EXCLUDED.metadata,
+            content_hash = EXCLUDED.content_hash,
+            source_scope = EXCLUDED.source_scope,
+            deleted_at = NULL,
+            updated_at = NOW()
+        """
+
+        rows = []
+        for item in batch:
+            metadata = item.metadata
+            title = metadata.get('title', metadata.get('filename') or f'Document {item.doc_id[:8]}')
+            source_url = metadata.get('url', metadata.get('file_path', ''))
+            doc_type = metadata.get('type', 'document')
+            rows.append((
+                item.doc_id,
+                title[:500],
+                item.content,
+                KNOWLEDGE_TYPES.get(doc_type, doc_type),
+                source_url[:1000],
+                json.dumps(metadata),
+                item.content_hash,
+                scope
+            ))
 
-        except Exception as e:
-            logger.error(f"❌ Embedding generation failed: {e}")
-            return [0.0] * 1536  # Return zero vector on error
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany(query, rows)
+
+    async def _tombstone(self, scope: str, live_ids: List[str]) -> int:
+        """Mark stored items of a scope that are no longer listed as deleted.
+
+        Rows are kept with deleted_at set; their vectors and cache entries are
+        removed so they stop appearing in search. The tombstones are rolled back
+        if the removal fails, so the next run tries again.
+        """
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(
+                    """
+                    UPDATE knowledge SET deleted_at = NOW(), updated_at = NOW()
+                    WHERE source_scope = $1 AND deleted_at IS NULL AND NOT (id = ANY($2::uuid[]))
+                    RETURNING id::text
+                    """,
+                    scope,
+                    live_ids
+                )
+                doc_ids = [row['id'] for row in rows]
+                if doc_ids:
+                    await asyncio.gather(self._delete_embeddings(doc_ids), self._uncache_documents(doc_ids))
+
+        if doc_ids:
+            logger.info(f"🪦 Tombstoned {len(doc_ids)} removed items in {scope}")
+        return len(doc_ids)
+
+    async def _store_embeddings(self, batch: List[IngestItem]):
+        """Upsert a batch of embeddings in the vector database"""
+        payload = {
+            "points": [{
+                "id": item.doc_id,
+                "vector": item.embedding,
+                "payload": {
+                    "content": item.content[:1000],  # Truncate for payload
+                    "metadata": item.metadata,
+                    "doc_id": item.doc_id
+                }
+            } for item in batch]
+        }
 
-    async def _cache_document(self, doc_id: str, content: str, metadata: Dict[str, Any]):
-        """Cache document in Redis"""
-        try:
-            cache_key = f"sophia:knowledge:{doc_id}"
+        # Ids are stable, so a failed batch is upserted again on the next run
+        async with self.http_session.put(
+            f"{self.config['qdrant_url']}/collections/sophia-knowledge-base/points",
+            headers=self.qdrant_headers,
+            json=payload
+        ) as response:
+            if response.status not in (200, 201):
+                raise Exception(f"Vector store error {response.status}: {await response.text()}")
+
+    async def _delete_embeddings(self, doc_ids: List[str]):
+        """Delete points from the vector database"""
+        async with self.http_session.post(
+            f"{self.config['qdrant_url']}/collections/sophia-knowledge-base/points/delete",
+            headers=self.qdrant_headers,
+            json={"points": doc_ids}
+        ) as response:
+            if response.status not in (200, 201):
+                raise Exception(f"Vector store error {response.status}: {await response.text()}")
+
+    async def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a batch of texts in one OpenAI request.
+
+        Errors propagate: a placeholder vector stored with a valid content hash
+        would never be re-embedded.
+        """
+        response = await self.openai_client.embeddings.create(
+            model="text-embedding-ada-002",
+            input=[text[:8000] for text in texts]  # Truncate if too long
+        )
+
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def _cache_documents(self, batch: List[IngestItem]):
+        """Cache a batch of documents in Redis in one pipelined round-trip"""
+        cached_at = datetime.now().isoformat()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for item in batch:
             cache_data = {
-                'content': content,
-                'metadata': metadata,
-                'cached_at': datetime.now().isoformat()
+                'content': item.content,
+                'metadata': item.metadata,
+                'cached_at': cached_at
             }
-
-            self.redis_client.setex(
-                cache_key,
+            pipe.setex(
+                f"sophia:knowledge:{item.doc_id}",
                 86400,  # 24 hours
                 json.dumps(cache_data)
             )
+        await pipe.execute()
 
-            logger.info(f"✅ Cached document: {doc_id}")
-
-        except Exception as e:
-            logger.error(f"❌ Failed to cache document: {e}")
+    async def _uncache_documents(self, doc_ids: List[str]):
+        """Drop cached documents from Redis"""
+        await self.redis_client.delete(*(f"sophia:knowledge:{doc_id}" for doc_id in doc_ids))
 
     async def _extract_document_content(self, doc: Dict[str, Any]) -> Optional[str]:
         """Extract content from document"""
@@ -474,8 +748,7 @@ class DataIngestionPipeline:
                 return doc['content']
             elif 'file_path' in doc:
                 # Read from file
-                with open(doc['file_path'], 'r', encoding='utf-8') as f:
-                    return f.read()
+                return await asyncio.to_thread(Path(doc['file_path']).read_text, encoding='utf-8')
             elif 'url' in doc:
                 # Download from URL
                 return await self._fetch_web_content(doc['url'])
@@ -488,10 +761,9 @@ class DataIngestionPipeline:
     async def _fetch_web_content(self, url: str) -> Optional[str]:
         """Fetch content from web URL"""
         try:
-            import requests
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            return response.text
+            async with self.http_session.get(url) as response:
+                response.raise_for_status()
+                return await response.text()
         except Exception as e:
             logger.error(f"❌ Failed to fetch web content from {url}: {e}")
             return None
@@ -519,16 +791,14 @@ class DataIngestionPipeline:
     async def _fetch_api_data(self, api_config: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Fetch data from API"""
         try:
-            import requests
-
             url = api_config.get('endpoint', '')
             headers = api_config.get('headers', {})
             params = api_config.get('params', {})
 
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-            response.raise_for_status()
+            async with self.http_session.get(url, headers=headers, params=params) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
 
-            data = response.json()
             if isinstance(data, list):
                 return data
             elif isinstance(data, dict) and 'results' in data:
@@ -537,34 +807,55 @@ class DataIngestionPipeline:
                 return [data]
 
         except Exception as e:
+            # Raised rather than returning no records, which would tombstone the whole source
             logger.error(f"❌ Failed to fetch API data: {e}")
-            return []
+            raise
 
-    async def _get_code_files(self, repo_config: Dict[str, Any]) -> Dict[str, str]:
-        """Get code files from repository"""
+    def _list_code_files(self, repo_config: Dict[str, Any]) -> List[str]:
+        """List code file paths in the repository.
+
+        Raises rather than returning a partial or empty listing, which would
+        tombstone the files that could not be listed.
+        """
+        repo_path = repo_config.get('local_path', '.')
+        file_extensions = repo_config.get('extensions', ['.py', '.js', '.ts', '.java', '.cpp', '.c', '.go', '.rs'])
+
+        if not os.path.isdir(repo_path):
+            raise FileNotFoundError(f"Repository path not found: {repo_path}")
+
+        def fail(error: OSError):
+            raise error
+
+        return [
+            os.path.join(root, file)
+            for root, dirs, files in os.walk(repo_path, onerror=fail)
+            for file in files
+            if any(file.endswith(ext) for ext in file_extensions)
+        ]
+
+    @staticmethod
+    def _listing_id(base: str, options: Optional[Dict[str, Any]]) -> str:
+        """``base`` qualified by the options that change what a source lists.
+
+        Sources without such options keep the bare ``base``, so their
+        existing keys and scopes are unchanged.
+        """
+        options = {key: value for key, value in (options or {}).items() if value}
+        if not options:
+            return base
+        normalized = sorted(
+            (key, ','.join(sorted(map(str, value))) if isinstance(value, (list, tuple, set)) else str(value))
+            for key, value in options.items()
+        )
+        return f"{base}?{urlencode(normalized)}"
+
+    async def _read_code_file(self, file_path: str) -> Optional[str]:
+        """Read one code file without blocking the event loop"""
         try:
-            import os
-
-            repo_path = repo_config.get('local_path', '.')
-            file_extensions = repo_config.get('extensions', ['.py', '.js', '.ts', '.java', '.cpp', '.c', '.go', '.rs'])
-
-            code_files = {}
-
-            for root, dirs, files in os.walk(repo_path):
-                for file in files:
-                    if any(file.endswith(ext) for ext in file_extensions):
-                        file_path = os.path.join(root, file)
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                code_files[file_path] = f.read()
-                        except Exception as e:
-                            logger.warning(f"⚠️ Could not read file {file_path}: {e}")
-
-            return code_files
-
+            return await asyncio.to_thread(Path(file_path).read_text, encoding='utf-8')
         except Exception as e:
-            logger.error(f"❌ Failed to get code files: {e}")
-            return {}
+            logger.warning(f"⚠️ Could not read file {file_path}: {e}")
+            return None
 
     def _detect_language(self, file_path: str) -> str:
         """Detect programming language from file path"""
@@ -589,15 +880,16 @@ class DataIngestionPipeline:
     async def get_ingestion_stats(self) -> Dict[str, Any]:
         """Get ingestion statistics"""
         try:
-            # Get database stats
-            self.db_cursor.execute("SELECT COUNT(*) as total_docs FROM knowledge")
-            db_stats = self.db_cursor.fetchone()
+            # Get database stats (tombstoned rows are kept but no longer searchable)
+            total_docs = await self.db_pool.fetchval("SELECT COUNT(*) FROM knowledge WHERE deleted_at IS NULL")
 
             # Get Redis stats
-            redis_keys = len(self.redis_client.keys("sophia:knowledge:*"))
+            redis_keys = 0
+            async for _ in self.redis_client.scan_iter(match="sophia:knowledge:*", count=1000):
+                redis_keys += 1
 
             return {
-                'database_documents': db_stats['total_docs'] if db_stats else 0,
+                'database_documents': total_docs or 0,
                 'cached_documents': redis_keys,
                 'ingestion_stats': self.ingestion_stats
             }
@@ -609,10 +901,14 @@ class DataIngestionPipeline:
     async def cleanup(self):
         """Cleanup resources"""
         try:
-            if self.db_connection:
-                self.db_connection.close()
+            if self.db_pool:
+                await self.db_pool.close()
             if self.redis_client:
-                self.redis_client.close()
+                await self.redis_client.close()
+            if self.http_session:
+                await self.http_session.close()
+            if self.openai_client:
+                await self.openai_client.close()
             logger.info("✅ Pipeline resources cleaned up")
         except Exception as e:
             logger.error(f"❌ Error during cleanup: {e}")
@@ -660,4 +956,4 @@ if __name__ == "__main__":
         await data_pipeline.cleanup()
 
     # Run the example
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
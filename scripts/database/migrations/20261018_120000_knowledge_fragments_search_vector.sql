@@ -0,0 +1,69 @@
+-- Migration: Stored full-text search vector for knowledge_fragments
+-- Version: 20261018_120000
+-- Created: 2026-10-18 12:00:00
+--
+-- Adds a trigger-maintained search_vector column so searches use a GIN index
+-- instead of computing to_tsvector for every row. A GENERATED ... STORED
+-- column would rewrite the whole table under an exclusive lock; this column is
+-- added empty, backfilled in committed batches and indexed concurrently, so
+-- writes continue during the migration. Not wrapped in a transaction for that
+-- reason: every statement is idempotent and the migration can be re-run.
+
+-- ===========================================
+-- UP Migration
+-- ===========================================
+
+ALTER TABLE knowledge_fragments ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION knowledge_fragments_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.content, '')), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS knowledge_fragments_search_vector_update ON knowledge_fragments;
+CREATE TRIGGER knowledge_fragments_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, content ON knowledge_fragments
+    FOR EACH ROW EXECUTE FUNCTION knowledge_fragments_search_vector();
+
+-- Backfill existing rows, committing every 5000
+DO $$
+DECLARE
+    batch_rows INTEGER;
+BEGIN
+    LOOP
+        UPDATE knowledge_fragments
+        SET search_vector =
+            setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+            setweight(to_tsvector('english', COALESCE(content, '')), 'B')
+        WHERE id IN (
+            SELECT id FROM knowledge_fragments
+            WHERE search_vector IS NULL
+            LIMIT 5000
+            FOR UPDATE SKIP LOCKED
+        );
+        GET DIAGNOSTICS batch_rows = ROW_COUNT;
+        EXIT WHEN batch_rows = 0;
+        COMMIT;
+    END LOOP;
+END;
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_knowledge_search_vector
+    ON knowledge_fragments USING gin (search_vector);
+
+ANALYZE knowledge_fragments;
+
+-- ===========================================
+-- DOWN Migration (Rollback)
+-- ===========================================
+
+-- ROLLBACK_START
+DROP INDEX IF EXISTS idx_knowledge_search_vector;
+DROP TRIGGER IF EXISTS knowledge_fragments_search_vector_update ON knowledge_fragments;
+DROP FUNCTION IF EXISTS knowledge_fragments_search_vector();
+ALTER TABLE knowledge_fragments DROP COLUMN IF EXISTS search_vector;
+-- ROLLBACK_END
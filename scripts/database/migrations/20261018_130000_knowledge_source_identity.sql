@@ -0,0 +1,33 @@
+-- Migration: Source identity and tombstones for knowledge
+-- Version: 20261018_130000
+-- Created: 2026-10-18 13:00:00
+--
+-- The ingestion pipeline derives knowledge ids from each source item's key and
+-- compares content_hash to skip unchanged items. source_scope groups the items
+-- of one source so items that disappear from it can be tombstoned (deleted_at)
+-- instead of lingering.
+
+-- ===========================================
+-- UP Migration
+-- ===========================================
+
+BEGIN;
+
+ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS source_scope VARCHAR(500);
+ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_source_scope ON knowledge(source_scope) WHERE deleted_at IS NULL;
+
+COMMIT;
+
+-- ===========================================
+-- DOWN Migration (Rollback)
+-- ===========================================
+
+-- ROLLBACK_START
+DROP INDEX IF EXISTS idx_knowledge_source_scope;
+ALTER TABLE knowledge DROP COLUMN IF EXISTS deleted_at;
+ALTER TABLE knowledge DROP COLUMN IF EXISTS source_scope;
+ALTER TABLE knowledge DROP COLUMN IF EXISTS content_hash;
+-- ROLLBACK_END
@@ -0,0 +1,37 @@
+-- Migration: Change notifications for interactions
+-- Version: 20261018_140000
+-- Created: 2026-10-18 14:00:00
+--
+-- analytics-mcp caches query results and LISTENs on
+-- analytics_interactions_changed to drop them when interactions change. The
+-- trigger is statement-level, so a bulk load sends one notification rather
+-- than one per row.
+
+-- ===========================================
+-- UP Migration
+-- ===========================================
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION analytics_notify_interactions() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('analytics_interactions_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS analytics_interactions_notify ON interactions;
+CREATE TRIGGER analytics_interactions_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interactions
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_notify_interactions();
+
+COMMIT;
+
+-- ===========================================
+-- DOWN Migration (Rollback)
+-- ===========================================
+
+-- ROLLBACK_START
+DROP TRIGGER IF EXISTS analytics_interactions_notify ON interactions;
+DROP FUNCTION IF EXISTS analytics_notify_interactions();
+-- ROLLBACK_END
@@ -0,0 +1,94 @@
+-- Migration: Dirty-day tracking for the interaction rollups
+-- Version: 20261018_150000
+-- Created: 2026-10-18 15:00:00
+--
+-- analytics-mcp keeps per-day aggregates of interactions and only re-aggregates
+-- recent days on its own. These statement-level triggers record the UTC days
+-- touched by inserts, updates and deletes so the refresh job also recomputes
+-- older days that changed. TRUNCATE marks every rolled-up day.
+
+-- ===========================================
+-- UP Migration
+-- ===========================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS interaction_rollup_dirty_days (
+    day DATE PRIMARY KEY
+);
+
+CREATE OR REPLACE FUNCTION interaction_rollup_mark_new_days() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO interaction_rollup_dirty_days (day)
+    SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date FROM new_rows
+    WHERE created_at IS NOT NULL
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION interaction_rollup_mark_old_days() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO interaction_rollup_dirty_days (day)
+    SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date FROM old_rows
+    WHERE created_at IS NOT NULL
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION interaction_rollup_mark_all_days() RETURNS trigger AS $$
+BEGIN
+    IF to_regclass('interaction_daily_rollup') IS NOT NULL THEN
+        INSERT INTO interaction_rollup_dirty_days (day)
+        SELECT DISTINCT day FROM interaction_daily_rollup
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow one event per trigger, so updates mark both the
+-- days rows left and the days they moved to
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_insert ON interactions;
+CREATE TRIGGER interaction_rollup_dirty_insert
+    AFTER INSERT ON interactions REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION interaction_rollup_mark_new_days();
+
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_update_old ON interactions;
+CREATE TRIGGER interaction_rollup_dirty_update_old
+    AFTER UPDATE ON interactions REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION interaction_rollup_mark_old_days();
+
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_update_new ON interactions;
+CREATE TRIGGER interaction_rollup_dirty_update_new
+    AFTER UPDATE ON interactions REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION interaction_rollup_mark_new_days();
+
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_delete ON interactions;
+CREATE TRIGGER interaction_rollup_dirty_delete
+    AFTER DELETE ON interactions REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION interaction_rollup_mark_old_days();
+
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_truncate ON interactions;
+CREATE TRIGGER interaction_rollup_dirty_truncate
+    AFTER TRUNCATE ON interactions
+    FOR EACH STATEMENT EXECUTE FUNCTION interaction_rollup_mark_all_days();
+
+COMMIT;
+
+-- ===========================================
+-- DOWN Migration (Rollback)
+-- ===========================================
+
+-- ROLLBACK_START
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_truncate ON interactions;
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_delete ON interactions;
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_update_new ON interactions;
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_update_old ON interactions;
+DROP TRIGGER IF EXISTS interaction_rollup_dirty_insert ON interactions;
+DROP FUNCTION IF EXISTS interaction_rollup_mark_all_days();
+DROP FUNCTION IF EXISTS interaction_rollup_mark_old_days();
+DROP FUNCTION IF EXISTS interaction_rollup_mark_new_days();
+DROP TABLE IF EXISTS interaction_rollup_dirty_days;
+-- ROLLBACK_END
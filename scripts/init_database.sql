@@ -61,6 +61,9 @@ CREATE TABLE knowledge (
     type knowledge_type DEFAULT 'document',
     source_url VARCHAR(1000),
     metadata JSONB DEFAULT '{}',
+    content_hash VARCHAR(64), -- ingestion skips items whose content is unchanged
+    source_scope VARCHAR(500), -- source the item was ingested from, for tombstoning
+    deleted_at TIMESTAMP WITH TIME ZONE, -- tombstone for items removed from their source
     -- embedding VECTOR(1536), -- OpenAI ada-002 dimensions - requires pgvector extension
     created_by UUID REFERENCES users(id),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
@@ -133,6 +136,7 @@ CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_agents_status ON agents(status);
 CREATE INDEX idx_knowledge_type ON knowledge(type);
 CREATE INDEX idx_knowledge_created_by ON knowledge(created_by);
+CREATE INDEX idx_knowledge_source_scope ON knowledge(source_scope) WHERE deleted_at IS NULL;
 CREATE INDEX idx_conversations_user_id ON conversations(user_id);
 CREATE INDEX idx_messages_conversation_id ON messages(conversation_id);
 CREATE INDEX idx_tasks_user_id ON tasks(user_id);
@@ -4,6 +4,7 @@ Provides comprehensive client health monitoring, churn prediction, and customer
 """
 
 from .client_health_team import ClientHealthTeam, ClientHealthRequest, ClientHealthScore
+from .data_loader import ClientDataLoader
 from .agents.usage_analyst import UsageAnalystAgent
 from .agents.support_analyst import SupportAnalystAgent
 from .agents.engagement_analyst import EngagementAnalystAgent
@@ -14,6 +15,7 @@ __all__ = [
     "ClientHealthTeam",
     "ClientHealthRequest",
     "ClientHealthScore",
+    "ClientDataLoader",
     "UsageAnalystAgent",
     "SupportAnalystAgent",
     "EngagementAnalystAgent",
@@ -4,6 +4,7 @@ Client Success Manager Agent - Coordinates client health assessment and provides
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
+import asyncio
 import logging
 
 from agno import Agent
@@ -30,6 +31,7 @@ class ClientSuccessManagerAgent(Agent):
         self.integrations = integrations
         self.usage_analyst = None  # Will be injected
         self.support_analyst = None  # Will be injected
+        self.data_loader = None  # Shared ClientDataLoader, injected by the team
 
     def _create_tools(self) -> List[Any]:
         """Create tools for client success management"""
@@ -54,11 +56,13 @@ class ClientSuccessManagerAgent(Agent):
     ) -> Dict[str, Any]:
         """Perform comprehensive client health assessment"""
         try:
-            # Gather data from multiple sources
-            usage_data = await self._gather_usage_data(client_id)
-            support_data = await self._gather_support_data(client_id)
-            engagement_data = await self._gather_engagement_data(client_id)
-            business_data = await self._gather_business_data(client_id)
+            # Gather data from multiple sources concurrently
+            usage_data, support_data, engagement_data, business_data = await asyncio.gather(
+                self._gather_usage_data(client_id),
+                self._gather_support_data(client_id),
+                self._gather_engagement_data(client_id),
+                self._gather_business_data(client_id)
+            )
 
             # Calculate health scores for different dimensions
             usage_health = self._calculate_usage_health(usage_data)
@@ -125,7 +129,7 @@ class ClientSuccessManagerAgent(Agent):
         """Identify risk factors that could lead to client churn or dissatisfaction"""
         try:
             # Get comprehensive health assessment
-            health_assessment = await self.assess_client_health(client_id)
+            health_assessment = await self._load_health_assessment(client_id)
 
             if "error" in health_assessment:
                 return health_assessment
@@ -189,7 +193,7 @@ class ClientSuccessManagerAgent(Agent):
         """Develop a comprehensive success plan for the client"""
         try:
             # Get current health assessment and risk factors
-            health_assessment = await self.assess_client_health(client_id)
+            health_assessment = await self._load_health_assessment(client_id)
             risk_factors = await self.identify_risk_factors(client_id)
 
             if "error" in health_assessment or "error" in risk_factors:
@@ -245,7 +249,7 @@ class ClientSuccessManagerAgent(Agent):
         """Monitor client progress against success plan and health goals"""
         try:
             # Get current health assessment
-            current_assessment = await self.assess_client_health(client_id)
+            current_assessment = await self._load_health_assessment(client_id)
 
             if "error" in current_assessment:
                 return current_assessment
@@ -312,7 +316,7 @@ class ClientSuccessManagerAgent(Agent):
         """Generate strategic recommendations for client success and growth"""
         try:
             # Gather comprehensive data
-            health_assessment = await self.assess_client_health(client_id)
+            health_assessment = await self._load_health_assessment(client_id)
             risk_factors = await self.identify_risk_factors(client_id)
             progress_monitoring = await self.monitor_client_progress(client_id)
 
@@ -371,6 +375,12 @@ class ClientSuccessManagerAgent(Agent):
             logger.error(f"Error generating strategic recommendations for {client_id}: {e}")
             return {"error": str(e)}
 
+    async def _load_health_assessment(self, client_id: str) -> Dict[str, Any]:
+        """Comprehensive assessment, shared across tools through the data loader"""
+        if self.data_loader:
+            return await self.data_loader.load("health_assessment", client_id, "comprehensive")
+        return await self.assess_client_health(client_id)
+
     async def _gather_usage_data(self, client_id: str) -> List[Dict[str, Any]]:
         """Gather usage data for the client"""
         if self.usage_analyst:
@@ -412,6 +422,12 @@ class ClientSuccessManagerAgent(Agent):
         ]
 
     async def _gather_engagement_data(self, client_id: str) -> List[Dict[str, Any]]:
+        """Gather engagement data, through the shared data loader when available"""
+        if self.data_loader:
+            return await self.data_loader.load("engagement", client_id)
+        return await self._request_engagement_data(client_id)
+
+    async def _request_engagement_data(self, client_id: str, window: Any = None) -> List[Dict[str, Any]]:
         """Gather engagement data for the client"""
         # Mock implementation
         return [
@@ -425,6 +441,12 @@ class ClientSuccessManagerAgent(Agent):
         ]
 
     async def _gather_business_data(self, client_id: str) -> List[Dict[str, Any]]:
+        """Gather business data, through the shared data loader when available"""
+        if self.data_loader:
+            return await self.data_loader.load("business", client_id)
+        return await self._request_business_data(client_id)
+
+    async def _request_business_data(self, client_id: str, window: Any = None) -> List[Dict[str, Any]]:
         """Gather business data for the client"""
         # Mock implementation
         return [
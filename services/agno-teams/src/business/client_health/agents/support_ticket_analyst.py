@@ -29,6 +29,7 @@ class SupportTicketAnalystAgent(Agent):
 
         self.integrations = integrations
         self.support_url = integrations.get("support_system", "http://mcp-support:8080")
+        self.data_loader = None  # Shared ClientDataLoader, injected by the team
 
     def _create_tools(self) -> List[Any]:
         """Create tools for support ticket analysis"""
@@ -275,6 +276,12 @@ class SupportTicketAnalystAgent(Agent):
             return {"error": str(e)}
 
     async def _fetch_support_tickets(self, client_id: str, days: int) -> List[Dict[str, Any]]:
+        """Fetch support tickets, through the team's shared data loader when available"""
+        if self.data_loader:
+            return await self.data_loader.load("support_tickets", client_id, days)
+        return await self._request_support_tickets(client_id, days)
+
+    async def _request_support_tickets(self, client_id: str, days: int) -> List[Dict[str, Any]]:
         """Fetch support tickets from the support system"""
         # Mock implementation - would make actual API calls
         return [
@@ -29,6 +29,7 @@ class UsageAnalystAgent(Agent):
 
         self.integrations = integrations
         self.usage_metrics_url = integrations.get("usage_metrics", "http://mcp-usage:8080")
+        self.data_loader = None  # Shared ClientDataLoader, injected by the team
 
     def _create_tools(self) -> List[Any]:
         """Create tools for usage analysis"""
@@ -294,6 +295,12 @@ class UsageAnalystAgent(Agent):
             return {"error": str(e)}
 
     async def _fetch_usage_data(self, client_id: str, days: int) -> List[Dict[str, Any]]:
+        """Fetch usage data, through the team's shared data loader when available"""
+        if self.data_loader:
+            return await self.data_loader.load("usage", client_id, days)
+        return await self._request_usage_data(client_id, days)
+
+    async def _request_usage_data(self, client_id: str, days: int) -> List[Dict[str, Any]]:
         """Fetch usage data from the usage metrics service"""
         # Mock implementation - would make actual API calls
         return [
@@ -342,8 +349,8 @@ class UsageAnalystAgent(Agent):
         if len(usage_data) < 2:
             return {"trend": "insufficient_data"}
 
-        # Sort by date
-        usage_data.sort(key=lambda x: x.get("date", ""))
+        # Sort by date (copy: loaded data is shared between agents)
+        usage_data = sorted(usage_data, key=lambda x: x.get("date", ""))
 
         # Calculate trend in key metrics
         recent_logins = sum(d.get("logins", 0) for d in usage_data[-7:])  # Last 7 days
@@ -13,6 +13,8 @@ import os
 from agno import Team, Agent, Memory
 from agno.collaboration import CollaborationMode
 
+from .data_loader import ClientDataLoader
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -61,6 +63,11 @@ class ClientHealthTeam(Team):
         self.churn_model = self._initialize_churn_model()
         self.ltv_model = self._initialize_ltv_model()
 
+        # Shared data-fetch layer so agents never fetch the same client data twice
+        self.data_loader = ClientDataLoader(
+            ttl_seconds=float(os.getenv("CLIENT_HEALTH_DATA_TTL_SECONDS", "300"))
+        )
+
         # Initialize agents
         self.agents = self._create_agents()
 
@@ -116,9 +123,30 @@ class ClientHealthTeam(Team):
 
         # CRITICAL FIX: Set up agent collaboration framework
         self._setup_agent_collaboration(agents)
+        self._setup_data_loader(agents)
 
         return agents
 
+    def _setup_data_loader(self, agents: Dict[str, Agent]):
+        """Register data sources with the shared loader and hand it to every agent"""
+        usage_analyst = agents["usage_analyst"]
+        support_analyst = agents["support_analyst"]
+        success_manager = agents["client_success_manager"]
+
+        self.data_loader.register("usage", usage_analyst._request_usage_data)
+        self.data_loader.register("support_tickets", support_analyst._request_support_tickets)
+        self.data_loader.register("engagement", success_manager._request_engagement_data)
+        self.data_loader.register("business", success_manager._request_business_data)
+        self.data_loader.register(
+            "health_assessment",
+            lambda client_id, assessment_type: success_manager.assess_client_health(
+                client_id, assessment_type
+            )
+        )
+
+        for agent in agents.values():
+            agent.data_loader = self.data_loader
+
     async def analyze_client_health(
         self,
         request: ClientHealthRequest
@@ -156,6 +184,7 @@ class ClientHealthTeam(Team):
             self.health_scores[score.client_id] = score
 
         logger.info(f"Analyzed {len(health_scores)} clients, generated {len(alerts)} alerts")
+        logger.debug(f"Client data loader stats: {self.data_loader.get_stats()}")
 
         return health_scores
 
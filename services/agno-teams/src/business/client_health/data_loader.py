@@ -0,0 +1,179 @@
+"""
+Client Data Loader - Shared, deduplicating data-fetch layer for the client health agents
+"""
+
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable, Hashable
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+FetchOne = Callable[[str, Hashable], Awaitable[Any]]
+FetchMany = Callable[[List[str], Hashable], Awaitable[Dict[str, Any]]]
+
+@dataclass
+class DataSource:
+    """A registered data source and how to fetch it"""
+    name: str
+    fetch_one: FetchOne
+    fetch_many: Optional[FetchMany] = None
+
+@dataclass
+class LoaderStats:
+    """Counters showing how much fetching the loader saved"""
+    requests: int = 0
+    cache_hits: int = 0
+    deduplicated: int = 0
+    fetches: int = 0
+    batches: int = 0
+    errors: int = 0
+    by_source: Dict[str, int] = field(default_factory=dict)
+
+class ClientDataLoader:
+    """Batches, deduplicates and briefly caches per-client data fetches.
+
+    Every agent in a ClientHealthTeam shares one loader, so usage, support,
+    engagement and business data are fetched once per (source, client,
+    window) no matter how many agents or tools ask for them. Requests made in
+    the same event-loop tick are grouped per (source, window) and sent to the
+    source's batch fetcher when it has one.
+
+    Loaded values are shared between callers and must be treated as read-only.
+    Results that are exceptions or ``{"error": ...}`` dicts are not cached.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self.sources: Dict[str, DataSource] = {}
+        self.stats = LoaderStats()
+
+        self._cache: Dict[Tuple[str, str, Hashable], Tuple[Any, float]] = {}
+        self._inflight: Dict[Tuple[str, str, Hashable], asyncio.Future] = {}
+        self._pending: Dict[Tuple[str, Hashable], List[str]] = {}
+        self._dispatch_scheduled = False
+
+    def register(self, source: str, fetch_one: FetchOne, fetch_many: Optional[FetchMany] = None):
+        """Register how to fetch a data source for one client (and optionally many)"""
+        self.sources[source] = DataSource(name=source, fetch_one=fetch_one, fetch_many=fetch_many)
+
+    async def load(self, source: str, client_id: str, window: Hashable = None) -> Any:
+        """Load one client's data for a source and window"""
+        return await self._enqueue(source, client_id, window)
+
+    async def load_many(
+        self,
+        source: str,
+        client_ids: List[str],
+        window: Hashable = None
+    ) -> Dict[str, Any]:
+        """Load several clients' data for a source in one batch"""
+        unique_ids = list(dict.fromkeys(client_ids))
+        results = await asyncio.gather(
+            *(self._enqueue(source, client_id, window) for client_id in unique_ids),
+            return_exceptions=True
+        )
+        return dict(zip(unique_ids, results))
+
+    def invalidate(self, client_id: Optional[str] = None, source: Optional[str] = None):
+        """Drop cached entries for a client and/or source (everything if neither is given)"""
+        for key in list(self._cache):
+            key_source, key_client, _ = key
+            if (client_id is None or key_client == client_id) and (source is None or key_source == source):
+                del self._cache[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Loader effectiveness counters"""
+        return {
+            "requests": self.stats.requests,
+            "cache_hits": self.stats.cache_hits,
+            "deduplicated": self.stats.deduplicated,
+            "fetches": self.stats.fetches,
+            "batches": self.stats.batches,
+            "errors": self.stats.errors,
+            "fetches_by_source": dict(self.stats.by_source),
+            "cached_entries": len(self._cache)
+        }
+
+    def _enqueue(self, source: str, client_id: str, window: Hashable) -> asyncio.Future:
+        if source not in self.sources:
+            raise KeyError(f"Unknown data source: {source}")
+
+        self.stats.requests += 1
+        key = (source, client_id, window)
+        loop = asyncio.get_running_loop()
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            value, expires_at = cached
+            if time.monotonic() < expires_at:
+                self.stats.cache_hits += 1
+                future = loop.create_future()
+                future.set_result(value)
+                return future
+            del self._cache[key]
+
+        if key in self._inflight:
+            self.stats.deduplicated += 1
+            return self._inflight[key]
+
+        future = loop.create_future()
+        self._inflight[key] = future
+        self._pending.setdefault((source, window), []).append(client_id)
+
+        # Dispatch on the next loop iteration so same-tick requests batch together
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._dispatch)
+
+        return future
+
+    def _dispatch(self):
+        self._dispatch_scheduled = False
+        pending, self._pending = self._pending, {}
+        for (source, window), client_ids in pending.items():
+            asyncio.ensure_future(self._run_batch(source, window, client_ids))
+
+    async def _run_batch(self, source: str, window: Hashable, client_ids: List[str]):
+        data_source = self.sources[source]
+        self.stats.batches += 1
+
+        results: Dict[str, Any] = {}
+        if data_source.fetch_many is not None and len(client_ids) > 1:
+            self._count_fetch(source)
+            try:
+                batch = await data_source.fetch_many(client_ids, window)
+                for client_id in client_ids:
+                    results[client_id] = batch.get(client_id)
+            except Exception as e:
+                logger.error(f"Batch fetch of {source} failed: {e}")
+                results = {client_id: e for client_id in client_ids}
+        else:
+            for _ in client_ids:
+                self._count_fetch(source)
+            values = await asyncio.gather(
+                *(data_source.fetch_one(client_id, window) for client_id in client_ids),
+                return_exceptions=True
+            )
+            results = dict(zip(client_ids, values))
+
+        expires_at = time.monotonic() + self.ttl_seconds
+        for client_id, value in results.items():
+            key = (source, client_id, window)
+            future = self._inflight.pop(key, None)
+
+            if isinstance(value, BaseException):
+                self.stats.errors += 1
+                if future is not None and not future.done():
+                    future.set_exception(value)
+                continue
+
+            if not (isinstance(value, dict) and "error" in value):
+                self._cache[key] = (value, expires_at)
+            if future is not None and not future.done():
+                future.set_result(value)
+
+    def _count_fetch(self, source: str):
+        self.stats.fetches += 1
+        self.stats.by_source[source] = self.stats.by_source.get(source, 0) + 1
@@ -13,7 +13,8 @@ import ast
 import git
 import hashlib
 import asyncio
-from typing import Dict, List, Any, Optional
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Set, Iterable
 from datetime import datetime
 from pathlib import Path
 from watchdog.observers import Observer
@@ -39,12 +40,58 @@ class CodebaseIndex:
         self.file_hashes = {}
         self.dependencies = {}
         
+        # Reverse indexes, maintained per file as files are (re)indexed
+        self.definitions: Dict[str, Dict[str, List[Dict]]] = defaultdict(dict)  # name -> file -> symbols
+        self.name_importers: Dict[str, Dict[str, str]] = defaultdict(dict)  # imported name -> file -> import type
+        self.module_importers: Dict[str, Set[str]] = defaultdict(set)  # module -> importing files
+        
+        # Redis keys; each is a hash with one field per file (or symbol name)
+        self.index_key = f"codebase_index:{self.repo_path}"
+        self.graph_key = f"symbol_graph:{self.repo_path}"
+        self.hashes_key = f"file_hashes:{self.repo_path}"
+        self.definitions_key = f"symbol_definitions:{self.repo_path}"
+        
+        # Files and symbol names touched since the last cache_index()
+        self._dirty_files: Set[str] = set()
+        self._dirty_names: Set[str] = set()
+    
+    async def load_cached_index(self) -> int:
+        """Restore the index from Redis so the next full_index only re-parses changed files"""
+        try:
+            for key in (self.index_key, self.graph_key):
+                # Earlier versions stored these as one JSON string
+                if redis_client.type(key) == "string":
+                    redis_client.delete(key)
+            cached = redis_client.hgetall(self.index_key)
+        except redis.RedisError as e:
+            print(f"Could not load cached index: {e}")
+            return 0
+        
+        for file_path, raw in cached.items():
+            entry = json.loads(raw)
+            self.index[file_path] = entry
+            self.file_hashes[file_path] = entry["hash"]
+            self.dependencies[file_path] = entry["imports"]
+            self._add_reverse_entries(file_path, entry)
+        self._update_graph(self.index.keys())
+        self._dirty_files.clear()
+        self._dirty_names.clear()
+        
+        print(f"Loaded {len(cached)} cached files for {self.repo_path}")
+        return len(cached)
+        
     async def full_index(self):
         """Perform full codebase indexing"""
         print(f"Starting full index of {self.repo_path}")
         
+        seen = set()
         for file_path in self.repo_path.rglob("*.py"):
+            seen.add(str(file_path.relative_to(self.repo_path)))
             await self.index_file(file_path)
+        
+        # Drop files deleted since the cached index was written
+        for file_path in [f for f in self.index if f not in seen]:
+            self.remove_file(file_path)
             
         # Build symbol relationships
         await self.build_symbol_graph()
@@ -58,8 +105,8 @@ class CodebaseIndex:
             "relationships": len(self.symbol_graph)
         }
     
-    async def index_file(self, file_path: Path):
-        """Index a single Python file"""
+    async def index_file(self, file_path: Path) -> bool:
+        """Index a single Python file; returns True if its entry changed"""
         relative_path = file_path.relative_to(self.repo_path)
         
         try:
@@ -71,9 +118,7 @@ class CodebaseIndex:
             
             # Skip if unchanged
             if self.file_hashes.get(str(relative_path)) == file_hash:
-                return
-                
-            self.file_hashes[str(relative_path)] = file_hash
+                return False
             
             # Parse AST
             tree = ast.parse(content)
@@ -84,7 +129,12 @@ class CodebaseIndex:
             # Extract imports and dependencies
             imports = self.extract_imports(tree)
             
-            # Store in index
+            # Store in index, replacing the file's previous reverse-index entries
+            previous = self.index.get(str(relative_path))
+            if previous:
+                self._remove_reverse_entries(str(relative_path), previous)
+            
+            self.file_hashes[str(relative_path)] = file_hash
             self.index[str(relative_path)] = {
                 "path": str(relative_path),
                 "hash": file_hash,
@@ -98,8 +148,108 @@ class CodebaseIndex:
             # Track dependencies
             self.dependencies[str(relative_path)] = imports
             
+            self._add_reverse_entries(str(relative_path), self.index[str(relative_path)])
+            self._mark_affected(str(relative_path), previous, self.index[str(relative_path)])
+            return True
+            
         except Exception as e:
             print(f"Error indexing {file_path}: {e}")
+            return False
+    
+    def remove_file(self, file_path: str):
+        """Drop a deleted file from the index"""
+        entry = self.index.pop(file_path, None)
+        self.file_hashes.pop(file_path, None)
+        self.dependencies.pop(file_path, None)
+        self.symbol_graph.pop(file_path, None)
+        if entry:
+            self._remove_reverse_entries(file_path, entry)
+            self._mark_affected(file_path, entry, None)
+    
+    def _add_reverse_entries(self, file_path: str, entry: Dict):
+        for symbol in entry["symbols"]:
+            self.definitions[symbol["name"]].setdefault(file_path, []).append(symbol)
+        for imp in entry["imports"]:
+            self.module_importers[imp["module"]].add(file_path)
+            if imp.get("name"):
+                self.name_importers[imp["name"]][file_path] = imp["type"]
+    
+    def _remove_reverse_entries(self, file_path: str, entry: Dict):
+        for name in {symbol["name"] for symbol in entry["symbols"]}:
+            files = self.definitions.get(name)
+            if files is not None:
+                files.pop(file_path, None)
+                if not files:
+                    del self.definitions[name]
+        for imp in entry["imports"]:
+            importers = self.module_importers.get(imp["module"])
+            if importers is not None:
+                importers.discard(file_path)
+                if not importers:
+                    del self.module_importers[imp["module"]]
+            importers = self.name_importers.get(imp.get("name"))
+            if importers is not None:
+                importers.pop(file_path, None)
+                if not importers:
+                    del self.name_importers[imp["name"]]
+    
+    def _mark_affected(self, file_path: str, old: Optional[Dict], new: Optional[Dict]):
+        """Record the files whose graph entries depend on this file's symbols or imports"""
+        self._dirty_files.add(file_path)
+        for entry in (old, new):
+            if not entry:
+                continue
+            for symbol in entry["symbols"]:
+                self._dirty_names.add(symbol["name"])
+                # Importers of a name resolve it against the definitions
+                self._dirty_files.update(self.name_importers.get(symbol["name"], ()))
+            for imp in entry["imports"]:
+                # Imported modules gain or lose this file as an importer
+                self._dirty_files.update(self.resolve_module(imp["module"], file_path))
+    
+    @staticmethod
+    def module_parts(file_path: str) -> List[str]:
+        parts = list(Path(file_path).with_suffix("").parts)
+        if parts and parts[-1] == "__init__":
+            parts = parts[:-1]
+        return parts
+    
+    def resolve_module(self, module: str, importer: str) -> List[str]:
+        """Indexed files an import may refer to: from the repo root or the importer's directory"""
+        candidates = []
+        base = module.replace(".", "/")
+        importer_dir = str(Path(importer).parent)
+        for prefix in ("", "" if importer_dir == "." else importer_dir):
+            stem = f"{prefix}/{base}" if prefix else base
+            for path in (f"{stem}.py", f"{stem}/__init__.py"):
+                if path in self.index and path not in candidates:
+                    candidates.append(path)
+        return candidates
+    
+    def get_importers(self, file_path: str) -> List[str]:
+        """Files importing this file, by full dotted path or relative to their own directory"""
+        parts = self.module_parts(file_path)
+        importers = set()
+        for k in range(len(parts)):
+            directory = "/".join(parts[:k]) or "."
+            for importer in self.module_importers.get(".".join(parts[k:]), ()):
+                if k == 0 or str(Path(importer).parent) == directory:
+                    importers.add(importer)
+        importers.discard(file_path)
+        return sorted(importers)
+    
+    def _update_graph(self, file_paths: Iterable[str]):
+        for file_path in file_paths:
+            file_data = self.index.get(file_path)
+            if not file_data:
+                self.symbol_graph.pop(file_path, None)
+                continue
+            imports = [imp["name"] for imp in file_data["imports"] if imp.get("name") in self.definitions]
+            imported_by = self.get_importers(file_path)
+            if imports or imported_by:
+                self.symbol_graph[file_path] = {"imports": imports, "imported_by": imported_by}
+            else:
+                self.symbol_graph.pop(file_path, None)
     
     def extract_symbols(self, tree: ast.AST, file_path: str) -> List[Dict]:
         """Extract all symbols from AST"""
@@ -169,71 +319,65 @@ class CodebaseIndex:
             return str(node)
     
     async def build_symbol_graph(self):
-        """Build relationships between symbols"""
-        self.symbol_graph = {}
-        
-        # Map all symbols to their locations
-        symbol_map = {}
-        for file_path, file_data in self.index.items():
-            for symbol in file_data["symbols"]:
-                symbol_key = f"{symbol['name']}:{symbol['type']}"
-                if symbol_key not in symbol_map:
-                    symbol_map[symbol_key] = []
-                symbol_map[symbol_key].append({
-                    "file": file_path,
-                    "line": symbol["line"],
-                    **symbol
-                })
-        
-        # Build relationships
-        for file_path, file_data in self.index.items():
-            # Check imports for relationships
-            for imp in file_data["imports"]:
-                if imp["name"] in symbol_map:
-                    if file_path not in self.symbol_graph:
-                        self.symbol_graph[file_path] = {"imports": [], "imported_by": []}
-                    self.symbol_graph[file_path]["imports"].append(imp["name"])
-        
+        """Bring relationships up to date for files affected since the last build"""
+        self._update_graph(self._dirty_files)
         return self.symbol_graph
     
     async def cache_index(self):
-        """Cache index in Redis"""
-        # Store main index
-        redis_client.set(
-            f"codebase_index:{self.repo_path}",
-            json.dumps(self.index),
-            ex=3600  # 1 hour expiry
-        )
+        """Write the entries of files and symbols changed since the last call to Redis"""
+        files = self._dirty_files
+        names = self._dirty_names
+        self._dirty_files = set()
+        self._dirty_names = set()
+        if not files and not names:
+            return
         
-        # Store symbol graph
-        redis_client.set(
-            f"symbol_graph:{self.repo_path}",
-            json.dumps(self.symbol_graph),
-            ex=3600
-        )
-        
-        # Store file hashes for change detection
-        redis_client.hset(
-            f"file_hashes:{self.repo_path}",
-            mapping=self.file_hashes
-        )
+        pipe = redis_client.pipeline(transaction=False)
+        for file_path in files:
+            if file_path in self.index:
+                pipe.hset(self.index_key, file_path, json.dumps(self.index[file_path]))
+                pipe.hset(self.hashes_key, file_path, self.file_hashes[file_path])
+            else:
+                pipe.hdel(self.index_key, file_path)
+                pipe.hdel(self.hashes_key, file_path)
+            if file_path in self.symbol_graph:
+                pipe.hset(self.graph_key, file_path, json.dumps(self.symbol_graph[file_path]))
+            else:
+                pipe.hdel(self.graph_key, file_path)
+        for name in names:
+            locations = [
+                {"file": file_path, "line": symbol["line"], "type": symbol["type"]}
+                for file_path, symbols in self.definitions.get(name, {}).items()
+                for symbol in symbols
+            ]
+            if locations:
+                pipe.hset(self.definitions_key, name, json.dumps(locations))
+            else:
+                pipe.hdel(self.definitions_key, name)
+        pipe.execute()
     
     async def incremental_update(self, changed_files: List[str]):
         """Update index for changed files only"""
         updated = []
+        removed = []
         
         for file_path in changed_files:
             full_path = self.repo_path / file_path
-            if full_path.exists() and full_path.suffix == '.py':
-                await self.index_file(full_path)
-                updated.append(file_path)
+            if full_path.suffix != '.py':
+                continue
+            if full_path.exists():
+                if await self.index_file(full_path):
+                    updated.append(file_path)
+            elif file_path in self.index:
+                self.remove_file(file_path)
+                removed.append(file_path)
         
         # Rebuild affected parts of symbol graph
-        if updated:
+        if updated or removed:
             await self.build_symbol_graph()
             await self.cache_index()
         
-        return {"updated_files": updated}
+        return {"updated_files": updated, "removed_files": removed}
     
     async def get_context_for_symbol(self, symbol_name: str) -> Dict:
         """Get comprehensive context for a symbol"""
@@ -246,24 +390,21 @@ class CodebaseIndex:
         }
         
         # Find definitions
-        for file_path, file_data in self.index.items():
-            for symbol in file_data["symbols"]:
-                if symbol["name"] == symbol_name:
-                    context["definitions"].append({
-                        "file": file_path,
-                        "line": symbol["line"],
-                        "type": symbol["type"],
-                        "details": symbol
-                    })
+        for file_path, symbols in self.definitions.get(symbol_name, {}).items():
+            for symbol in symbols:
+                context["definitions"].append({
+                    "file": file_path,
+                    "line": symbol["line"],
+                    "type": symbol["type"],
+                    "details": symbol
+                })
         
         # Find usages (simplified - would need more sophisticated analysis)
-        for file_path, file_data in self.index.items():
-            for imp in file_data["imports"]:
-                if imp.get("name") == symbol_name:
-                    context["usages"].append({
-                        "file": file_path,
-                        "import_type": imp["type"]
-                    })
+        for file_path, import_type in self.name_importers.get(symbol_name, {}).items():
+            context["usages"].append({
+                "file": file_path,
+                "import_type": import_type
+            })
         
         # Find related symbols
         for definition in context["definitions"]:
@@ -280,39 +421,148 @@ class CodebaseIndex:
         return context
 
 class FileChangeHandler(FileSystemEventHandler):
-    """Watch for file changes and trigger incremental indexing"""
+    """Watch for file changes and trigger incremental indexing
     
-    def __init__(self, indexer: CodebaseIndex):
+    Watchdog calls the on_* methods from its observer thread; they only hand
+    paths to the service's event loop. There, events are coalesced by path and
+    flushed as one incremental_update batch once no event has arrived for
+    ``debounce_seconds`` (or ``max_delay_seconds`` after the first pending one).
+    """
+    
+    IGNORED_PARTS = {".git", "__pycache__", "node_modules", ".venv", "venv"}
+    
+    def __init__(self, indexer: CodebaseIndex, loop: asyncio.AbstractEventLoop,
+                 debounce_seconds: float = 2.0, max_delay_seconds: float = 10.0):
         self.indexer = indexer
-        self.pending_updates = set()
+        self.loop = loop
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        
+        # Loop-thread state
+        self.pending_updates: Set[str] = set()
+        self.first_pending_at: Optional[float] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
         self.last_update = datetime.now()
         
+        self.events_received = 0
+        self.files_reindexed = 0
+        self.files_removed = 0
+        self.flushes = 0
+    
+    # Observer thread
+    
+    def on_created(self, event):
+        self._forward(event.src_path, event.is_directory)
+    
     def on_modified(self, event):
-        if not event.is_directory and event.src_path.endswith('.py'):
-            self.pending_updates.add(event.src_path)
-            # Debounce - wait 2 seconds before processing
-            asyncio.create_task(self.process_updates())
+        if not event.is_directory:
+            self._forward(event.src_path, False)
+    
+    def on_deleted(self, event):
+        self._forward(event.src_path, event.is_directory)
+    
+    def on_moved(self, event):
+        # A rename removes the old path and indexes the new one
+        self._forward(event.src_path, event.is_directory)
+        self._forward(event.dest_path, event.is_directory)
+    
+    def _forward(self, path: str, is_directory: bool):
+        try:
+            relative = Path(path).relative_to(self.indexer.repo_path)
+        except ValueError:
+            return
+        if self.IGNORED_PARTS.intersection(relative.parts):
+            return
+        if is_directory or relative.suffix == ".py":
+            self.loop.call_soon_threadsafe(self._add, str(relative), is_directory)
+    
+    # Event loop
+    
+    def _add(self, relative: str, is_directory: bool):
+        self.events_received += 1
+        if is_directory:
+            # Directory deletes/renames: every indexed file below it, plus any
+            # files now present there (a created or renamed-in directory)
+            prefix = f"{relative}/"
+            self.pending_updates.update(f for f in self.indexer.index if f.startswith(prefix))
+            directory = self.indexer.repo_path / relative
+            if directory.is_dir():
+                self.pending_updates.update(
+                    str(p.relative_to(self.indexer.repo_path)) for p in directory.rglob("*.py")
+                )
+        else:
+            self.pending_updates.add(relative)
+        
+        now = self.loop.time()
+        if self.first_pending_at is None:
+            self.first_pending_at = now
+        
+        # Trailing-edge debounce, capped so a steady stream of events still flushes
+        delay = min(self.debounce_seconds, max(0.0, self.first_pending_at + self.max_delay_seconds - now))
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        self._flush_handle = self.loop.call_later(delay, self._start_flush)
+    
+    def _start_flush(self):
+        self._flush_handle = None
+        if self._flush_task and not self._flush_task.done():
+            return  # the running flush picks up what is pending when it finishes
+        self._flush_task = self.loop.create_task(self.process_updates())
     
     async def process_updates(self):
-        await asyncio.sleep(2)
-        if self.pending_updates:
-            files = list(self.pending_updates)
+        while self.pending_updates:
+            files = sorted(self.pending_updates)
             self.pending_updates.clear()
-            await self.indexer.incremental_update(files)
+            self.first_pending_at = None
+            try:
+                result = await self.indexer.incremental_update(files)
+                self.files_reindexed += len(result["updated_files"])
+                self.files_removed += len(result["removed_files"])
+            except Exception as e:
+                print(f"Incremental update of {len(files)} files failed: {e}")
+            self.flushes += 1
+            self.last_update = datetime.now()
+            # Events that arrived during the update wait for their own debounce
+            if self._flush_handle:
+                break
+    
+    def stop(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_task:
+            self._flush_task.cancel()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events_received": self.events_received,
+            "files_reindexed": self.files_reindexed,
+            "files_removed": self.files_removed,
+            "flushes": self.flushes,
+            "pending": len(self.pending_updates),
+            "last_update": self.last_update.isoformat()
+        }
 
 # API Endpoints
 indexer = None
 observer = None
+event_handler = None
 
 @app.on_event("startup")
 async def startup():
-    global indexer, observer
+    global indexer, observer, event_handler
     # Initialize with current directory or configured path
     repo_path = os.getenv("REPO_PATH", "/Users/lynnmusil/sophia-ai-intel-1")
     indexer = CodebaseIndex(repo_path)
+    await indexer.load_cached_index()
     
     # Start file watcher
-    event_handler = FileChangeHandler(indexer)
+    event_handler = FileChangeHandler(
+        indexer,
+        asyncio.get_running_loop(),
+        debounce_seconds=float(os.getenv("INDEX_DEBOUNCE_SECONDS", "2.0"))
+    )
     observer = Observer()
     observer.schedule(event_handler, repo_path, recursive=True)
     observer.start()
@@ -325,6 +575,8 @@ async def shutdown():
     if observer:
         observer.stop()
         observer.join()
+    if event_handler:
+        event_handler.stop()
 
 @app.get("/")
 async def root():
@@ -353,7 +605,8 @@ async def get_index_status():
         "last_update": max(
             (f["last_indexed"] for f in indexer.index.values()),
             default="never"
-        )
+        ),
+        "watcher": event_handler.stats() if event_handler else None
     }
 
 @app.post("/index/refresh")
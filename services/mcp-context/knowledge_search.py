@@ -0,0 +1,81 @@
+"""
+Knowledge fragment search queries for the enhanced context service
+
+Full-text matching uses the stored search_vector column (maintained by a
+trigger, GIN-indexed) rather than computing to_tsvector for every row. When a
+query embedding is available, candidates from the text index and from the
+embedding index are merged and ranked by a weighted blend of ts_rank_cd and
+cosine similarity.
+
+Parameters: $1 query text, $2 quality threshold, $3 access levels, $4 limit;
+hybrid only: $5 candidates per branch, $6 query embedding (pgvector text
+literal), $7 weight of the text score. Hybrid only pays off once fragments
+carry embeddings; EMBEDDINGS_PRESENT_SQL tells the caller whether any do.
+"""
+
+from typing import List
+
+SEARCH_VECTOR_INDEX = "idx_knowledge_search_vector"
+
+EMBEDDINGS_PRESENT_SQL = (
+    "SELECT EXISTS (SELECT 1 FROM knowledge_fragments WHERE embedding_vector IS NOT NULL)"
+)
+
+_FILTERS = "kf.quality_score >= $2 AND kf.access_level = ANY($3)"
+
+_COLUMNS = """kf.id, kf.title, kf.content, kf.quality_score, kf.quality_metrics,
+       kf.promotion_status, kf.llama_index_metadata, kf.created_at"""
+
+# ts_rank_cd normalization 32 maps the rank into [0, 1) so it can be blended
+TEXT_SEARCH_SQL = f"""
+SELECT {_COLUMNS},
+       ts_rank_cd(kf.search_vector, query, 32) AS text_score,
+       0.0::float8 AS vector_score,
+       ts_rank_cd(kf.search_vector, query, 32) AS relevance_score
+FROM knowledge_fragments kf, plainto_tsquery('english', $1) query
+WHERE kf.search_vector @@ query
+  AND {_FILTERS}
+ORDER BY relevance_score DESC, kf.quality_score DESC
+LIMIT $4
+"""
+
+HYBRID_SEARCH_SQL = f"""
+WITH text_hits AS (
+    SELECT kf.id, ts_rank_cd(kf.search_vector, query, 32)::float8 AS text_score
+    FROM knowledge_fragments kf, plainto_tsquery('english', $1) query
+    WHERE kf.search_vector @@ query
+      AND {_FILTERS}
+    ORDER BY text_score DESC
+    LIMIT $5
+),
+vector_hits AS (
+    SELECT kf.id, 1 - (kf.embedding_vector <=> $6::text::vector) AS vector_score
+    FROM knowledge_fragments kf
+    WHERE kf.embedding_vector IS NOT NULL
+      AND {_FILTERS}
+    ORDER BY kf.embedding_vector <=> $6::text::vector
+    LIMIT $5
+),
+candidates AS (
+    SELECT id, MAX(text_score) AS text_score, MAX(vector_score) AS vector_score
+    FROM (
+        SELECT id, text_score, NULL::float8 AS vector_score FROM text_hits
+        UNION ALL
+        SELECT id, NULL::float8, vector_score FROM vector_hits
+    ) hits
+    GROUP BY id
+)
+SELECT {_COLUMNS},
+       COALESCE(c.text_score, 0) AS text_score,
+       COALESCE(c.vector_score, 0) AS vector_score,
+       $7 * COALESCE(c.text_score, 0) + (1 - $7) * COALESCE(c.vector_score, 0) AS relevance_score
+FROM candidates c
+JOIN knowledge_fragments kf ON kf.id = c.id
+ORDER BY relevance_score DESC, kf.quality_score DESC
+LIMIT $4
+"""
+
+
+def vector_literal(embedding: List[float]) -> str:
+    """pgvector text representation, bound as text and cast in SQL"""
+    return "[" + ",".join(f"{float(value):.8g}" for value in embedding) + "]"
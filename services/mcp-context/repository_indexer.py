@@ -12,15 +12,18 @@ Integrates with existing MCP context service for unified context management.
 """
 
 import os
+import time
 import asyncio
 import json
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 from datetime import datetime
 import sqlite3
 import re
 import ast
+from bisect import bisect_left
 from dataclasses import dataclass
 from collections import defaultdict
 
@@ -28,6 +31,131 @@ from collections import defaultdict
 from real_embeddings import embedding_engine, store_with_real_embedding
 
 
+# Changed files are parsed in a process pool only when there are enough of them
+# to outweigh the cost of starting workers; small incremental runs use a thread.
+PARSE_POOL_THRESHOLD = int(os.getenv("REPO_INDEX_PARSE_POOL_THRESHOLD", "64"))
+PARSE_CHUNK_SIZE = 32
+WRITE_BATCH_SIZE = 500
+
+# Line-level full-text index: one row per indexed line, trigram-tokenized so
+# substrings of identifiers match. file_lines is the external content table.
+FTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS file_lines (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        file_type TEXT,
+        line_number INTEGER,
+        content TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_file_lines_path ON file_lines(path);
+    
+    CREATE VIRTUAL TABLE IF NOT EXISTS file_lines_fts USING fts5(
+        content, content='file_lines', content_rowid='id', tokenize='trigram'
+    );
+    
+    CREATE TRIGGER IF NOT EXISTS file_lines_ai AFTER INSERT ON file_lines BEGIN
+        INSERT INTO file_lines_fts(rowid, content) VALUES (new.id, new.content);
+    END;
+    CREATE TRIGGER IF NOT EXISTS file_lines_ad AFTER DELETE ON file_lines BEGIN
+        INSERT INTO file_lines_fts(file_lines_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END;
+"""
+
+# AS MATERIALIZED needs SQLite 3.35; trigram FTS (3.34) works without it
+_MATERIALIZED = "MATERIALIZED" if sqlite3.sqlite_version_info >= (3, 35) else ""
+
+# Files ranked by the summed BM25 of their matching lines (lower is better)
+FTS_SEARCH_SQL = """
+    WITH hits AS {materialized} (
+        SELECT l.path, l.file_type, l.line_number, l.content,
+               bm25(file_lines_fts) AS score,
+               highlight(file_lines_fts, 0, '<<', '>>') AS highlighted
+        FROM file_lines_fts
+        JOIN file_lines l ON l.id = file_lines_fts.rowid
+        WHERE file_lines_fts MATCH ? {type_filter}
+    ),
+    files AS (
+        SELECT path, SUM(score) AS file_score
+        FROM hits
+        GROUP BY path
+        ORDER BY file_score
+        LIMIT ?
+    )
+    SELECT h.path, h.file_type, h.line_number, h.content, h.highlighted, f.file_score
+    FROM hits h JOIN files f USING (path)
+    ORDER BY f.file_score, h.path, h.score
+"""
+
+# Trigram MATCH needs at least three characters; shorter queries scan lines
+SHORT_SEARCH_SQL = """
+    WITH hits AS {materialized} (
+        SELECT path, file_type, line_number, content
+        FROM file_lines
+        WHERE content LIKE ? ESCAPE '\\' {type_filter}
+    ),
+    files AS (
+        SELECT path, -COUNT(*) AS file_score
+        FROM hits
+        GROUP BY path
+        ORDER BY file_score
+        LIMIT ?
+    )
+    SELECT h.path, h.file_type, h.line_number, h.content, h.content, f.file_score
+    FROM hits h JOIN files f USING (path)
+    ORDER BY f.file_score, h.path, h.line_number
+"""
+
+
+def _line_numbers(indexed_content: str, content: str) -> List[Optional[int]]:
+    """
+    Source line number of each indexed line
+
+    Extracted lines appear in source order, so each one is matched against the
+    source from the previous match onward. Lines that do not occur verbatim
+    (e.g. re-serialized JSON) get None.
+    """
+    # Positions of every stripped source line, so each lookup is a bisect
+    # rather than a scan of the rest of the file
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for i, line in enumerate(content.split('\n')):
+        positions[line.strip()].append(i)
+
+    numbers = []
+    position = 0
+    for line in indexed_content.split('\n'):
+        candidates = positions.get(line.strip())
+        index = bisect_left(candidates, position) if candidates else 0
+        if candidates and index < len(candidates):
+            numbers.append(candidates[index] + 1)
+            position = candidates[index] + 1
+        else:
+            numbers.append(None)
+    return numbers
+
+
+def _parse_files(indexer: "RepositoryIndexer", jobs: List[Tuple[str, str, Optional[str]]]) -> List[Dict[str, Any]]:
+    """
+    Read, hash and parse a chunk of files (runs in a worker process or thread)
+
+    Each job is (absolute path, relative path, previously stored hash). Files
+    whose content hash is unchanged are returned without parse results.
+    """
+    results = []
+    for abs_path, rel_path, known_hash in jobs:
+        try:
+            file_path = Path(abs_path)
+            content = file_path.read_text(encoding='utf-8', errors='ignore')
+            content_hash = hashlib.md5(content.encode()).hexdigest()
+            info = None
+            if content_hash != known_hash:
+                info = indexer.parse_file(file_path, content)
+                info['line_numbers'] = _line_numbers(info['indexed_content'], content)
+            results.append({'path': rel_path, 'content_hash': content_hash, 'info': info})
+        except Exception as e:
+            results.append({'path': rel_path, 'error': str(e)})
+    return results
+
+
 @dataclass
 class FileIndex:
     """Represents an indexed file with metadata"""
@@ -52,14 +180,30 @@ class RepositoryIndexer:
         self.file_cache = {}
         self.dependency_graph = defaultdict(list)
         self.symbol_index = {}
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        self.fts_enabled = False
         
         # Ensure .sophia directory exists
         os.makedirs(self.db_path.parent, exist_ok=True)
         self.init_database()
     
+    def __getstate__(self):
+        # Shipped to parse workers; they only need the extraction methods
+        state = self.__dict__.copy()
+        state['_parse_pool'] = None
+        return state
+    
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the index database (used from worker threads)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
     def init_database(self):
         """Initialize repository index database"""
         conn = sqlite3.connect(self.db_path)
+        # WAL lets searches read while an indexing run writes
+        conn.execute("PRAGMA journal_mode=WAL")
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS file_index (
                 path TEXT PRIMARY KEY,
@@ -98,10 +242,49 @@ class RepositoryIndexer:
             CREATE INDEX IF NOT EXISTS idx_file_type ON file_index(file_type);
             CREATE INDEX IF NOT EXISTS idx_symbol_type ON symbols(symbol_type);
             CREATE INDEX IF NOT EXISTS idx_dependency_type ON dependencies(dependency_type);
+            CREATE INDEX IF NOT EXISTS idx_symbol_file ON symbols(file_path);
         """)
+        
+        # Exact mtime for change detection (last_modified is a display timestamp)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(file_index)")}
+        if 'mtime' not in columns:
+            conn.execute("ALTER TABLE file_index ADD COLUMN mtime REAL")
         conn.commit()
+        
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self.fts_enabled = True
+            self._backfill_lines(conn)
+        except sqlite3.OperationalError as e:
+            # FTS5 trigram needs SQLite 3.34+; search falls back to LIKE
+            print(f"Warning: full-text index unavailable: {e}")
         conn.close()
     
+    def _backfill_lines(self, conn: sqlite3.Connection):
+        """Populate the line index for files indexed before it existed"""
+        if conn.execute("SELECT 1 FROM file_lines LIMIT 1").fetchone():
+            return
+        rows = conn.execute("SELECT path, file_type, indexed_content FROM file_index").fetchall()
+        if not rows:
+            return
+        with conn:
+            for path, file_type, indexed_content in rows:
+                # Source line numbers are unknown until the file is re-parsed
+                self._insert_lines(conn, path, file_type, indexed_content or '', [])
+        print(f"🔎 Built full-text line index for {len(rows)} files")
+    
+    def _insert_lines(self, conn: sqlite3.Connection, path: str, file_type: str,
+                      indexed_content: str, line_numbers: List[Optional[int]]):
+        lines = indexed_content.split('\n')
+        conn.executemany(
+            "INSERT INTO file_lines (path, file_type, line_number, content) VALUES (?, ?, ?, ?)",
+            [
+                (path, file_type, line_numbers[i] if i < len(line_numbers) and line_numbers[i] else i + 1, line.strip())
+                for i, line in enumerate(lines)
+                if line.strip()
+            ]
+        )
+    
     async def index_repository(self, progress_callback=None):
         """
         Perform complete repository indexing
@@ -111,118 +294,225 @@ class RepositoryIndexer:
         """
         print("🔍 Starting comprehensive repository indexing...")
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        results = {}
+        async for event in self.index_repository_progress():
+            if event['phase'] == 'complete':
+                results = event['results']
+            elif progress_callback and event['phase'] == 'index':
+                await progress_callback(event)
         
-        total_files = 0
-        indexed_files = 0
-        errors = []
+        print(f"✅ Repository indexing complete! Indexed {results['indexed_files']}/{results['total_files']} files "
+              f"({results['changed_files']} changed, {results['removed_files']} removed) "
+              f"in {results['duration_seconds']}s")
+        if results['errors']:
+            print(f"⚠️ {len(results['errors'])} files had errors during indexing")
         
-        # Count total files first
-        for file_path in self.repo_path.rglob("*"):
-            if file_path.is_file() and not self.should_ignore_file(file_path):
-                total_files += 1
+        return results
+    
+    async def index_repository_progress(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Incrementally index the repository, yielding progress events
         
-        # Index each file
-        for file_path in self.repo_path.rglob("*"):
-            if file_path.is_file() and not self.should_ignore_file(file_path):
-                try:
-                    # Read file content
-                    content = file_path.read_text(encoding='utf-8', errors='ignore')
-                    content_hash = hashlib.md5(content.encode()).hexdigest()
-                    
-                    # Check if file has changed
-                    rel_path = str(file_path.relative_to(self.repo_path))
-                    cursor.execute(
-                        "SELECT content_hash FROM file_index WHERE path = ?",
-                        (rel_path,)
-                    )
-                    
-                    row = cursor.fetchone()
-                    if row and row[0] == content_hash:
-                        indexed_files += 1
-                        continue  # File hasn't changed
-                    
-                    # Extract file information
-                    file_info = await self.extract_file_info(file_path, content)
-                    
-                    # Store in database
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO file_index 
-                        (path, content_hash, last_modified, file_type, size, 
-                         indexed_content, symbols, embeddings)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        rel_path,
-                        content_hash,
-                        datetime.fromtimestamp(file_path.stat().st_mtime),
-                        file_path.suffix,
-                        file_path.stat().st_size,
-                        file_info['indexed_content'],
-                        json.dumps(file_info['symbols']),
-                        json.dumps(file_info.get('embeddings', []))
-                    ))
-                    
-                    # Store dependencies
-                    cursor.execute(
-                        "DELETE FROM dependencies WHERE file_path = ?",
-                        (rel_path,)
-                    )
-                    
-                    for dep in file_info['dependencies']:
-                        cursor.execute("""
-                            INSERT INTO dependencies 
-                            (file_path, dependency_path, dependency_type, line_number)
-                            VALUES (?, ?, ?, ?)
-                        """, (
-                            rel_path,
-                            dep['path'],
-                            dep['type'],
-                            dep.get('line', 0)
-                        ))
-                    
-                    # Store symbols
-                    for symbol in file_info['symbols']:
-                        cursor.execute("""
-                            INSERT OR REPLACE INTO symbols 
-                            (symbol_name, symbol_type, file_path, line_number, definition)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, (
-                            symbol['name'],
-                            symbol['type'],
-                            rel_path,
-                            symbol.get('line', 0),
-                            symbol.get('definition', '')
-                        ))
-                    
-                    indexed_files += 1
-                    
-                    # Progress callback
-                    if progress_callback:
-                        await progress_callback({
-                            'current': indexed_files,
-                            'total': total_files,
-                            'file': rel_path
-                        })
+        Files whose (mtime, size) match the index are skipped without being
+        read. The rest are hashed and, if their content changed, parsed in
+        parallel; results are written in batched transactions. Files no longer
+        on disk are removed from the index. The last event has phase
+        'complete' and carries the run summary.
+        """
+        started = time.perf_counter()
+        conn = self.connect()
+        try:
+            known = {
+                row[0]: (row[1], row[2], row[3])
+                for row in conn.execute("SELECT path, mtime, size, content_hash FROM file_index")
+            }
+            files = await asyncio.to_thread(self.scan_files)
+            total_files = len(files)
+            yield {'phase': 'scan', 'current': 0, 'total': total_files}
+            
+            jobs = []
+            for rel_path, (abs_path, mtime, size) in files.items():
+                stored = known.get(rel_path)
+                if stored and stored[0] == mtime and stored[1] == size:
+                    continue
+                jobs.append((abs_path, rel_path, stored[2] if stored else None))
+            
+            removed = [path for path in known if path not in files]
+            if removed:
+                await asyncio.to_thread(self._remove_files, conn, removed)
+            
+            changed_files = 0
+            processed = 0
+            errors = []
+            pending: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+            
+            async for chunk in self._parse_changed(jobs):
+                for result in chunk:
+                    processed += 1
+                    if 'error' in result:
+                        errors.append({'file': result['path'], 'error': result['error']})
+                        print(f"❌ Error indexing {result['path']}: {result['error']}")
+                        continue
                     
-                    print(f"📁 Indexed ({indexed_files}/{total_files}): {rel_path}")
+                    info = result['info']
+                    if info is not None:
+                        changed_files += 1
+                        info['embeddings'] = await self._embed(info)
+                    pending.append((result, info))
                     
-                except Exception as e:
-                    errors.append({'file': str(file_path), 'error': str(e)})
-                    print(f"❌ Error indexing {file_path}: {e}")
+                    yield {'phase': 'index', 'current': processed, 'total': len(jobs), 'file': result['path']}
+                
+                if len(pending) >= WRITE_BATCH_SIZE:
+                    await asyncio.to_thread(self._write_batch, conn, files, pending)
+                    pending = []
+            
+            if pending:
+                await asyncio.to_thread(self._write_batch, conn, files, pending)
+        finally:
+            conn.close()
         
-        conn.commit()
-        conn.close()
+        yield {
+            'phase': 'complete',
+            'results': {
+                'total_files': total_files,
+                'indexed_files': total_files - len(errors),
+                'changed_files': changed_files,
+                'unchanged_files': total_files - changed_files - len(errors),
+                'removed_files': len(removed),
+                'errors': errors,
+                'duration_seconds': round(time.perf_counter() - started, 3)
+            }
+        }
+    
+    def scan_files(self) -> Dict[str, Tuple[str, float, int]]:
+        """Walk the repository once: relative path -> (absolute path, mtime, size)"""
+        files = {}
+        stack = [str(self.repo_path)]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self.should_ignore_file(Path(entry.path), size=0):
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        if not self.should_ignore_file(Path(entry.path), size=stat.st_size):
+                            rel_path = os.path.relpath(entry.path, self.repo_path)
+                            files[rel_path] = (entry.path, stat.st_mtime, stat.st_size)
+                except OSError:
+                    continue
+        return files
+    
+    async def _parse_changed(self, jobs: List[Tuple[str, str, Optional[str]]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Parse candidate files in chunks, yielding each chunk's results as it completes"""
+        if not jobs:
+            return
         
-        print(f"✅ Repository indexing complete! Indexed {indexed_files}/{total_files} files")
-        if errors:
-            print(f"⚠️ {len(errors)} files had errors during indexing")
+        chunks = [jobs[i:i + PARSE_CHUNK_SIZE] for i in range(0, len(jobs), PARSE_CHUNK_SIZE)]
+        if len(jobs) < PARSE_POOL_THRESHOLD:
+            for chunk in chunks:
+                yield await asyncio.to_thread(_parse_files, self, chunk)
+            return
         
-        return {
-            'total_files': total_files,
-            'indexed_files': indexed_files,
-            'errors': errors
-        }
+        if self._parse_pool is None:
+            self._parse_pool = ProcessPoolExecutor()
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self._parse_pool, _parse_files, self, chunk) for chunk in chunks]
+        try:
+            for next_done in asyncio.as_completed(futures):
+                yield await next_done
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    async def _embed(self, info: Dict[str, Any]) -> List[float]:
+        """Embedding for a parsed file's searchable content"""
+        if not info['indexed_content']:
+            return []
+        try:
+            return await self.generate_embedding(info['indexed_content']) or []
+        except Exception as e:
+            print(f"Warning: Could not generate embedding: {e}")
+            return []
+    
+    def _write_batch(self, conn: sqlite3.Connection, files: Dict[str, Tuple[str, float, int]],
+                     batch: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Store a batch of parse results in one transaction"""
+        with conn:
+            for result, info in batch:
+                rel_path = result['path']
+                abs_path, mtime, size = files[rel_path]
+                
+                if info is None:
+                    # Touched but unchanged: only refresh the stat gate
+                    conn.execute(
+                        "UPDATE file_index SET mtime = ?, size = ?, last_modified = ? WHERE path = ?",
+                        (mtime, size, datetime.fromtimestamp(mtime), rel_path)
+                    )
+                    continue
+                
+                conn.execute("""
+                    INSERT OR REPLACE INTO file_index 
+                    (path, content_hash, last_modified, file_type, size, 
+                     indexed_content, symbols, embeddings, mtime)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    rel_path,
+                    result['content_hash'],
+                    datetime.fromtimestamp(mtime),
+                    Path(rel_path).suffix,
+                    size,
+                    info['indexed_content'],
+                    json.dumps(info['symbols']),
+                    json.dumps(info.get('embeddings', [])),
+                    mtime
+                ))
+                
+                if self.fts_enabled:
+                    conn.execute("DELETE FROM file_lines WHERE path = ?", (rel_path,))
+                    self._insert_lines(conn, rel_path, Path(rel_path).suffix,
+                                       info['indexed_content'], info.get('line_numbers', []))
+                
+                conn.execute("DELETE FROM dependencies WHERE file_path = ?", (rel_path,))
+                conn.executemany("""
+                    INSERT OR REPLACE INTO dependencies 
+                    (file_path, dependency_path, dependency_type, line_number)
+                    VALUES (?, ?, ?, ?)
+                """, [
+                    (rel_path, dep['path'], dep['type'], dep.get('line', 0))
+                    for dep in info['dependencies']
+                ])
+                
+                conn.execute("DELETE FROM symbols WHERE file_path = ?", (rel_path,))
+                conn.executemany("""
+                    INSERT OR REPLACE INTO symbols 
+                    (symbol_name, symbol_type, file_path, line_number, definition)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [
+                    (symbol['name'], symbol['type'], rel_path, symbol.get('line', 0), symbol.get('definition', ''))
+                    for symbol in info['symbols']
+                ])
+    
+    def _remove_files(self, conn: sqlite3.Connection, paths: List[str]):
+        """Drop files that no longer exist from every index table"""
+        rows = [(path,) for path in paths]
+        with conn:
+            conn.executemany("DELETE FROM file_index WHERE path = ?", rows)
+            conn.executemany("DELETE FROM dependencies WHERE file_path = ?", rows)
+            conn.executemany("DELETE FROM symbols WHERE file_path = ?", rows)
+            if self.fts_enabled:
+                conn.executemany("DELETE FROM file_lines WHERE path = ?", rows)
+    
+    def close(self):
+        """Shut down the parse worker pool"""
+        if self._parse_pool:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
     
     async def extract_file_info(self, file_path: Path, content: str) -> Dict[str, Any]:
         """
@@ -241,6 +531,27 @@ class RepositoryIndexer:
             'symbols': [],
             'embeddings': []
         }
+        info.update(self.parse_file(file_path, content))
+        
+        # Generate embeddings for semantic search
+        if info['indexed_content']:
+            try:
+                # Use existing embedding engine from real_embeddings.py
+                embedding = await self.generate_embedding(info['indexed_content'])
+                if embedding:
+                    info['embeddings'] = embedding
+            except Exception as e:
+                print(f"Warning: Could not generate embedding: {e}")
+        
+        return info
+    
+    def parse_file(self, file_path: Path, content: str) -> Dict[str, Any]:
+        """Language-specific extraction of content, dependencies and symbols (CPU only)"""
+        info = {
+            'indexed_content': '',
+            'dependencies': [],
+            'symbols': []
+        }
         
         # Language-specific extraction
         if file_path.suffix == '.py':
@@ -255,16 +566,6 @@ class RepositoryIndexer:
             # Generic text extraction
             info['indexed_content'] = content[:2000]
         
-        # Generate embeddings for semantic search
-        if info['indexed_content']:
-            try:
-                # Use existing embedding engine from real_embeddings.py
-                embedding = await self.generate_embedding(info['indexed_content'])
-                if embedding:
-                    info['embeddings'] = embedding
-            except Exception as e:
-                print(f"Warning: Could not generate embedding: {e}")
-        
         return info
     
     def extract_python_info(self, content: str) -> Dict[str, Any]:
@@ -469,12 +770,12 @@ class RepositoryIndexer:
         
         return '\n'.join(searchable_lines[:100])
     
-    def should_ignore_file(self, file_path: Path) -> bool:
+    def should_ignore_file(self, file_path: Path, size: Optional[int] = None) -> bool:
         """Check if file should be ignored during indexing"""
         ignore_patterns = [
             '.git', '__pycache__', 'node_modules', '.next', 'dist', 'build',
             '.DS_Store', '.env', '*.log', '*.tmp', '*.cache', '.pyc',
-            'venv', '.venv', 'env', '.idea', '.vscode', '*.egg-info'
+            'venv', '.venv', 'env', '.idea', '.vscode', '*.egg-info', '.sophia'
         ]
         
         path_str = str(file_path)
@@ -486,7 +787,9 @@ class RepositoryIndexer:
         
         # Check file size (ignore files > 10MB)
         try:
-            if file_path.stat().st_size > 10 * 1024 * 1024:
+            if size is None:
+                size = file_path.stat().st_size
+            if size > 10 * 1024 * 1024:
                 return True
         except:
             pass
@@ -506,6 +809,69 @@ class RepositoryIndexer:
         Returns:
             List of search results
         """
+        if not query:
+            return []
+        if not self.fts_enabled:
+            return await asyncio.to_thread(self._search_like, query, file_types, limit)
+        return await asyncio.to_thread(self._search_fts, query, file_types, limit)
+    
+    def _search_fts(self, query: str, file_types: Optional[List[str]], limit: int) -> List[Dict[str, Any]]:
+        """Ranked search over the line index; highlighting is done by SQLite"""
+        type_filter = ""
+        params: List[Any] = []
+        if file_types:
+            type_filter = f"AND l.file_type IN ({','.join('?' * len(file_types))})"
+            params.extend(file_types)
+        
+        if len(query) >= 3:
+            # Quoted as one phrase: a case-insensitive substring match
+            sql = FTS_SEARCH_SQL.format(materialized=_MATERIALIZED, type_filter=type_filter)
+            params = ['"' + query.replace('"', '""') + '"'] + params
+        else:
+            sql = SHORT_SEARCH_SQL.format(
+                materialized=_MATERIALIZED, type_filter=type_filter.replace("l.file_type", "file_type")
+            )
+            escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params = [f"%{escaped}%"] + params
+        params.append(limit)
+        
+        conn = self.connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            
+            results: Dict[str, Dict[str, Any]] = {}
+            for path, file_type, line_number, content, highlighted, file_score in rows:
+                result = results.setdefault(path, {
+                    'path': path,
+                    'file_type': file_type,
+                    'score': -file_score,
+                    'matching_lines': [],
+                    'symbols': []
+                })
+                # Rows are ordered best line first within each file
+                if len(result['matching_lines']) < 5:
+                    result['matching_lines'].append({
+                        'line_number': line_number,
+                        'content': content[:200],
+                        'highlighted': highlighted[:240]
+                    })
+            
+            if results:
+                placeholders = ",".join("?" * len(results))
+                for path, symbols_json in conn.execute(
+                    f"SELECT path, symbols FROM file_index WHERE path IN ({placeholders})",
+                    list(results)
+                ):
+                    results[path]['symbols'] = json.loads(symbols_json) if symbols_json else []
+        finally:
+            conn.close()
+        
+        for result in results.values():
+            result['matching_lines'].sort(key=lambda line: line['line_number'])
+        return list(results.values())
+    
+    def _search_like(self, query: str, file_types: Optional[List[str]], limit: int) -> List[Dict[str, Any]]:
+        """Substring search used when SQLite lacks FTS5 trigram support"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -522,7 +888,8 @@ class RepositoryIndexer:
             sql += f" AND file_type IN ({placeholders})"
             params.extend(file_types)
         
-        sql += f" LIMIT {limit}"
+        sql += " LIMIT ?"
+        params.append(limit)
         
         cursor.execute(sql, params)
         results = []
@@ -652,10 +1019,13 @@ async def main():
     
     # Perform indexing
     results = await indexer.index_repository()
+    indexer.close()
     
     print(f"\n📊 Indexing Results:")
     print(f"  Total files: {results['total_files']}")
     print(f"  Indexed files: {results['indexed_files']}")
+    print(f"  Changed files: {results['changed_files']}")
+    print(f"  Removed files: {results['removed_files']}")
     print(f"  Errors: {len(results['errors'])}")
     
     # Test search
@@ -1,10 +1,19 @@
 import os
+import ast
+import re
+import json
 import uuid
-from typing import List, Dict
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple, Any
 import asyncpg
 import weaviate
 from weaviate.classes.init import Auth
-from openai import OpenAI
+from weaviate.classes.config import Property, DataType, Configure, Tokenization
+from weaviate.classes.query import Filter, MetadataQuery
+from weaviate.util import generate_uuid5
+from openai import AsyncOpenAI
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
@@ -20,9 +29,20 @@ NEON_DATABASE_URL = os.getenv("NEON_DATABASE_URL")
 WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Consistent with other MCPs
+EMBEDDING_BATCH_SIZE = int(os.getenv("SYMBOL_EMBEDDING_BATCH_SIZE", "128"))
+EMBEDDING_CONCURRENCY = int(os.getenv("SYMBOL_EMBEDDING_CONCURRENCY", "4"))
+PARSE_WORKERS = int(os.getenv("SYMBOL_PARSE_WORKERS", str(os.cpu_count() or 2)))
+STATE_DIR = os.getenv("SYMBOL_INDEX_STATE_DIR", os.path.expanduser("~/.cache/sophia/symbol_index"))
+
+SYMBOLS_CLASS = "SophiaCodeSymbols"
+SUPPORTED_EXTENSIONS = (".py", ".ts", ".js", ".tsx", ".java", ".go", ".rs")
+IGNORED_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", "dist", "build", ".next", "target"}
 
 # Initialize OpenAI client only if API key is set
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+client = AsyncOpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+
+# Process pool for parsing, created on first index run
+_parse_pool: Optional[ProcessPoolExecutor] = None
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -58,10 +78,33 @@ async def create_embedding(
     if not client:
         raise ValueError("OpenAI client not initialized. OPENAI_API_KEY is missing.")
 
-    response = client.embeddings.create(input=[text], model=model)
+    response = await client.embeddings.create(input=[text], model=model)
     return response.data[0].embedding
 
 
+async def create_embeddings(
+    texts: List[str], model: str = "text-embedding-ada-002"
+) -> List[List[float]]:
+    """
+    Generates embeddings for many texts, EMBEDDING_BATCH_SIZE inputs per request
+    with up to EMBEDDING_CONCURRENCY requests in flight.
+    """
+    if not client:
+        raise ValueError("OpenAI client not initialized. OPENAI_API_KEY is missing.")
+
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+    async def embed_batch(batch: List[str]) -> List[List[float]]:
+        async with semaphore:
+            response = await client.embeddings.create(input=batch, model=model)
+        # The API returns one item per input, tagged with its index
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    batches = [texts[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    return [vector for batch in results for vector in batch]
+
+
 async def retrieve_relevant_symbols(query: str, limit: int = 5) -> List[Dict]:
     """
     Retrieves relevant symbols from Weaviate based on a query embedding.
@@ -72,116 +115,289 @@ async def retrieve_relevant_symbols(query: str, limit: int = 5) -> List[Dict]:
 
     query_embedding = await create_embedding(query)
 
-    near_vector = {"vector": query_embedding}
-    
-    response = (
-        weaviate_client.query
-        .get("SophiaCodeSymbols", ["name", "kind", "file", "line", "snippet"])
-        .with_near_vector(near_vector)
-        .with_limit(limit)
-        .with_additional(["id", "distance"])
-        .do()
+    collection = weaviate_client.collections.get(SYMBOLS_CLASS)
+    response = await asyncio.to_thread(
+        collection.query.near_vector,
+        near_vector=query_embedding,
+        limit=limit,
+        return_metadata=MetadataQuery(distance=True)
     )
 
     symbols = []
-    if 'data' in response and 'Get' in response['data'] and 'SophiaCodeSymbols' in response['data']['Get']:
-        for item in response['data']['Get']['SophiaCodeSymbols']:
-            # Convert distance to score (higher score = better match)
-            distance = item['_additional']['distance']
-            score = 1.0 - distance if distance is not None else 0.0
-            
-            symbols.append({
-                "name": item.get("name"),
-                "kind": item.get("kind"),
-                "file": item.get("file"),
-                "line": item.get("line"),
-                "score": score,
-                "snippet": item.get("snippet", ""),
-            })
+    for item in response.objects:
+        # Convert distance to score (higher score = better match)
+        distance = item.metadata.distance
+        score = 1.0 - distance if distance is not None else 0.0
+
+        symbols.append({
+            "name": item.properties.get("name"),
+            "kind": item.properties.get("kind"),
+            "file": item.properties.get("file"),
+            "line": item.properties.get("line"),
+            "score": score,
+            "snippet": item.properties.get("snippet", ""),
+        })
+    return symbols
+
+
+# Symbol extraction runs in worker processes; everything here must be picklable
+
+_REGEX_PATTERNS = {
+    (".ts", ".tsx", ".js"): [
+        (re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(\w+)"), "function"),
+        (re.compile(r"^\s*(?:export\s+)?(?:const|let)\s+(\w+)\s*=\s*(?:async\s+)?(?:\([^)]*\)|\w+)\s*=>"), "function"),
+        (re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(\w+)"), "class"),
+        (re.compile(r"^\s*(?:export\s+)?interface\s+(\w+)"), "interface"),
+    ],
+    (".java",): [
+        (re.compile(r"^\s*(?:public|private|protected|abstract|final|static|\s)*(?:class|interface|enum|record)\s+(\w+)"), "class"),
+        (re.compile(r"^\s*(?:public|private|protected)\s+(?:static\s+)?(?:final\s+)?[\w<>\[\],\s]+?\s+(\w+)\s*\("), "method"),
+    ],
+    (".go",): [
+        (re.compile(r"^func\s+(?:\([^)]*\)\s*)?(\w+)"), "function"),
+        (re.compile(r"^type\s+(\w+)\s+(?:struct|interface)"), "class"),
+    ],
+    (".rs",): [
+        (re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+(\w+)"), "function"),
+        (re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait)\s+(\w+)"), "class"),
+    ],
+    (".py",): [
+        (re.compile(r"^\s*(?:async\s+)?def\s+(\w+)"), "function"),
+        (re.compile(r"^\s*class\s+(\w+)"), "class"),
+    ],
+}
+
+
+def _python_symbols(content: str) -> List[Tuple[str, str, int]]:
+    """(qualified name, kind, line) for Python classes, functions and methods"""
+    symbols = []
+
+    def visit(node: ast.AST, prefix: str, in_class: bool):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                name = f"{prefix}{child.name}"
+                symbols.append((name, "class", child.lineno))
+                visit(child, f"{name}.", True)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = f"{prefix}{child.name}"
+                symbols.append((name, "method" if in_class else "function", child.lineno))
+                visit(child, f"{name}.", False)
+
+    visit(ast.parse(content), "", False)
+    return symbols
+
+
+def _regex_symbols(content: str, extension: str) -> List[Tuple[str, str, int]]:
+    patterns = next((p for exts, p in _REGEX_PATTERNS.items() if extension in exts), [])
+    symbols = []
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        for pattern, kind in patterns:
+            match = pattern.match(line)
+            if match:
+                symbols.append((match.group(1), kind, line_number))
+                break
     return symbols
 
 
-async def index_repository_symbols(repo_path: str):
+def _extract_file_symbols(job: Tuple[str, str, Optional[str]]) -> Tuple[str, Optional[str], Optional[List[Dict[str, Any]]]]:
+    """
+    Read, hash and parse one file. Returns (relative path, content hash, symbols);
+    symbols is None when the hash matches the previously indexed one.
+    """
+    file_path, relative_file_path, known_hash = job
+    try:
+        with open(file_path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return relative_file_path, None, None
+
+    content_hash = hashlib.sha256(raw).hexdigest()
+    if content_hash == known_hash:
+        return relative_file_path, content_hash, None
+
+    content = raw.decode("utf-8", errors="replace")
+    extension = os.path.splitext(file_path)[1]
+    if extension == ".py":
+        try:
+            found = _python_symbols(content)
+        except SyntaxError:
+            found = _regex_symbols(content, extension)
+    else:
+        found = _regex_symbols(content, extension)
+
+    lines = content.splitlines()
+    symbols = []
+    for name, kind, line_number in found:
+        i = line_number - 1
+        symbols.append({
+            "name": name,
+            "kind": kind,
+            "file": relative_file_path,
+            "line": line_number,
+            "snippet": "\n".join(lines[max(0, i - 2): i + 3]),  # 5-line snippet
+        })
+    return relative_file_path, content_hash, symbols
+
+
+def _extract_files(jobs: List[Tuple[str, str, Optional[str]]]) -> List[Tuple[str, Optional[str], Optional[List[Dict[str, Any]]]]]:
+    return [_extract_file_symbols(job) for job in jobs]
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _parse_pool
+
+
+def _state_path(repo_path: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(repo_path).encode()).hexdigest()[:16]
+    return os.path.join(STATE_DIR, f"{digest}.json")
+
+
+def _load_state(repo_path: str) -> Dict[str, str]:
+    """File path -> content hash of the last successful index of this repository"""
+    try:
+        with open(_state_path(repo_path), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _clear_states():
+    """Forget every repository's hashes so the next runs re-import all files"""
+    if not os.path.isdir(STATE_DIR):
+        return
+    for name in os.listdir(STATE_DIR):
+        if name.endswith(".json"):
+            os.remove(os.path.join(STATE_DIR, name))
+
+
+def _save_state(repo_path: str, hashes: Dict[str, str]):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp_path = _state_path(repo_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(hashes, f)
+    os.replace(tmp_path, _state_path(repo_path))
+
+
+def _scan_source_files(repo_path: str) -> List[Tuple[str, str]]:
+    files = []
+    for root, dirs, names in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+        for file_name in names:
+            if file_name.endswith(SUPPORTED_EXTENSIONS):
+                file_path = os.path.join(root, file_name)
+                files.append((file_path, os.path.relpath(file_path, repo_path)))
+    return files
+
+
+def _write_symbols(
+    stale_files: List[str], objects: List[Dict[str, Any]], vectors: List[List[float]]
+) -> Tuple[int, List[str]]:
+    """Replace the symbols of changed/removed files in one Weaviate batch import.
+
+    Returns the number of objects imported and the files with objects that
+    failed to import, whose symbols are now incomplete.
+    """
+    collection = weaviate_client.collections.get(SYMBOLS_CLASS)
+
+    for i in range(0, len(stale_files), 100):
+        collection.data.delete_many(
+            where=Filter.by_property("file").contains_any(stale_files[i:i + 100])
+        )
+
+    with collection.batch.fixed_size(batch_size=200) as batch:
+        for obj, vector in zip(objects, vectors):
+            batch.add_object(
+                properties=obj,
+                vector=vector,
+                uuid=generate_uuid5(f"{obj['file']}:{obj['kind']}:{obj['name']}:{obj['line']}")
+            )
+
+    failed = collection.batch.failed_objects
+    for failure in failed[:5]:
+        logger.warning(f"Failed to import symbol object: {failure.message}")
+    failed_files = sorted({failure.object_.properties["file"] for failure in failed})
+    return len(objects) - len(failed), failed_files
+
+
+async def index_repository_symbols(repo_path: str, force: bool = False) -> Dict[str, Any]:
     """
     Indexes code symbols from a given repository path into Weaviate.
-    This function will scan files, extract symbols, create embeddings, and store them in Weaviate.
+
+    Files are hashed and parsed (AST for Python) in a process pool; files whose
+    content hash matches the last run are skipped. Symbols of changed files are
+    embedded in batches and written with one Weaviate batch import; symbols of
+    changed and deleted files are removed first.
     """
     if not WEAVIATE_URL or not WEAVIATE_API_KEY or not weaviate_client:
         logger.warning("Weaviate not configured, skipping repository indexing.")
-        return
+        return {"indexed": False}
 
     # Ensure the schema exists
-    _ensure_symbols_schema_exists()
-
-    data_objects = []
-    for root, _, files in os.walk(repo_path):
-        for file_name in files:
-            if file_name.endswith(
-                (".py", ".ts", ".js", ".tsx", ".java", ".go", ".rs")
-            ):  # Supported file types
-                file_path = os.path.join(root, file_name)
-                relative_file_path = os.path.relpath(file_path, repo_path)
-
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-
-                    # Simple symbol extraction (can be enhanced with AST parsing)
-                    lines = content.splitlines()
-                    for i, line in enumerate(lines):
-                        line_number = i + 1
-                        symbol_name = None
-                        symbol_kind = None
-
-                        if "def " in line and "(" in line:
-                            symbol_name = line.split("def ")[1].split("(")[0].strip()
-                            symbol_kind = "function"
-                        elif "class " in line and ":" in line:
-                            symbol_name = line.split("class ")[1].split(":")[0].strip()
-                            symbol_kind = "class"
-
-                        if symbol_name:
-                            snippet = "\n".join(
-                                lines[max(0, i - 2) : i + 3]
-                            )  # 5-line snippet
-                            vector = await create_embedding(
-                                f"{symbol_kind} {symbol_name} in {relative_file_path}: {snippet}"
-                            )
-
-                            data_objects.append({
-                                "data_object": {
-                                    "name": symbol_name,
-                                    "kind": symbol_kind,
-                                    "file": relative_file_path,
-                                    "line": line_number,
-                                    "snippet": snippet,
-                                },
-                                "vector": vector
-                            })
-                except Exception as e:
-                    logger.warning(f"Failed to process {file_path}: {e}")
-
-    if data_objects:
-        # Batch create objects in Weaviate
-        for obj in data_objects:
-            try:
-                weaviate_client.data_object.create(
-                    data_object=obj["data_object"],
-                    class_name="SophiaCodeSymbols",
-                    vector=obj["vector"]
-                )
-            except Exception as e:
-                logger.warning(f"Failed to create symbol object: {e}")
-        
-        logger.info(
-            f"Indexed {len(data_objects)} symbols into Weaviate class 'SophiaCodeSymbols'"
-        )
-    else:
-        logger.info("No symbols found or indexed.")
+    await asyncio.to_thread(_ensure_symbols_schema_exists)
+
+    known_hashes = {} if force else await asyncio.to_thread(_load_state, repo_path)
+    files = await asyncio.to_thread(_scan_source_files, repo_path)
+
+    # Parse in the process pool, 64 files per task to amortize IPC
+    loop = asyncio.get_running_loop()
+    pool = _get_parse_pool()
+    jobs = [(path, rel, known_hashes.get(rel)) for path, rel in files]
+    chunks = [jobs[i:i + 64] for i in range(0, len(jobs), 64)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, _extract_files, chunk) for chunk in chunks))
+
+    new_hashes: Dict[str, str] = {}
+    changed_files: List[str] = []
+    unreadable = 0
+    objects: List[Dict[str, Any]] = []
+    for chunk_result in results:
+        for relative_file_path, content_hash, symbols in chunk_result:
+            if content_hash is None:
+                unreadable += 1  # symbols are dropped as for a removed file
+                continue
+            new_hashes[relative_file_path] = content_hash
+            if symbols is not None:
+                changed_files.append(relative_file_path)
+                objects.extend(symbols)
+
+    removed_files = [path for path in known_hashes if path not in new_hashes]
+    stale_files = changed_files + removed_files
+
+    imported = 0
+    failed_files: List[str] = []
+    if objects or removed_files:
+        texts = [
+            f"{obj['kind']} {obj['name']} in {obj['file']}: {obj['snippet']}"
+            for obj in objects
+        ]
+        vectors = await create_embeddings(texts) if texts else []
+        imported, failed_files = await asyncio.to_thread(_write_symbols, stale_files, objects, vectors)
+
+    # Files whose objects failed to import are left out of the state, so the
+    # next run re-parses them and replaces their partial symbols
+    for relative_file_path in failed_files:
+        new_hashes.pop(relative_file_path, None)
+    await asyncio.to_thread(_save_state, repo_path, new_hashes)
+
+    stats = {
+        "indexed": True,
+        "files_scanned": len(files),
+        "files_changed": len(changed_files),
+        "files_removed": len(removed_files),
+        "files_unchanged": len(files) - unreadable - len(changed_files),
+        "files_unreadable": unreadable,
+        "files_failed": len(failed_files),
+        "symbols_imported": imported
+    }
+    logger.info(f"Symbol index updated for {repo_path}: {stats}")
+    return stats
 
 
 class IndexRepoRequest(BaseModel):
     repo_path: str = Field(..., description="Path to the repository to index")
+    force: bool = Field(False, description="Re-index every file, ignoring content hashes")
 
 
 @app.post("/index-repo-symbols")
@@ -190,9 +406,9 @@ async def index_repo_symbols_api(request: IndexRepoRequest):
     API endpoint to trigger repository symbol indexing.
     """
     try:
-        await index_repository_symbols(request.repo_path)
+        stats = await index_repository_symbols(request.repo_path, force=request.force)
         return JSONResponse(
-            status_code=200, content={"message": "Repository indexing started."}
+            status_code=200, content={"message": "Repository indexing completed.", **stats}
         )
     except Exception as e:
         logger.error(f"Error during repository indexing: {e}")
@@ -215,63 +431,53 @@ async def shutdown_event():
     if db_pool:
         await db_pool.close()
         logger.info("Database pool closed")
+    if _parse_pool:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+    if weaviate_client:
+        weaviate_client.close()  # Ensure Weaviate client is closed properly
 
 
 def _ensure_symbols_schema_exists():
-    """Ensure Weaviate schema for code symbols exists"""
+    """
+    Ensure Weaviate schema for code symbols exists.
+
+    `file` must use field tokenization: stale symbols are deleted with
+    contains_any on it, which with word tokenization matches path fragments
+    ("services", "py") of unrelated files. A collection created with word
+    tokenization is dropped and rebuilt, and every repository's hashes are
+    cleared so all files are re-imported.
+    """
     if not weaviate_client:
         return
         
     try:
-        schema = weaviate_client.schema.get()
-        class_exists = any(c['class'] == "SophiaCodeSymbols" for c in schema.get('classes', []))
-
-        if not class_exists:
-            class_definition = {
-                "class": "SophiaCodeSymbols",
-                "description": "Code symbols indexed for semantic search",
-                "vectorizer": "none",  # We provide our own vectors
-                "properties": [
-                    {
-                        "name": "name",
-                        "dataType": ["string"],
-                        "description": "Symbol name"
-                    },
-                    {
-                        "name": "kind",
-                        "dataType": ["string"],
-                        "description": "Symbol kind (function, class, etc.)"
-                    },
-                    {
-                        "name": "file",
-                        "dataType": ["string"],
-                        "description": "File path"
-                    },
-                    {
-                        "name": "line",
-                        "dataType": ["int"],
-                        "description": "Line number"
-                    },
-                    {
-                        "name": "snippet",
-                        "dataType": ["text"],
-                        "description": "Code snippet"
-                    }
+        if weaviate_client.collections.exists(SYMBOLS_CLASS):
+            config = weaviate_client.collections.get(SYMBOLS_CLASS).config.get()
+            file_property = next((prop for prop in config.properties if prop.name == "file"), None)
+            if file_property is None or file_property.tokenization != Tokenization.FIELD:
+                logger.warning(f"Rebuilding {SYMBOLS_CLASS}: 'file' is not field-tokenized")
+                weaviate_client.collections.delete(SYMBOLS_CLASS)
+                _clear_states()
+
+        if not weaviate_client.collections.exists(SYMBOLS_CLASS):
+            weaviate_client.collections.create(
+                name=SYMBOLS_CLASS,
+                description="Code symbols indexed for semantic search",
+                vectorizer_config=Configure.Vectorizer.none(),  # We provide our own vectors
+                properties=[
+                    Property(name="name", data_type=DataType.TEXT, description="Symbol name"),
+                    Property(name="kind", data_type=DataType.TEXT, description="Symbol kind (function, class, etc.)"),
+                    Property(name="file", data_type=DataType.TEXT, tokenization=Tokenization.FIELD, description="File path"),
+                    Property(name="line", data_type=DataType.INT, description="Line number"),
+                    Property(name="snippet", data_type=DataType.TEXT, description="Code snippet"),
                 ]
-            }
-            
-            weaviate_client.schema.create_class(class_definition)
-            logger.info("Created Weaviate class: SophiaCodeSymbols")
-        else:
-            logger.info("Weaviate class SophiaCodeSymbols already exists")
+            )
+            logger.info(f"Created Weaviate class: {SYMBOLS_CLASS}")
 
     except Exception as e:
         logger.error(f"Failed to ensure symbols schema exists: {e}")
 
 
-if weaviate_client:
-    weaviate_client.close()  # Ensure Weaviate client is closed properly
-
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Repository Snapshot Index
+In-memory index of a checkout's directory tree, file metadata and MCP service
+map, built once and kept current with cheap directory mtime checks so that
+repository questions are answered without walking the filesystem.
+"""
+
+import os
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Directories listed as entries but never descended into
+IGNORED_DIRS = {
+    ".git", "node_modules", "__pycache__", ".venv", "venv", ".mypy_cache",
+    ".pytest_cache", ".next", "dist", "build", ".cache", ".tox"
+}
+
+@dataclass
+class FileMeta:
+    """Metadata recorded for every indexed file"""
+    size: int
+    mtime: float
+
+@dataclass
+class DirNode:
+    """Directory entry: its mtime at scan time and its child names"""
+    mtime: float
+    dirs: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+    entries: List[str] = field(default_factory=list)  # dirs + files, sorted
+
+class RepositoryIndex:
+    """Snapshot of a repository's tree, refreshed incrementally.
+
+    ``refresh()`` stats every indexed directory and rescans only those whose
+    mtime changed (entries added, removed or renamed), so keeping the index
+    current costs one ``stat`` per directory rather than a full walk.
+    File content edits do not change directory mtimes; file metadata is
+    therefore as of the last scan of its parent directory.
+
+    ``build()``/``refresh()`` run in a worker thread; every query takes the
+    same lock and returns copies, so readers never see a half-applied scan.
+    ``refresh()`` stats directories without the lock and only takes it to
+    apply rescans, and ``ensure_fresh()`` runs it in the background, so
+    queries keep being answered from the last snapshot meanwhile.
+    """
+
+    def __init__(self, root: Path, refresh_interval: float = 5.0):
+        self.root = Path(root).resolve()
+        self.refresh_interval = refresh_interval
+        self.dirs: Dict[str, DirNode] = {}  # "" is the root; keys are posix relative paths
+        self.files: Dict[str, FileMeta] = {}
+        self.generation = 0
+        self.last_refresh = 0.0
+        self._env_cache: Tuple[float, List[str]] = (-1.0, [])
+        self._query_cache: Dict[Tuple[str, int], List[str]] = {}
+        self._sorted_dirs: Optional[List[str]] = None
+        self._mcp_cache: Optional[Dict[str, List[str]]] = None
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Building and refreshing
+    # ------------------------------------------------------------------
+
+    def build(self) -> "RepositoryIndex":
+        """Full scan of the repository"""
+        start = time.perf_counter()
+        with self._lock:
+            self.dirs.clear()
+            self.files.clear()
+            self._scan_dir("")
+            self._bump()
+        logger.info(
+            f"Indexed {len(self.files)} files in {len(self.dirs)} directories "
+            f"under {self.root} in {time.perf_counter() - start:.2f}s"
+        )
+        return self
+
+    def refresh(self) -> int:
+        """Rescan directories whose mtime changed; returns how many were rescanned"""
+        with self._lock:
+            known = {rel_dir: node.mtime for rel_dir, node in self.dirs.items()}
+
+        # The stat walk runs unlocked; queries meanwhile see the last snapshot
+        changed = []
+        for rel_dir, known_mtime in known.items():
+            try:
+                mtime = os.stat(self._abs(rel_dir)).st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if mtime != known_mtime:
+                changed.append(rel_dir)
+
+        rescanned = 0
+        with self._lock:
+            for rel_dir in changed:
+                if rel_dir not in self.dirs:
+                    continue  # removed while handling a parent
+                self._rescan_dir(rel_dir)  # drops the directory if it is gone
+                rescanned += 1
+            if rescanned:
+                self._bump()
+            self.last_refresh = time.monotonic()
+        return rescanned
+
+    def ensure_fresh(self):
+        """Build on first use; afterwards, once the last check is older than
+        ``refresh_interval``, refresh in a background thread and return at once"""
+        if not self.dirs:
+            self.build()
+            return
+        if time.monotonic() - self.last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._background_refresh, name="repository-index-refresh", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"Repository index refresh failed: {e}")
+            self.last_refresh = time.monotonic()  # retry after the next interval
+
+    def _abs(self, rel_path: str) -> str:
+        return str(self.root / rel_path) if rel_path else str(self.root)
+
+    @staticmethod
+    def _join(rel_dir: str, name: str) -> str:
+        return f"{rel_dir}/{name}" if rel_dir else name
+
+    def _bump(self):
+        self.generation += 1
+        self._query_cache.clear()
+        self._sorted_dirs = None
+        self._mcp_cache = None
+        self.last_refresh = time.monotonic()
+
+    def _scan_dir(self, rel_dir: str):
+        """Index a directory and everything below it"""
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            node = self._read_dir(current)
+            if node is None:
+                continue
+            self.dirs[current] = node
+            for name in node.dirs:
+                if name not in IGNORED_DIRS:
+                    stack.append(self._join(current, name))
+
+    def _read_dir(self, rel_dir: str) -> Optional[DirNode]:
+        try:
+            with os.scandir(self._abs(rel_dir)) as it:
+                node = DirNode(mtime=os.stat(self._abs(rel_dir)).st_mtime)
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            node.dirs.append(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            node.files.append(entry.name)
+                            self.files[self._join(rel_dir, entry.name)] = FileMeta(
+                                size=stat.st_size, mtime=stat.st_mtime
+                            )
+                    except OSError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            return None
+        node.dirs.sort()
+        node.files.sort()
+        node.entries = sorted(node.dirs + node.files)
+        return node
+
+    def _rescan_dir(self, rel_dir: str):
+        old = self.dirs[rel_dir]
+        for name in old.files:
+            self.files.pop(self._join(rel_dir, name), None)
+
+        node = self._read_dir(rel_dir)
+        if node is None:
+            self._remove_dir(rel_dir)
+            return
+        self.dirs[rel_dir] = node
+
+        # Drop vanished subtrees, index new ones
+        for name in set(old.dirs) - set(node.dirs):
+            self._remove_dir(self._join(rel_dir, name))
+        for name in set(node.dirs) - set(old.dirs):
+            if name not in IGNORED_DIRS:
+                self._scan_dir(self._join(rel_dir, name))
+
+    def _remove_dir(self, rel_dir: str):
+        node = self.dirs.pop(rel_dir, None)
+        if node is None:
+            return
+        for name in node.files:
+            self.files.pop(self._join(rel_dir, name), None)
+        for name in node.dirs:
+            self._remove_dir(self._join(rel_dir, name))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def list_dir(self, rel_dir: str) -> Optional[List[str]]:
+        """Sorted entry names of a directory, or None if it is not indexed"""
+        with self._lock:
+            node = self.dirs.get(rel_dir)
+            return list(node.entries) if node else None
+
+    def is_file(self, rel_path: str) -> bool:
+        with self._lock:
+            return rel_path in self.files
+
+    def find(self, term: str, limit: int = 10) -> List[str]:
+        """Relative paths whose final component contains ``term`` (case-sensitive,
+        like ``glob("**/*term*")``), in sorted path order"""
+        cache_key = (term, limit)
+        # refresh() mutates the tree from a worker thread
+        with self._lock:
+            cached = self._query_cache.get(cache_key)
+            if cached is not None:
+                return list(cached)
+
+            if self._sorted_dirs is None:
+                self._sorted_dirs = sorted(self.dirs)
+
+            matches = []
+            for rel_dir in self._sorted_dirs:
+                node = self.dirs[rel_dir]
+                for name in node.entries:
+                    if term in name:
+                        matches.append(self._join(rel_dir, name))
+                        if len(matches) >= limit:
+                            break
+                if len(matches) >= limit:
+                    break
+
+            self._query_cache[cache_key] = matches
+            return list(matches)
+
+    def mcp_services(self) -> Dict[str, List[str]]:
+        """MCP service map: services/mcp-* with an app.py, and mcp/* modules"""
+        with self._lock:
+            if self._mcp_cache is None:
+                services_node = self.dirs.get("services")
+                mcp_node = self.dirs.get("mcp")
+                self._mcp_cache = {
+                    "services": [
+                        name for name in (services_node.dirs if services_node else [])
+                        if name.startswith("mcp-") and f"services/{name}/app.py" in self.files
+                    ],
+                    "modules": list(mcp_node.dirs) if mcp_node else []
+                }
+            return {key: list(names) for key, names in self._mcp_cache.items()}
+
+    def mcp_port_config(self) -> List[str]:
+        """MCP_*PORT lines from the repository .env, re-read only when it changes"""
+        try:
+            mtime = os.stat(self.root / ".env").st_mtime
+        except OSError:
+            return []
+        if self._env_cache[0] == mtime:
+            return self._env_cache[1]
+        try:
+            with open(self.root / ".env", "r") as f:
+                lines = [line.strip() for line in f if "MCP_" in line and "PORT" in line]
+        except OSError:
+            lines = []
+        self._env_cache = (mtime, lines)
+        return lines
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self.files),
+                "directories": len(self.dirs),
+                "generation": self.generation
+            }
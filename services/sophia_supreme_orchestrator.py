@@ -19,8 +19,16 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import httpx
 from pathlib import Path
+from collections import deque
+from urllib.parse import urlsplit
 import glob
 
+try:
+    from .repository_index import RepositoryIndex
+except ImportError:
+    # Run as a script, or with services/ on sys.path
+    from repository_index import RepositoryIndex
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -40,6 +48,17 @@ API_KEYS = {
     "apify": os.getenv("APIFY_API_TOKEN"),
 }
 
+# Incremental search merge: stop after this many providers returned results,
+# or after the deadline, cancelling whoever is still outstanding
+SEARCH_QUORUM = int(os.getenv("SEARCH_QUORUM", "3"))
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "6"))
+
+# Repository snapshot for "local" queries (repository root is the parent of services/)
+repository_index = RepositoryIndex(
+    Path(__file__).parent.parent,
+    refresh_interval=float(os.getenv("REPO_INDEX_REFRESH_SECONDS", "5"))
+)
+
 class TaskType(Enum):
     """Task types for routing"""
     LIVE_RESEARCH = "live_research"  # Real-time web research with citations
@@ -159,6 +178,66 @@ class SmartRouter:
             max_latency_ms=config.get("max_latency_ms", 30000)
         )
 
+@dataclass
+class SearchHit:
+    """Single search result from a provider"""
+    title: str
+    url: str
+    snippet: str = ""
+    score: Optional[float] = None
+
+@dataclass
+class SearchResult:
+    """One provider's search response"""
+    provider: str
+    hits: List[SearchHit]
+    answer: Optional[str] = None
+    latency_ms: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and bool(self.hits or self.answer)
+
+class ProviderLatencyTracker:
+    """Rolling per-provider latency and outcome counts"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self.latencies: Dict[str, deque] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, provider: str, latency_ms: float, outcome: str):
+        if provider not in self.latencies:
+            self.latencies[provider] = deque(maxlen=self.window)
+            self.outcomes[provider] = {"ok": 0, "empty": 0, "error": 0, "cancelled": 0}
+        if outcome != "cancelled":
+            self.latencies[provider].append(latency_ms)
+        self.outcomes[provider][outcome] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = {}
+        for provider, samples in self.latencies.items():
+            values = sorted(samples)
+            stats[provider] = {
+                **self.outcomes[provider],
+                "p50_ms": round(values[len(values) // 2], 1) if values else None,
+                "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1) if values else None,
+            }
+        return stats
+
+provider_latency = ProviderLatencyTracker()
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for cross-provider de-duplication"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{path}{query}"
+
 class SophiaSupremeOrchestrator:
     """Production-ready orchestrator with quality-first approach"""
     
@@ -292,8 +371,8 @@ class SophiaSupremeOrchestrator:
             logger.error(f"OpenRouter error: {e}")
             yield f"Error calling OpenRouter: {str(e)}"
     
-    async def call_serper(self, query: str) -> str:
-        """Call Serper for Google search"""
+    async def search_serper(self, query: str) -> SearchResult:
+        """Serper (Google) search, structured"""
         headers = {
             "X-API-KEY": API_KEYS["serper"],
             "Content-Type": "application/json"
@@ -301,25 +380,29 @@ class SophiaSupremeOrchestrator:
         
         payload = {"q": query, "num": 5}
         
+        async with self.session.post(
+            "https://google.serper.dev/search",
+            headers=headers,
+            json=payload
+        ) as response:
+            data = await response.json()
+        
+        hits = [
+            SearchHit(title=item.get("title", ""), url=item.get("link", ""), snippet=item.get("snippet", ""))
+            for item in data.get("organic", [])[:5]
+        ]
+        return SearchResult(provider="Serper", hits=hits)
+    
+    async def call_serper(self, query: str) -> str:
+        """Call Serper for Google search"""
         try:
-            async with self.session.post(
-                "https://google.serper.dev/search",
-                headers=headers,
-                json=payload
-            ) as response:
-                data = await response.json()
-                if "organic" in data:
-                    results = []
-                    for item in data["organic"][:5]:
-                        results.append(f"• {item['title']}\n  {item['snippet']}\n  {item['link']}")
-                    return "\n\n".join(results)
-                return "No results found"
+            return self._format_search_result(await self.search_serper(query))
         except Exception as e:
             logger.error(f"Serper error: {e}")
             return f"Error with Serper: {str(e)}"
     
-    async def call_brave(self, query: str) -> str:
-        """Call Brave Search API"""
+    async def search_brave(self, query: str) -> SearchResult:
+        """Brave web search, structured"""
         headers = {
             "Accept": "application/json",
             "X-Subscription-Token": API_KEYS["brave"]
@@ -327,25 +410,29 @@ class SophiaSupremeOrchestrator:
         
         params = {"q": query, "count": 5}
         
+        async with self.session.get(
+            "https://api.search.brave.com/res/v1/web/search",
+            headers=headers,
+            params=params
+        ) as response:
+            data = await response.json()
+        
+        hits = [
+            SearchHit(title=item.get("title", "No title"), url=item.get("url", ""), snippet=item.get("description", ""))
+            for item in data.get("web", {}).get("results", [])[:5]
+        ]
+        return SearchResult(provider="Brave", hits=hits)
+    
+    async def call_brave(self, query: str) -> str:
+        """Call Brave Search API"""
         try:
-            async with self.session.get(
-                "https://api.search.brave.com/res/v1/web/search",
-                headers=headers,
-                params=params
-            ) as response:
-                data = await response.json()
-                if "web" in data and "results" in data["web"]:
-                    results = []
-                    for item in data["web"]["results"][:5]:
-                        results.append(f"• {item.get('title', 'No title')}\n  {item.get('description', '')}\n  {item.get('url', '')}")
-                    return "\n\n".join(results)
-                return "No results found"
+            return self._format_search_result(await self.search_brave(query))
         except Exception as e:
             logger.error(f"Brave error: {e}")
             return f"Error with Brave: {str(e)}"
     
-    async def call_tavily(self, query: str) -> str:
-        """Call Tavily for AI-optimized search"""
+    async def search_tavily(self, query: str) -> SearchResult:
+        """Tavily AI-optimized search, structured"""
         headers = {"Content-Type": "application/json"}
         
         payload = {
@@ -355,59 +442,59 @@ class SophiaSupremeOrchestrator:
             "max_results": 5
         }
         
+        async with self.session.post(
+            "https://api.tavily.com/search",
+            headers=headers,
+            json=payload
+        ) as response:
+            data = await response.json()
+        
+        if not data.get("answer"):
+            return SearchResult(provider="Tavily", hits=[])
+        hits = [
+            SearchHit(title=item.get("title", ""), url=item.get("url", ""))
+            for item in (data.get("results") or [])[:5]
+        ]
+        return SearchResult(provider="Tavily", hits=hits, answer=data["answer"])
+    
+    async def call_tavily(self, query: str) -> str:
+        """Call Tavily for AI-optimized search"""
         try:
-            async with self.session.post(
-                "https://api.tavily.com/search",
-                headers=headers,
-                json=payload
-            ) as response:
-                data = await response.json()
-                if data.get("answer"):
-                    result = data["answer"] + "\n\nSources:\n"
-                    if data.get("results"):
-                        for item in data["results"][:5]:
-                            result += f"• {item.get('title', '')}: {item.get('url', '')}\n"
-                    return result
-                return "No results found"
+            return self._format_search_result(await self.search_tavily(query))
         except Exception as e:
             logger.error(f"Tavily error: {e}")
             return f"Error with Tavily: {str(e)}"
     
     async def analyze_local_repository(self, query: str) -> str:
-        """Analyze local repository structure and files"""
+        """Analyze local repository structure and files from the snapshot index"""
         try:
-            # Get repository root (assuming we're in services/)
-            repo_root = Path(__file__).parent.parent
+            # Builds on first use (off the event loop); later refreshes run in
+            # the background while the last snapshot answers
+            await asyncio.to_thread(repository_index.ensure_fresh)
+            repo_root = repository_index.root
             
             # Common patterns to search for based on query
             if "mcp" in query.lower() or "server" in query.lower():
-                # Find MCP-related files
-                mcp_services = list(repo_root.glob("services/mcp-*"))
-                mcp_modules = list(repo_root.glob("mcp/*/"))
+                service_map = repository_index.mcp_services()
                 
                 result = "## MCP Server Layout Analysis\n\n"
                 
-                if mcp_services:
+                if service_map["services"]:
                     result += "### Core MCP Services (/services/mcp-*)\n"
-                    for service in sorted(mcp_services):
-                        if service.is_dir():
-                            app_file = service / "app.py"
-                            if app_file.exists():
-                                result += f"- **{service.name}**: {app_file}\n"
+                    for name in service_map["services"]:
+                        result += f"- **{name}**: {repo_root / 'services' / name / 'app.py'}\n"
                 
-                if mcp_modules:
+                if service_map["modules"]:
                     result += "\n### Domain MCP Modules (/mcp/*)\n"
-                    for module in sorted(mcp_modules):
-                        result += f"- **{module.name}**: {module}\n"
+                    for name in service_map["modules"]:
+                        result += f"- **{name}**: {repo_root / 'mcp' / name}\n"
                 
                 # Add port configuration if found
-                env_file = repo_root / ".env"
-                if env_file.exists():
+                port_lines = repository_index.mcp_port_config()
+                if port_lines:
                     result += "\n### MCP Port Configuration\n"
-                    with open(env_file, 'r') as f:
-                        for line in f:
-                            if "MCP_" in line and "PORT" in line:
-                                result += f"- {line.strip()}\n"
+                    for line in port_lines:
+                        result += f"- {line}\n"
                 
                 return result if result else "No MCP servers found in repository"
                 
@@ -418,12 +505,11 @@ class SophiaSupremeOrchestrator:
                 # Key directories
                 dirs_to_check = ["services", "apps", "mcp", "scripts", "libs", "backend"]
                 for dir_name in dirs_to_check:
-                    dir_path = repo_root / dir_name
-                    if dir_path.exists():
-                        items = list(dir_path.iterdir())
+                    items = repository_index.list_dir(dir_name)
+                    if items is not None:
                         result += f"### /{dir_name}/ ({len(items)} items)\n"
-                        for item in sorted(items)[:5]:  # Show first 5
-                            result += f"- {item.name}\n"
+                        for item in items[:5]:  # Show first 5
+                            result += f"- {item}\n"
                         if len(items) > 5:
                             result += f"- ... and {len(items)-5} more\n"
                         result += "\n"
@@ -432,13 +518,12 @@ class SophiaSupremeOrchestrator:
                 
             else:
                 # Search for specific files
-                search_pattern = f"**/*{query.split()[-1]}*" if query.split() else "**/*.py"
-                files = list(repo_root.glob(search_pattern))[:10]
+                term = query.split()[-1] if query.split() else ".py"
+                files = repository_index.find(term, limit=10)
                 
                 if files:
                     result = f"## Files matching '{query}':\n"
-                    for file in files:
-                        relative_path = file.relative_to(repo_root)
+                    for relative_path in files:
                         result += f"- {relative_path}\n"
                     return result
                 else:
@@ -448,8 +533,8 @@ class SophiaSupremeOrchestrator:
             logger.error(f"Local analysis error: {e}")
             return f"Error analyzing repository: {str(e)}"
     
-    async def call_exa(self, query: str) -> str:
-        """Call Exa AI for semantic search"""
+    async def search_exa(self, query: str) -> SearchResult:
+        """Exa AI semantic search, structured"""
         headers = {
             "accept": "application/json",
             "content-type": "application/json",
@@ -463,23 +548,133 @@ class SophiaSupremeOrchestrator:
             "type": "neural"
         }
         
+        async with self.session.post(
+            "https://api.exa.ai/search",
+            headers=headers,
+            json=payload
+        ) as response:
+            data = await response.json()
+        
+        hits = [
+            SearchHit(title=item.get("title", ""), url=item.get("url", ""), score=item.get("score", 0))
+            for item in data.get("results", [])[:5]
+        ]
+        return SearchResult(provider="Exa", hits=hits)
+    
+    async def call_exa(self, query: str) -> str:
+        """Call Exa AI for semantic search"""
         try:
-            async with self.session.post(
-                "https://api.exa.ai/search",
-                headers=headers,
-                json=payload
-            ) as response:
-                data = await response.json()
-                if "results" in data:
-                    results = []
-                    for item in data["results"][:5]:
-                        results.append(f"• {item.get('title', '')}\n  {item.get('url', '')}\n  Score: {item.get('score', 0):.2f}")
-                    return "\n\n".join(results)
-                return "No results found"
+            return self._format_search_result(await self.search_exa(query))
         except Exception as e:
             logger.error(f"Exa error: {e}")
             return f"Error with Exa: {str(e)}"
     
+    def _format_search_result(self, result: SearchResult, hits: Optional[List[SearchHit]] = None) -> str:
+        """Render a provider result in the chat text format"""
+        hits = result.hits if hits is None else hits
+        if result.answer:
+            text = result.answer + "\n\nSources:\n"
+            for hit in hits:
+                text += f"• {hit.title}: {hit.url}\n"
+            return text
+        if not hits:
+            return "No results found"
+        
+        lines = []
+        for hit in hits:
+            if hit.score is not None:
+                lines.append(f"• {hit.title}\n  {hit.url}\n  Score: {hit.score:.2f}")
+            else:
+                lines.append(f"• {hit.title}\n  {hit.snippet}\n  {hit.url}")
+        return "\n\n".join(lines)
+    
+    async def _timed_search(self, provider: str, search_fn, query: str) -> SearchResult:
+        """Run one provider search, recording latency and outcome"""
+        start = time.perf_counter()
+        try:
+            result = await search_fn(query)
+        except asyncio.CancelledError:
+            provider_latency.record(provider, (time.perf_counter() - start) * 1000, "cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"{provider} error: {e}")
+            result = SearchResult(provider=provider, hits=[], error=str(e))
+        
+        result.latency_ms = (time.perf_counter() - start) * 1000
+        outcome = "error" if result.error else ("ok" if result.ok else "empty")
+        provider_latency.record(provider, result.latency_ms, outcome)
+        return result
+    
+    async def stream_search(
+        self,
+        query: str,
+        quorum: int = SEARCH_QUORUM,
+        deadline: float = SEARCH_DEADLINE_SECONDS
+    ) -> AsyncIterator[SearchResult]:
+        """Yield provider results as they arrive (first result wins).
+        
+        Stops once `quorum` providers have returned results or `deadline`
+        seconds have passed, cancelling the stragglers.
+        """
+        providers = {
+            "Serper": self.search_serper,
+            "Brave": self.search_brave,
+            "Tavily": self.search_tavily,
+            "Exa": self.search_exa
+        }
+        pending = [
+            asyncio.ensure_future(self._timed_search(name, search_fn, query))
+            for name, search_fn in providers.items()
+        ]
+        
+        successes = 0
+        try:
+            for next_result in asyncio.as_completed(pending, timeout=deadline):
+                try:
+                    result = await next_result
+                except asyncio.TimeoutError:
+                    logger.info(f"Search deadline of {deadline}s reached; cancelling stragglers")
+                    break
+                yield result
+                if result.ok:
+                    successes += 1
+                    if successes >= quorum:
+                        break
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+    
+    async def _incremental_search(self, query: str) -> AsyncIterator[str]:
+        """Stream each provider's new (URL-deduplicated) results as they arrive"""
+        seen_urls = set()
+        providers_used = []
+        
+        async for result in self.stream_search(query):
+            if not result.ok:
+                continue
+            
+            new_hits = []
+            for hit in result.hits:
+                key = normalize_url(hit.url) if hit.url else None
+                if key and key in seen_urls:
+                    continue
+                if key:
+                    seen_urls.add(key)
+                new_hits.append(hit)
+            
+            if not new_hits and not result.answer:
+                continue
+            
+            separator = "\n\n---\n\n" if providers_used else ""
+            providers_used.append(result.provider)
+            yield f"{separator}**{result.provider} Results:**\n{self._format_search_result(result, new_hits)}"
+        
+        if providers_used:
+            yield f"\n\n[Search Providers: {', '.join(providers_used)}]"
+        else:
+            yield "No search results available"
+    
     async def orchestrate(
         self,
         query: str,
@@ -521,6 +716,11 @@ class SophiaSupremeOrchestrator:
                 ):
                     yield chunk
                     
+            elif context.get("search_mode", "incremental") == "incremental":
+                # Stream each provider's results as soon as it answers
+                async for chunk in self._incremental_search(query):
+                    yield chunk
+                
             else:
                 # Parallel search across multiple providers for best results
                 search_tasks = [
@@ -571,6 +771,11 @@ class SophiaSupremeOrchestrator:
 # FastAPI Application
 app = FastAPI(title="Sophia Supreme Orchestrator")
 
+@app.on_event("startup")
+async def build_repository_index():
+    """Build the repository snapshot once, off the event loop"""
+    await asyncio.to_thread(repository_index.build)
+
 class ChatRequest(BaseModel):
     message: str
     session_id: str = "default"
@@ -604,7 +809,9 @@ def health_check():
             "xai": bool(API_KEYS["xai"]),
         },
         "models": [m.value for m in ModelClass],
-        "tasks": [t.value for t in TaskType]
+        "tasks": [t.value for t in TaskType],
+        "search_latency": provider_latency.snapshot(),
+        "repository_index": repository_index.stats()
     }
 
 @app.get("/models")
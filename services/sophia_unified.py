@@ -11,6 +11,7 @@ import sys
 import json
 import asyncio
 import logging
+import time
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from enum import Enum
@@ -78,6 +79,115 @@ class APIConfig:
     capabilities: List[QueryType]
     priority: int  # Lower is higher priority
 
+class CircuitState(Enum):
+    """Circuit breaker states"""
+    CLOSED = "closed"        # Requests flow normally
+    OPEN = "open"            # Failing; requests skipped until the recovery timeout
+    HALF_OPEN = "half_open"  # One probe request allowed to test recovery
+
+class ProviderHealth:
+    """Per-provider circuit breaker with latency and error-rate EWMAs.
+    
+    The breaker opens after `failure_threshold` consecutive failures. After
+    `recovery_timeout` seconds one probe request is let through (half-open):
+    success closes the circuit, failure re-opens it with the timeout doubled
+    (up to `max_recovery_timeout`).
+    """
+    
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 30.0,
+        max_recovery_timeout: float = 300.0,
+        alpha: float = 0.2
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.alpha = alpha
+        
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.recovery_timeout = recovery_timeout
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        
+        self.latency_ewma: Optional[float] = None  # seconds
+        self.error_rate_ewma = 0.0
+        self.total_requests = 0
+        self.total_failures = 0
+    
+    def is_available(self) -> bool:
+        """Whether a request could be attempted now (no state change)"""
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.OPEN:
+            return time.monotonic() - self.opened_at >= self.recovery_timeout
+        return not self.probe_in_flight
+    
+    def allow_request(self) -> bool:
+        """Claim permission to send a request, moving OPEN -> HALF_OPEN when due"""
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = CircuitState.HALF_OPEN
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+    
+    def record_success(self, latency: float):
+        self.total_requests += 1
+        self.latency_ewma = latency if self.latency_ewma is None else (
+            self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+        )
+        self.error_rate_ewma *= (1 - self.alpha)
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        if self.state != CircuitState.CLOSED:
+            logger.info("Circuit closed after successful recovery probe")
+        self.state = CircuitState.CLOSED
+        self.recovery_timeout = self.base_recovery_timeout
+    
+    def record_failure(self):
+        self.total_requests += 1
+        self.total_failures += 1
+        self.error_rate_ewma = self.alpha + (1 - self.alpha) * self.error_rate_ewma
+        self.consecutive_failures += 1
+        
+        if self.state == CircuitState.HALF_OPEN:
+            self.recovery_timeout = min(self.recovery_timeout * 2, self.max_recovery_timeout)
+            self._open()
+        elif self.consecutive_failures >= self.failure_threshold:
+            self._open()
+        self.probe_in_flight = False
+    
+    def abandon_probe(self):
+        """Release a half-open probe whose request was cancelled"""
+        self.probe_in_flight = False
+    
+    def _open(self):
+        self.state = CircuitState.OPEN
+        self.opened_at = time.monotonic()
+    
+    def ranking_penalty(self, latency_reference: float, error_penalty: float) -> float:
+        """Priority levels to add for observed slowness and errors"""
+        latency = (self.latency_ewma or 0.0) / latency_reference
+        return latency + error_penalty * self.error_rate_ewma
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "error_rate_ewma": round(self.error_rate_ewma, 3),
+            "recovery_timeout": self.recovery_timeout,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures
+        }
+
 class SophiaUnified:
     """
     The ONLY orchestrator we need. Consolidates:
@@ -97,9 +207,23 @@ class SophiaUnified:
         # Initialize HTTP client
         self.client = httpx.AsyncClient(timeout=30.0)
         
-        # Cache for provider availability
+        # Cache for static provider configuration checks (API key present)
         self.provider_status = {}
         
+        # Runtime health: circuit breaker and latency/error EWMAs per provider
+        self.provider_health: Dict[Provider, ProviderHealth] = {
+            provider: ProviderHealth(
+                failure_threshold=int(os.getenv("PROVIDER_FAILURE_THRESHOLD", "3")),
+                recovery_timeout=float(os.getenv("PROVIDER_RECOVERY_TIMEOUT", "30"))
+            )
+            for provider in self.api_configs
+        }
+        
+        # Bounded fallback chain and ranking weights
+        self.max_provider_attempts = int(os.getenv("MAX_PROVIDER_ATTEMPTS", "3"))
+        self.latency_reference = 5.0  # seconds of EWMA latency worth one priority level
+        self.error_penalty = 3.0  # priority levels added at a 100% error rate
+        
         # Repository context for self-awareness
         self.repository_context = self._load_repository_context()
         
@@ -241,44 +365,63 @@ class SophiaUnified:
         # Default to general knowledge
         return QueryType.GENERAL_KNOWLEDGE
     
-    async def select_optimal_provider(self, query_type: QueryType) -> Optional[Provider]:
-        """Select the best available provider for the query type"""
-        # Get providers that support this query type
-        capable_providers = [
-            (provider, config) 
-            for provider, config in self.api_configs.items() 
-            if query_type in config.capabilities
-        ]
-        
-        # Sort by priority
-        capable_providers.sort(key=lambda x: x[1].priority)
-        
-        # Return first available
-        for provider, config in capable_providers:
-            # Check if provider is available (cached or quick test)
+    async def rank_providers(self, query_type: QueryType) -> List[Provider]:
+        """Capable, configured providers ordered by priority adjusted for health"""
+        ranked = []
+        for provider, config in self.api_configs.items():
+            if query_type not in config.capabilities:
+                continue
+            
+            # Only the static configuration check is cached; reachability is
+            # tracked by the breaker, whose half-open probe brings it back
             if provider not in self.provider_status:
-                self.provider_status[provider] = await self._check_provider_availability(provider, config)
+                self.provider_status[provider] = self._is_configured(provider, config)
+            if not self.provider_status[provider]:
+                continue
             
-            if self.provider_status[provider]:
+            health = self.provider_health[provider]
+            score = config.priority + health.ranking_penalty(self.latency_reference, self.error_penalty)
+            ranked.append((score, config.priority, provider))
+        
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        return [provider for _, _, provider in ranked]
+    
+    async def select_optimal_provider(self, query_type: QueryType) -> Optional[Provider]:
+        """Select the best available provider for the query type"""
+        for provider in await self.rank_providers(query_type):
+            if self.provider_health[provider].is_available():
                 return provider
         
         return None
     
-    async def _check_provider_availability(self, provider: Provider, config: APIConfig) -> bool:
-        """Quick availability check for a provider"""
-        if not config.api_key and provider != Provider.MCP_RESEARCH:
-            return False
-        
-        # For MCP services, check if endpoint is reachable
-        if provider in [Provider.MCP_RESEARCH, Provider.MCP_GITHUB]:
-            try:
-                response = await self.client.get(f"{config.endpoint}/health", timeout=2.0)
-                return response.status_code == 200
-            except:
-                return False
-        
-        # For API services, assume available if key exists
-        return True
+    def _is_configured(self, provider: Provider, config: APIConfig) -> bool:
+        """Static check: the provider has the credentials it needs"""
+        return bool(config.api_key) or provider == Provider.MCP_RESEARCH
+    
+    async def _probe_provider(self, provider: Provider, config: APIConfig):
+        """Check an MCP service's /health and record the result in its breaker.
+        
+        API services have no cheap health endpoint; their breakers are fed by
+        real calls only.
+        """
+        if provider not in [Provider.MCP_RESEARCH, Provider.MCP_GITHUB]:
+            return
+        health = self.provider_health[provider]
+        if not health.allow_request():
+            return
+        probe_start = time.perf_counter()
+        try:
+            response = await self.client.get(f"{config.endpoint}/health", timeout=2.0)
+        except asyncio.CancelledError:
+            health.abandon_probe()
+            raise
+        except Exception:
+            health.record_failure()
+            return
+        if response.status_code == 200:
+            health.record_success(time.perf_counter() - probe_start)
+        else:
+            health.record_failure()
     
     async def execute_query(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Execute query using optimal provider"""
@@ -288,32 +431,32 @@ class SophiaUnified:
         query_type = await self.classify_query(query)
         logger.info(f"Query classified as: {query_type.value}")
         
-        # Select provider
-        provider = await self.select_optimal_provider(query_type)
-        
-        if not provider:
-            logger.warning("No providers available, using fallback")
-            return self._generate_fallback_response(query, query_type)
-        
-        logger.info(f"Using provider: {provider.value}")
-        
-        # Execute with selected provider
-        try:
+        # Walk a bounded fallback chain, skipping providers whose circuit is open
+        attempts = []
+        for provider in await self.rank_providers(query_type):
+            if len(attempts) >= self.max_provider_attempts:
+                break
+            
+            health = self.provider_health[provider]
+            if not health.allow_request():
+                continue
+            
+            logger.info(f"Using provider: {provider.value} ({health.state.value})")
+            attempts.append(provider.value)
             config = self.api_configs[provider]
+            call_start = time.perf_counter()
             
-            if provider == Provider.PERPLEXITY:
-                response = await self._call_perplexity(query, config)
-            elif provider == Provider.TAVILY:
-                response = await self._call_tavily(query, config)
-            elif provider == Provider.OPENROUTER:
-                response = await self._call_openrouter(query, config)
-            elif provider == Provider.AGNO:
-                response = await self._call_agno(query, config, context)
-            elif provider == Provider.MCP_RESEARCH:
-                response = await self._call_mcp_research(query, config)
-            else:
-                response = await self._call_generic_llm(query, config)
+            try:
+                response = await self._call_provider(provider, query, config, context)
+            except asyncio.CancelledError:
+                health.abandon_probe()
+                raise
+            except Exception as e:
+                health.record_failure()
+                logger.error(f"Provider {provider.value} failed ({health.state.value}): {e}")
+                continue
             
+            health.record_success(time.perf_counter() - call_start)
             execution_time = (datetime.now() - start_time).total_seconds()
             
             return {
@@ -324,16 +467,34 @@ class SophiaUnified:
                 "quality_score": 0.9,
                 "metadata": {
                     "model": config.models[0] if config.models else "default",
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": datetime.now().isoformat(),
+                    "providers_attempted": attempts
                 }
             }
-            
-        except Exception as e:
-            logger.error(f"Provider {provider.value} failed: {e}")
-            # Mark provider as unavailable
-            self.provider_status[provider] = False
-            # Try next provider
-            return await self.execute_query(query, context)
+        
+        logger.warning(f"No providers available (attempted: {attempts or 'none'}), using fallback")
+        return self._generate_fallback_response(query, query_type)
+    
+    async def _call_provider(
+        self,
+        provider: Provider,
+        query: str,
+        config: APIConfig,
+        context: Optional[Dict[str, Any]]
+    ) -> str:
+        """Dispatch a query to a provider's client"""
+        if provider == Provider.PERPLEXITY:
+            return await self._call_perplexity(query, config)
+        elif provider == Provider.TAVILY:
+            return await self._call_tavily(query, config)
+        elif provider == Provider.OPENROUTER:
+            return await self._call_openrouter(query, config)
+        elif provider == Provider.AGNO:
+            return await self._call_agno(query, config, context)
+        elif provider == Provider.MCP_RESEARCH:
+            return await self._call_mcp_research(query, config)
+        else:
+            return await self._call_generic_llm(query, config)
     
     async def _call_perplexity(self, query: str, config: APIConfig) -> str:
         """Call Perplexity API"""
@@ -479,12 +640,15 @@ class SophiaUnified:
         provider_checks = []
         
         for provider, config in self.api_configs.items():
-            available = await self._check_provider_availability(provider, config)
-            self.provider_status[provider] = available
+            configured = self._is_configured(provider, config)
+            self.provider_status[provider] = configured
+            if configured:
+                await self._probe_provider(provider, config)
             provider_checks.append({
                 "provider": provider.value,
-                "available": available,
-                "priority": config.priority
+                "available": configured and self.provider_health[provider].is_available(),
+                "priority": config.priority,
+                "health": self.provider_health[provider].snapshot()
             })
         
         available_count = sum(1 for p in provider_checks if p["available"])
@@ -0,0 +1,91 @@
+"""
+Query-plan regression tests for the context service knowledge search
+
+Full-text search over knowledge_fragments must use the GIN index on the
+stored search_vector column; computing to_tsvector per row would fall back
+to a sequential scan.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "services" / "mcp-context"))
+
+from knowledge_search import (  # noqa: E402
+    HYBRID_SEARCH_SQL,
+    SEARCH_VECTOR_INDEX,
+    TEXT_SEARCH_SQL,
+    vector_literal,
+)
+
+
+def plan_nodes(node):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan tree"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain(conn, sql, *args):
+    raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *args)
+    plan = json.loads(raw) if isinstance(raw, str) else raw
+    return list(plan_nodes(plan[0]["Plan"]))
+
+
+@pytest.fixture
+async def search_conn(postgres_conn):
+    """Connection with the search_vector migration applied and seq scans discouraged"""
+    has_column = await postgres_conn.fetchval(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'knowledge_fragments' AND column_name = 'search_vector'
+        """
+    )
+    if not has_column:
+        pytest.skip("knowledge_fragments search_vector migration not applied")
+
+    # Test tables are small enough that a seq scan is legitimately cheapest;
+    # disabling it leaves the index as the only alternative if it is usable.
+    await postgres_conn.execute("SET LOCAL enable_seqscan = off")
+    yield postgres_conn
+
+
+class TestKnowledgeSearchPlan:
+    """EXPLAIN-based checks that search queries stay index-backed"""
+
+    @pytest.mark.asyncio
+    async def test_text_search_uses_search_vector_index(self, search_conn):
+        nodes = await explain(
+            search_conn, TEXT_SEARCH_SQL, "quarterly revenue forecast", 0.0, ["tenant", "public"], 5
+        )
+
+        assert any(node.get("Index Name") == SEARCH_VECTOR_INDEX for node in nodes)
+        assert not any(
+            node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "knowledge_fragments"
+            for node in nodes
+        )
+
+    @pytest.mark.asyncio
+    async def test_hybrid_search_text_branch_uses_search_vector_index(self, search_conn):
+        has_vector = await search_conn.fetchval(
+            "SELECT 1 FROM pg_extension WHERE extname = 'vector'"
+        )
+        if not has_vector:
+            pytest.skip("pgvector extension not installed")
+
+        nodes = await explain(
+            search_conn,
+            HYBRID_SEARCH_SQL,
+            "quarterly revenue forecast",
+            0.0,
+            ["tenant", "public"],
+            5,
+            50,
+            vector_literal([0.0] * 1535 + [1.0]),
+            0.5,
+        )
+
+        assert any(node.get("Index Name") == SEARCH_VECTOR_INDEX for node in nodes)
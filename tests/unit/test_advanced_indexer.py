@@ -0,0 +1,179 @@
+"""
+Unit tests for incremental indexing in the MCP Context advanced indexer
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "services" / "mcp-context"))
+
+import advanced_indexer  # noqa: E402
+from advanced_indexer import CodebaseIndex, FileChangeHandler  # noqa: E402
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(advanced_indexer, "redis_client", client)
+    return client
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "pkg" / "core.py").write_text("class Engine:\n    pass\n\ndef helper():\n    pass\n")
+    (tmp_path / "pkg" / "user.py").write_text("from core import helper\n")
+    (tmp_path / "app.py").write_text("from pkg.core import Engine\n")
+    return tmp_path
+
+
+async def indexed(repo):
+    index = CodebaseIndex(str(repo))
+    await index.full_index()
+    return index
+
+
+class TestIncrementalGraph:
+    """remove_file and _update_graph keep the reverse indexes and graph exact"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_full_index_links_importers(self, repo, redis_client):
+        index = await indexed(repo)
+
+        assert index.symbol_graph["app.py"] == {"imports": ["Engine"], "imported_by": []}
+        assert index.symbol_graph["pkg/core.py"]["imported_by"] == ["app.py", "pkg/user.py"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_removed_file_leaves_no_trace(self, repo, redis_client):
+        index = await indexed(repo)
+        (repo / "pkg" / "core.py").unlink()
+
+        result = await index.incremental_update(["pkg/core.py"])
+
+        assert result == {"updated_files": [], "removed_files": ["pkg/core.py"]}
+        assert "pkg/core.py" not in index.index
+        assert "Engine" not in index.definitions and "helper" not in index.definitions
+        # Its importers lose their edges to it
+        assert "pkg/core.py" not in index.symbol_graph
+        assert "app.py" not in index.symbol_graph
+        redis_client.pipeline.return_value.hdel.assert_any_call(index.index_key, "pkg/core.py")
+        redis_client.pipeline.return_value.hdel.assert_any_call(index.definitions_key, "Engine")
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_edit_updates_graph_of_imported_file(self, repo, redis_client):
+        index = await indexed(repo)
+        (repo / "app.py").write_text("import os\n")
+
+        await index.incremental_update(["app.py"])
+
+        assert index.symbol_graph["pkg/core.py"]["imported_by"] == ["pkg/user.py"]
+        assert "app.py" not in index.symbol_graph
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_incremental_graph_matches_full_rebuild(self, repo, redis_client):
+        index = await indexed(repo)
+        (repo / "pkg" / "core.py").write_text("class Engine:\n    pass\n")
+        (repo / "pkg" / "extra.py").write_text("from pkg.core import Engine\nfrom pkg.user import helper\n")
+        (repo / "pkg" / "user.py").unlink()
+
+        await index.incremental_update(["pkg/core.py", "pkg/extra.py", "pkg/user.py"])
+        rebuilt = await indexed(repo)
+
+        assert index.symbol_graph == rebuilt.symbol_graph
+        assert dict(index.definitions) == dict(rebuilt.definitions)
+        assert dict(index.module_importers) == dict(rebuilt.module_importers)
+
+    @pytest.mark.unit
+    def test_removing_unindexed_file_is_a_no_op(self, repo, redis_client):
+        index = CodebaseIndex(str(repo))
+
+        index.remove_file("missing.py")
+
+        assert not index._dirty_files and not index._dirty_names
+
+
+@pytest.fixture
+def watched(tmp_path):
+    """A mocked indexer recording when each incremental update starts"""
+    indexer = MagicMock(repo_path=tmp_path, index={})
+    indexer.flushed_at = []
+
+    async def incremental_update(files):
+        indexer.flushed_at.append(asyncio.get_running_loop().time())
+        return {"updated_files": files, "removed_files": []}
+
+    indexer.incremental_update = AsyncMock(side_effect=incremental_update)
+    return indexer
+
+
+class TestFileChangeDebounce:
+    """Events are coalesced per path and flushed once quiet, or at the max delay"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_burst_is_coalesced_into_one_update(self, watched):
+        handler = FileChangeHandler(watched, asyncio.get_running_loop(), debounce_seconds=0.05)
+
+        for path in ("a.py", "b.py", "a.py", "a.py"):
+            handler._add(path, False)
+        await asyncio.sleep(0.2)
+
+        watched.incremental_update.assert_awaited_once_with(["a.py", "b.py"])
+        assert handler.stats()["events_received"] == 4
+        assert handler.stats()["flushes"] == 1
+        assert handler.stats()["pending"] == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_each_event_restarts_the_debounce(self, watched):
+        handler = FileChangeHandler(watched, asyncio.get_running_loop(), debounce_seconds=0.1)
+
+        handler._add("a.py", False)
+        await asyncio.sleep(0.06)
+        handler._add("b.py", False)
+        await asyncio.sleep(0.06)
+
+        # 0.12s after the first event, but only 0.06s after the last
+        watched.incremental_update.assert_not_awaited()
+        await asyncio.sleep(0.15)
+        watched.incremental_update.assert_awaited_once_with(["a.py", "b.py"])
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_steady_stream_flushes_at_max_delay(self, watched):
+        loop = asyncio.get_running_loop()
+        handler = FileChangeHandler(watched, loop, debounce_seconds=0.1, max_delay_seconds=0.2)
+
+        started = loop.time()
+        for i in range(20):
+            handler._add(f"file_{i}.py", False)
+            await asyncio.sleep(0.03)
+        handler.stop()
+
+        # Events never paused for the debounce, yet updates ran during the stream
+        assert watched.flushed_at
+        assert watched.flushed_at[0] - started < 0.2 + 0.1
+        assert len(watched.flushed_at) >= 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_observer_thread_events_are_filtered(self, watched, tmp_path):
+        handler = FileChangeHandler(watched, asyncio.get_running_loop(), debounce_seconds=10)
+
+        handler._forward(str(tmp_path / "pkg" / "mod.py"), False)
+        handler._forward(str(tmp_path / "README.md"), False)
+        handler._forward(str(tmp_path / "__pycache__" / "mod.py"), False)
+        handler._forward("/elsewhere/mod.py", False)
+        await asyncio.sleep(0)
+        handler.stop()
+
+        assert handler.pending_updates == {"pkg/mod.py"}
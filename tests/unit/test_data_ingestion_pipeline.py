@@ -0,0 +1,439 @@
+"""
+Unit tests for the streaming data ingestion pipeline
+
+The stage graph runs against an in-memory knowledge table; embeddings, the
+vector store and the cache are mocked.
+"""
+
+import asyncio
+import copy
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+from data_ingestion_pipeline import DataIngestionPipeline, IngestItem, item_id  # noqa: E402
+
+
+class FakeKnowledgeTable:
+    """Just enough of an asyncpg pool for the pipeline's knowledge queries"""
+
+    def __init__(self):
+        self.rows = {}
+        self.fail_keys = set()
+
+    # Pool API
+    def acquire(self):
+        return self
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def executemany(self, query, rows):
+        failing = {item_id(key) for key in self.fail_keys}
+        if any(row[0] in failing for row in rows):
+            raise RuntimeError("insert failed")
+        for doc_id, title, content, doc_type, source_url, metadata, content_hash, scope in rows:
+            self.rows[doc_id] = {"content_hash": content_hash, "source_scope": scope, "deleted": False}
+
+    async def fetch(self, query, *args):
+        if query.lstrip().startswith("SELECT"):
+            return [
+                {"id": doc_id, "content_hash": self.rows[doc_id]["content_hash"], "deleted": self.rows[doc_id]["deleted"]}
+                for doc_id in args[0] if doc_id in self.rows
+            ]
+        scope, live_ids = args
+        removed = [
+            doc_id for doc_id, row in self.rows.items()
+            if row["source_scope"] == scope and not row["deleted"] and doc_id not in live_ids
+        ]
+        for doc_id in removed:
+            self.rows[doc_id]["deleted"] = True
+        return [{"id": doc_id} for doc_id in removed]
+
+    async def fetchval(self, query, *args):
+        rows = self.rows.values()
+        if "deleted_at IS NULL" in query:
+            rows = [row for row in rows if not row["deleted"]]
+        return len(rows)
+
+
+class FakeTransaction:
+    """Restores the table's rows when the block raises"""
+
+    def __init__(self, table):
+        self.table = table
+
+    async def __aenter__(self):
+        self.snapshot = copy.deepcopy(self.table.rows)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.table.rows = self.snapshot
+        return False
+
+
+@pytest.fixture
+def table():
+    return FakeKnowledgeTable()
+
+
+@pytest.fixture
+def pipeline(tmp_path, table):
+    pipeline = DataIngestionPipeline()
+    pipeline.config.update(
+        batch_size=2,
+        extract_concurrency=3,
+        embed_concurrency=2,
+        write_concurrency=2,
+        queue_size=1,
+        checkpoint_dir=str(tmp_path / "checkpoints"),
+    )
+    pipeline.db_pool = table
+    pipeline._generate_embeddings = AsyncMock(side_effect=lambda texts: [[0.1, 0.2]] * len(texts))
+    pipeline._store_embeddings = AsyncMock()
+    pipeline._delete_embeddings = AsyncMock()
+    pipeline._cache_documents = AsyncMock()
+    pipeline._uncache_documents = AsyncMock()
+    return pipeline
+
+
+def documents(count, prefix="doc", source_id=None):
+    source = {
+        "type": "documents",
+        "documents": [{"filename": f"{prefix}-{i}.txt", "content": f"{prefix} body {i}"} for i in range(count)],
+    }
+    if source_id:
+        source["source_id"] = source_id
+    return source
+
+
+async def ingest(pipeline, source):
+    # A stage that dies without its sentinels would hang the run
+    return await asyncio.wait_for(pipeline.ingest_knowledge_base(source), timeout=5)
+
+
+class TestStageGraph:
+    """Back-pressure, shutdown ordering and per-stage failures"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_every_item_reaches_the_writers_before_shutdown(self, pipeline, table):
+        result = await ingest(pipeline, documents(25))
+
+        assert result["status"] == "completed"
+        assert result["summary"]["new"] == 25
+        assert set(table.rows) == {item_id(f"document:doc-{i}.txt") for i in range(25)}
+        written = [item.key for call in pipeline._store_embeddings.await_args_list for item in call.args[0]]
+        assert len(written) == 25
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_embedding_errors_fail_batches_without_hanging(self, pipeline, table):
+        pipeline._generate_embeddings.side_effect = RuntimeError("embeddings down")
+
+        result = await ingest(pipeline, documents(9))
+
+        assert result["failed"] == 9
+        assert result["successful"] == 0
+        assert table.rows == {}
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_short_embedding_response_fails_the_batch(self, pipeline, table):
+        pipeline._generate_embeddings.side_effect = lambda texts: [[0.1, 0.2]] * (len(texts) - 1)
+
+        result = await ingest(pipeline, documents(4))
+
+        assert result["failed"] == 4
+        assert table.rows == {}
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_identical_content_is_embedded_once(self, pipeline):
+        source = {
+            "type": "documents",
+            "documents": [{"filename": f"copy-{i}.txt", "content": "same body"} for i in range(4)],
+        }
+
+        result = await ingest(pipeline, source)
+
+        assert result["summary"]["new"] == 4
+        embedded = [text for call in pipeline._generate_embeddings.await_args_list for text in call.args[0]]
+        assert embedded.count("same body") <= pipeline.config["embed_concurrency"]
+        assert result["embeddings_reused"] == 4 - len(embedded)
+
+
+class TestCheckpointResume:
+    """Interrupted runs resume with only the remaining items"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_failed_items_are_retried_and_written_items_resumed(self, pipeline, table):
+        source = documents(6)
+        table.fail_keys = {"document:doc-3.txt"}
+
+        first = await ingest(pipeline, source)
+        checkpoints = list(Path(pipeline.config["checkpoint_dir"]).iterdir())
+
+        assert first["failed"] == 2  # the failing item's whole batch
+        assert first["summary"]["new"] == 4
+        assert len(checkpoints) == 1
+
+        table.fail_keys = set()
+        pipeline._generate_embeddings.reset_mock()
+        second = await ingest(pipeline, source)
+
+        assert second["resumed"] == 4
+        assert second["summary"]["new"] == 2
+        assert second["failed"] == 0
+        assert sum(len(call.args[0]) for call in pipeline._generate_embeddings.await_args_list) == 2
+        # A clean run removes its checkpoint
+        assert not checkpoints[0].exists()
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_resume_false_starts_over(self, pipeline, table):
+        source = documents(4)
+        table.fail_keys = {"document:doc-0.txt"}
+        await ingest(pipeline, source)
+        table.fail_keys = set()
+
+        result = await ingest(pipeline, {**source, "resume": False})
+
+        assert result["resumed"] == 0
+        # The run options share the source's checkpoint, which the clean run removed
+        assert not list(Path(pipeline.config["checkpoint_dir"]).iterdir())
+        assert result["summary"]["unchanged"] == 2
+        assert result["summary"]["new"] == 2
+
+
+class TestSelectChanged:
+    """Status assigned from the stored content hash"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_statuses(self, pipeline, table):
+        items = {
+            name: IngestItem(key=name, content=name, metadata={"content_hash": f"hash-{name}"})
+            for name in ("same", "edited", "restored", "unseen")
+        }
+        table.rows = {
+            item_id("same"): {"content_hash": "hash-same", "source_scope": None, "deleted": False},
+            item_id("edited"): {"content_hash": "old-hash", "source_scope": None, "deleted": False},
+            item_id("restored"): {"content_hash": "hash-restored", "source_scope": None, "deleted": True},
+        }
+
+        changed = await pipeline._select_changed(list(items.values()))
+
+        assert [item.key for item in changed] == ["edited", "restored", "unseen"]
+        assert {name: item.status for name, item in items.items()} == {
+            "same": "unchanged",
+            "edited": "changed",
+            "restored": "new",
+            "unseen": "new",
+        }
+
+
+class TestWriteOrdering:
+    """The stored content hash is committed only after every layer succeeds"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_vector_store_failure_is_retried_next_run(self, pipeline, table):
+        source = documents(2)
+        pipeline._store_embeddings.side_effect = RuntimeError("vector store down")
+
+        first = await ingest(pipeline, source)
+
+        assert first["failed"] == 2
+        assert table.rows == {}
+
+        pipeline._store_embeddings.side_effect = None
+        pipeline._store_embeddings.reset_mock()
+        second = await ingest(pipeline, source)
+
+        assert second["summary"] == {"new": 2, "changed": 0, "unchanged": 0, "deleted": 0}
+        assert sum(len(call.args[0]) for call in pipeline._store_embeddings.await_args_list) == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_cache_failure_is_retried_next_run(self, pipeline, table):
+        source = documents(2)
+        pipeline._cache_documents.side_effect = RuntimeError("redis down")
+
+        first = await ingest(pipeline, source)
+        pipeline._cache_documents.side_effect = None
+        second = await ingest(pipeline, source)
+
+        assert first["failed"] == 2
+        assert second["summary"]["new"] == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_embedding_failure_is_not_persisted(self, pipeline, table):
+        source = documents(2)
+        pipeline._generate_embeddings.side_effect = RuntimeError("rate limited")
+
+        first = await ingest(pipeline, source)
+        pipeline._generate_embeddings.side_effect = lambda texts: [[0.1, 0.2]] * len(texts)
+        second = await ingest(pipeline, source)
+
+        assert first["failed"] == 2
+        pipeline._store_embeddings.assert_awaited()
+        assert second["summary"]["new"] == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_embedding_client_errors_propagate(self, pipeline):
+        pipeline.openai_client = MagicMock()
+        pipeline.openai_client.embeddings.create = AsyncMock(side_effect=RuntimeError("rate limited"))
+
+        # No placeholder vectors: the batch must fail so it is retried
+        with pytest.raises(RuntimeError):
+            await DataIngestionPipeline._generate_embeddings(pipeline, ["text"])
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_changed_item_keeps_old_hash_until_written(self, pipeline, table):
+        await ingest(pipeline, documents(1))
+        edited = documents(1)
+        edited["documents"][0]["content"] = "edited body"
+        pipeline._store_embeddings.side_effect = RuntimeError("vector store down")
+
+        await ingest(pipeline, edited)
+        pipeline._store_embeddings.side_effect = None
+        result = await ingest(pipeline, edited)
+
+        assert result["summary"]["changed"] == 1
+
+
+class TestTombstones:
+    """Items removed from a scoped source are tombstoned, and only those"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_only_removed_items_of_the_scope_are_tombstoned(self, pipeline, table):
+        await ingest(pipeline, documents(3, source_id="drive"))
+        await ingest(pipeline, documents(2, prefix="other", source_id="wiki"))
+        shrunk = documents(3, source_id="drive")
+        del shrunk["documents"][2]
+
+        result = await ingest(pipeline, shrunk)
+
+        removed = item_id("document:doc-2.txt")
+        assert result["summary"]["deleted"] == 1
+        assert [doc_id for doc_id, row in table.rows.items() if row["deleted"]] == [removed]
+        pipeline._delete_embeddings.assert_awaited_once_with([removed])
+        pipeline._uncache_documents.assert_awaited_once_with([removed])
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_failed_extractions_are_not_tombstoned(self, pipeline, table):
+        source = documents(3, source_id="drive")
+        await ingest(pipeline, source)
+        extract = pipeline._extract_document_content
+
+        async def flaky_extract(doc):
+            if doc["filename"] == "doc-1.txt":
+                raise OSError("share unavailable")
+            return await extract(doc)
+
+        pipeline._extract_document_content = flaky_extract
+        result = await ingest(pipeline, source)
+
+        assert result["failed"] == 1
+        assert result["summary"]["deleted"] == 0
+        assert not any(row["deleted"] for row in table.rows.values())
+        pipeline._delete_embeddings.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_failed_api_fetch_does_not_tombstone_the_source(self, pipeline, table):
+        source = {"type": "api_data", "api_config": {"endpoint": "https://api.test/items"}}
+        pipeline._fetch_api_data = AsyncMock(return_value=[{"id": 1}, {"id": 2}])
+        await ingest(pipeline, source)
+
+        pipeline._fetch_api_data.side_effect = RuntimeError("503 Service Unavailable")
+        result = await ingest(pipeline, source)
+
+        assert result["status"] == "failed"
+        assert len(table.rows) == 2
+        assert not any(row["deleted"] for row in table.rows.values())
+        pipeline._delete_embeddings.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_tombstones_roll_back_when_vector_delete_fails(self, pipeline, table):
+        await ingest(pipeline, documents(2, source_id="drive"))
+        pipeline._delete_embeddings.side_effect = RuntimeError("vector store down")
+
+        result = await ingest(pipeline, documents(1, source_id="drive"))
+
+        assert result["summary"]["deleted"] == 0
+        assert not any(row["deleted"] for row in table.rows.values())
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_stats_count_only_live_documents(self, pipeline, table):
+        await ingest(pipeline, documents(3, source_id="drive"))
+        await ingest(pipeline, documents(1, source_id="drive"))
+
+        async def no_keys(**kwargs):
+            return
+            yield
+
+        pipeline.redis_client = MagicMock()
+        pipeline.redis_client.scan_iter = no_keys
+        stats = await pipeline.get_ingestion_stats()
+
+        assert stats["database_documents"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_missing_repository_path_does_not_tombstone(self, pipeline, table, tmp_path):
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        (repo / "main.py").write_text("print('hi')\n")
+        source = {"type": "code_repository", "repo_config": {"local_path": str(repo), "repository": "demo"}}
+        await ingest(pipeline, source)
+        (repo / "main.py").unlink()
+        repo.rmdir()
+
+        result = await ingest(pipeline, source)
+
+        assert result["status"] == "failed"
+        assert not any(row["deleted"] for row in table.rows.values())
+        pipeline._delete_embeddings.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_empty_listing_skips_tombstones(self, pipeline, table):
+        await ingest(pipeline, documents(2, source_id="drive"))
+
+        result = await ingest(pipeline, {"type": "documents", "documents": [], "source_id": "drive"})
+
+        assert result["summary"]["deleted"] == 0
+        assert not any(row["deleted"] for row in table.rows.values())
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_listing_options_scope_api_sources_apart(self, pipeline, table):
+        endpoint = "https://api.test/items"
+        pipeline._fetch_api_data = AsyncMock(return_value=[{"id": 1}])
+        await ingest(pipeline, {"type": "api_data", "api_config": {"endpoint": endpoint, "params": {"team": "a"}}})
+        pipeline._fetch_api_data.return_value = [{"id": 2}]
+        result = await ingest(pipeline, {"type": "api_data", "api_config": {"endpoint": endpoint, "params": {"team": "b"}}})
+
+        assert result["summary"]["deleted"] == 0
+        assert {row["source_scope"] for row in table.rows.values()} == {f"api:{endpoint}?team=a", f"api:{endpoint}?team=b"}
+        assert DataIngestionPipeline._listing_id(f"api:{endpoint}", {}) == f"api:{endpoint}"
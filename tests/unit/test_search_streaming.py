@@ -0,0 +1,96 @@
+"""
+Unit tests for streamed multi-provider search in the Sophia Supreme Orchestrator
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import sophia_supreme_orchestrator as orchestrator_module
+from sophia_supreme_orchestrator import SearchHit, SearchResult, SophiaSupremeOrchestrator
+
+PROVIDERS = {
+    "Serper": "search_serper",
+    "Brave": "search_brave",
+    "Tavily": "search_tavily",
+    "Exa": "search_exa",
+}
+
+
+def provider_result(provider, urls, delay=0.0):
+    """Search mock returning `urls` as hits after `delay` seconds"""
+    async def search(query):
+        await asyncio.sleep(delay)
+        return SearchResult(
+            provider=provider,
+            hits=[SearchHit(title=f"{provider} hit", url=url) for url in urls],
+        )
+    return search
+
+
+@pytest.fixture
+def orchestrator():
+    return SophiaSupremeOrchestrator()
+
+
+class TestStreamSearch:
+    """stream_search and _incremental_search with every provider mocked"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_every_provider_is_searched(self, orchestrator):
+        mocks = {
+            name: AsyncMock(side_effect=provider_result(name, [f"https://{name.lower()}.example/a"]))
+            for name in PROVIDERS
+        }
+        with patch.multiple(orchestrator, **{method: mocks[name] for name, method in PROVIDERS.items()}):
+            results = [result async for result in orchestrator.stream_search("query", quorum=len(PROVIDERS))]
+
+        assert {result.provider for result in results} == set(PROVIDERS)
+        assert all(result.ok for result in results)
+        for mock in mocks.values():
+            mock.assert_awaited_once_with("query")
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_failing_provider_is_reported_not_raised(self, orchestrator):
+        mocks = {name: provider_result(name, [f"https://{name.lower()}.example/a"]) for name in PROVIDERS}
+        mocks["Exa"] = AsyncMock(side_effect=RuntimeError("exa down"))
+        with patch.multiple(orchestrator, **{method: mocks[name] for name, method in PROVIDERS.items()}):
+            results = {result.provider: result async for result in orchestrator.stream_search("query", quorum=len(PROVIDERS))}
+
+        assert set(results) == set(PROVIDERS)
+        assert results["Exa"].error == "exa down"
+        assert all(results[name].ok for name in ("Serper", "Brave", "Tavily"))
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_quorum_cancels_stragglers(self, orchestrator):
+        mocks = {name: provider_result(name, [f"https://{name.lower()}.example/a"]) for name in PROVIDERS}
+        mocks["Exa"] = provider_result("Exa", ["https://exa.example/a"], delay=5)
+        with patch.multiple(orchestrator, **{method: mocks[name] for name, method in PROVIDERS.items()}):
+            results = [result async for result in orchestrator.stream_search("query", quorum=3, deadline=2)]
+
+            # Let the cancelled straggler run its cancellation handler
+            await asyncio.sleep(0)
+
+        assert {result.provider for result in results} == {"Serper", "Brave", "Tavily"}
+        assert orchestrator_module.provider_latency.outcomes["Exa"]["cancelled"] >= 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_incremental_search_deduplicates_urls_across_providers(self, orchestrator):
+        mocks = {
+            "Serper": provider_result("Serper", ["https://www.example.com/page/", "https://serper.example/x"]),
+            "Brave": provider_result("Brave", ["https://example.com/page"], delay=0.01),
+            "Tavily": provider_result("Tavily", [], delay=0.02),
+            "Exa": provider_result("Exa", ["https://exa.example/y"], delay=0.03),
+        }
+        with patch.multiple(orchestrator, **{method: mocks[name] for name, method in PROVIDERS.items()}):
+            chunks = [chunk async for chunk in orchestrator._incremental_search("query")]
+
+        text = "".join(chunks)
+        assert text.count("example.com/page") == 1
+        assert "**Exa Results:**" in text
+        assert chunks[-1] == "\n\n[Search Providers: Serper, Exa]"
@@ -0,0 +1,172 @@
+"""
+Unit tests for incremental symbol indexing in the MCP Context symbol indexer
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "services" / "mcp-context"))
+
+import symbol_indexer  # noqa: E402
+from weaviate.classes.config import Tokenization  # noqa: E402
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch):
+    """symbol_indexer with Weaviate and embeddings mocked and a thread parse pool"""
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(symbol_indexer, "WEAVIATE_URL", "http://weaviate.test")
+    monkeypatch.setattr(symbol_indexer, "WEAVIATE_API_KEY", "test-key")
+    monkeypatch.setattr(symbol_indexer, "weaviate_client", MagicMock())
+    monkeypatch.setattr(symbol_indexer, "STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setattr(symbol_indexer, "_ensure_symbols_schema_exists", lambda: None)
+    monkeypatch.setattr(symbol_indexer, "_get_parse_pool", lambda: pool)
+    monkeypatch.setattr(
+        symbol_indexer, "create_embeddings", AsyncMock(side_effect=lambda texts: [[0.0]] * len(texts))
+    )
+    monkeypatch.setattr(
+        symbol_indexer, "_write_symbols", MagicMock(side_effect=lambda stale, objects, vectors: (len(objects), []))
+    )
+    yield symbol_indexer
+    pool.shutdown()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "repo"
+    (root / "services").mkdir(parents=True)
+    (root / "a.py").write_text("def alpha():\n    return 1\n")
+    (root / "services" / "app.py").write_text("def beta():\n    return 2\n")
+    (root / "c.py").write_text("class Gamma:\n    pass\n")
+    return root
+
+
+class TestIncrementalSymbolIndex:
+    """Hash manifest, stale-file selection and counting"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_only_changed_and_removed_files_are_stale(self, indexer, repo):
+        first = await indexer.index_repository_symbols(str(repo))
+        assert first["files_changed"] == 3
+        assert first["symbols_imported"] == 3
+
+        (repo / "services" / "app.py").write_text("def beta():\n    return 3\n\ndef delta():\n    pass\n")
+        (repo / "c.py").unlink()
+        indexer._write_symbols.reset_mock()
+
+        second = await indexer.index_repository_symbols(str(repo))
+
+        stale, objects, _ = indexer._write_symbols.call_args.args
+        assert sorted(stale) == ["c.py", os.path.join("services", "app.py")]
+        assert {obj["name"] for obj in objects} == {"beta", "delta"}
+        assert {obj["file"] for obj in objects} == {os.path.join("services", "app.py")}
+        assert second["files_changed"] == 1
+        assert second["files_removed"] == 1
+        assert second["files_unchanged"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_unchanged_repository_writes_nothing(self, indexer, repo):
+        await indexer.index_repository_symbols(str(repo))
+        indexer._write_symbols.reset_mock()
+
+        stats = await indexer.index_repository_symbols(str(repo))
+
+        indexer._write_symbols.assert_not_called()
+        assert stats["files_unchanged"] == 3
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_files_with_failed_objects_are_reindexed(self, indexer, repo):
+        indexer._write_symbols.side_effect = lambda stale, objects, vectors: (len(objects) - 1, ["c.py"])
+        first = await indexer.index_repository_symbols(str(repo))
+        assert first["files_failed"] == 1
+
+        indexer._write_symbols.side_effect = lambda stale, objects, vectors: (len(objects), [])
+        indexer._write_symbols.reset_mock()
+        second = await indexer.index_repository_symbols(str(repo))
+
+        stale, objects, _ = indexer._write_symbols.call_args.args
+        assert stale == ["c.py"]
+        assert {obj["name"] for obj in objects} == {"Gamma"}
+        assert second["files_changed"] == 1
+        assert second["files_unchanged"] == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.unit
+    async def test_unreadable_files_are_not_counted_unchanged(self, indexer, repo):
+        (repo / "broken.py").symlink_to(repo / "missing.py")
+
+        stats = await indexer.index_repository_symbols(str(repo))
+
+        assert stats["files_scanned"] == 4
+        assert stats["files_unreadable"] == 1
+        assert stats["files_unchanged"] == 0
+
+
+class TestSymbolWrites:
+    """Deletion filter and schema for the symbols collection"""
+
+    @pytest.mark.unit
+    def test_stale_symbols_deleted_by_exact_file(self, monkeypatch):
+        client = MagicMock()
+        filter_cls = MagicMock()
+        monkeypatch.setattr(symbol_indexer, "weaviate_client", client)
+        monkeypatch.setattr(symbol_indexer, "Filter", filter_cls)
+        client.collections.get.return_value.batch.failed_objects = []
+
+        symbol_indexer._write_symbols(["services/app.py", "c.py"], [], [])
+
+        filter_cls.by_property.assert_called_once_with("file")
+        filter_cls.by_property.return_value.contains_any.assert_called_once_with(["services/app.py", "c.py"])
+
+    @pytest.mark.unit
+    def test_failed_objects_are_reported_by_file(self, monkeypatch):
+        client = MagicMock()
+        monkeypatch.setattr(symbol_indexer, "weaviate_client", client)
+        failure = MagicMock(message="vector dimension mismatch")
+        failure.object_.properties = {"file": "a.py", "name": "alpha"}
+        client.collections.get.return_value.batch.failed_objects = [failure]
+        objects = [{"file": "a.py", "kind": "function", "name": "alpha", "line": 1},
+                   {"file": "c.py", "kind": "class", "name": "Gamma", "line": 1}]
+
+        imported, failed_files = symbol_indexer._write_symbols(["a.py", "c.py"], objects, [[0.0], [0.0]])
+
+        assert imported == 1
+        assert failed_files == ["a.py"]
+
+    @pytest.mark.unit
+    def test_schema_uses_field_tokenization_for_file(self, monkeypatch):
+        client = MagicMock()
+        client.collections.exists.return_value = False
+        monkeypatch.setattr(symbol_indexer, "weaviate_client", client)
+
+        symbol_indexer._ensure_symbols_schema_exists()
+
+        properties = {prop.name: prop for prop in client.collections.create.call_args.kwargs["properties"]}
+        assert properties["file"].tokenization == Tokenization.FIELD
+
+    @pytest.mark.unit
+    def test_word_tokenized_collection_is_rebuilt(self, monkeypatch, tmp_path):
+        client = MagicMock()
+        client.collections.exists.side_effect = [True, False]
+        file_property = MagicMock(tokenization=Tokenization.WORD)
+        file_property.name = "file"
+        client.collections.get.return_value.config.get.return_value.properties = [file_property]
+        state_dir = tmp_path / "state"
+        state_dir.mkdir()
+        (state_dir / "repo.json").write_text("{}")
+        monkeypatch.setattr(symbol_indexer, "weaviate_client", client)
+        monkeypatch.setattr(symbol_indexer, "STATE_DIR", str(state_dir))
+
+        symbol_indexer._ensure_symbols_schema_exists()
+
+        client.collections.delete.assert_called_once_with(symbol_indexer.SYMBOLS_CLASS)
+        client.collections.create.assert_called_once()
+        assert not list(state_dir.iterdir())